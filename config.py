@@ -5,7 +5,7 @@
 
 import os
 from dataclasses import dataclass
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 
 @dataclass
@@ -19,6 +19,16 @@ class DatabaseConfig:
     charset: str = 'utf8mb4'
     collation: str = 'utf8mb4_unicode_ci'
 
+    # コネクションプール設定
+    pool_enabled: bool = os.getenv('MYSQL_POOL_ENABLED', '1') == '1'
+    pool_size: int = int(os.getenv('MYSQL_POOL_SIZE', '8'))
+    pool_timeout: float = float(os.getenv('MYSQL_POOL_TIMEOUT', '30'))
+    pool_health_check_interval: float = float(os.getenv('MYSQL_POOL_HEALTH_CHECK_INTERVAL', '60'))
+
+    # LOAD DATA LOCAL INFILE による一括ロード設定（サーバー側で local_infile=ON が必要）
+    local_infile_enabled: bool = os.getenv('MYSQL_LOCAL_INFILE', '1') == '1'
+    local_infile_threshold: int = int(os.getenv('MYSQL_LOCAL_INFILE_THRESHOLD', '5000'))  # この行数以上で使用
+
     def to_dict(self) -> Dict[str, Any]:
         """辞書形式に変換"""
         return {
@@ -47,8 +57,86 @@ class AppConfig:
     # データ更新設定
     batch_size: int = 10
     max_workers: int = 5
+    price_chunk_size: int = int(os.getenv('PRICE_CHUNK_SIZE', '100'))  # yf.downloadで一括取得する銘柄数
+    update_worker_poll_interval: float = float(os.getenv('UPDATE_WORKER_POLL_INTERVAL', '5'))  # ワーカーがジョブキューを確認する間隔（秒）
+    update_shard_size: int = int(os.getenv('UPDATE_SHARD_SIZE', '50'))  # ワーカーが1回にリースする銘柄数
+    update_lease_seconds: int = int(os.getenv('UPDATE_LEASE_SECONDS', '300'))  # リースの有効秒数（ハートビートで延長）
+    update_worker_egress: str = os.getenv('WORKER_EGRESS', '')  # 送信元の識別名（空の場合はホスト名）
+
+    # 更新パイプライン（取得→計算→書き込み）設定
+    update_compute_workers: int = int(os.getenv('UPDATE_COMPUTE_WORKERS', '2'))  # 計算ステージのスレッド数
+    update_queue_size: int = int(os.getenv('UPDATE_QUEUE_SIZE', '50'))  # ステージ間キューの上限（銘柄数）
+    update_write_batch_size: int = int(os.getenv('UPDATE_WRITE_BATCH_SIZE', '50'))  # 1回の書き込みにまとめる銘柄数
+    update_flush_interval: float = float(os.getenv('UPDATE_FLUSH_INTERVAL', '2'))  # バッチが揃わなくても書き込む間隔（秒）
+
+    # 配当貴族スクリーニングのキャッシュミス補完設定
+    aristocrat_backfill_workers: int = int(os.getenv('ARISTOCRAT_BACKFILL_WORKERS', '8'))  # yfinanceから並列に取得するスレッド数
+    aristocrat_backfill_timeout: float = float(os.getenv('ARISTOCRAT_BACKFILL_TIMEOUT', '20'))  # 結果を返すまでに待つ秒数（残りは裏で取得してキャッシュに保存）
+
+    # インメモリスクリーニングエンジン設定
+    screening_engine_enabled: bool = os.getenv('SCREENING_ENGINE', '0') == '1'
+    screening_version_check_interval: float = float(os.getenv('SCREENING_VERSION_CHECK_INTERVAL', '5'))  # update_history確認間隔（秒）
+
+
+@dataclass
+class CacheConfig:
+    """レスポンスキャッシュ設定（TTLは秒、Noneは期限なし）"""
+    enabled: bool = os.getenv('RESPONSE_CACHE_ENABLED', '1') == '1'
+    path: str = os.getenv('RESPONSE_CACHE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'responses.sqlite3'))
+    max_size_mb: int = int(os.getenv('RESPONSE_CACHE_MAX_MB', '512'))
+
+    # エンドポイントごとの有効期間
+    yfinance_info_ttl: float = 6 * 3600
+    yfinance_history_ttl: float = 6 * 3600
+    yfinance_financials_ttl: float = 7 * 86400  # 財務諸表は決算ごとにしか変わらない
+    jpx_listing_ttl: float = 86400
+    edinet_list_today_ttl: float = 3600  # 当日分の書類一覧は追加されうる
+    edinet_list_past_ttl: Optional[float] = None  # 過去日の書類一覧は変わらない
+    edinet_document_ttl: Optional[float] = None  # 提出書類は不変
+
+
+@dataclass
+class RateLimitConfig:
+    """yfinance呼び出しのレート制限設定（レートは回/秒）"""
+    yfinance_rate: float = float(os.getenv('YFINANCE_RATE', '2'))  # 初期レート
+    yfinance_min_rate: float = float(os.getenv('YFINANCE_MIN_RATE', '0.2'))
+    yfinance_max_rate: float = float(os.getenv('YFINANCE_MAX_RATE', '8'))
+    yfinance_burst: float = float(os.getenv('YFINANCE_BURST', '3'))
+
+    # 更新ワーカーが送信元（egress）ごとに共有するレート予算。稼働中のワーカー数で等分して各自の最大レートにする
+    global_rate_per_egress: float = float(os.getenv('YFINANCE_GLOBAL_RATE', '8'))
+
+    # 成功時はsuccess_window回ごとにincrease_stepずつ上げ、429時はdecrease_factor倍に下げる
+    increase_step: float = 0.2
+    success_window: int = 20
+    decrease_factor: float = 0.5
+    cooldown: float = 15.0  # 429時に全呼び出しを止める秒数（連続時は倍々に延長）
+    max_cooldown: float = 300.0
+
+
+@dataclass
+class AsyncFetchConfig:
+    """asyncio取得レイヤー（repository.async_fetcher）の設定"""
+    max_in_flight: int = int(os.getenv('ASYNC_MAX_IN_FLIGHT', '200'))  # 全ホスト合計の同時リクエスト数
+    default_host_limit: int = int(os.getenv('ASYNC_HOST_LIMIT', '8'))  # ホストごとの同時リクエスト数
+    edinet_host_limit: int = int(os.getenv('EDINET_HOST_LIMIT', '16'))
+    yahoo_host_limit: int = int(os.getenv('YAHOO_HOST_LIMIT', '16'))  # 実際の送信間隔は共有レートリミッターで制御
+    timeout: float = float(os.getenv('ASYNC_FETCH_TIMEOUT', '30'))
+    max_retries: int = 3  # 429・接続エラー時の再試行回数
+    cpu_processes: int = int(os.getenv('ASYNC_CPU_PROCESSES', '0'))  # 解析処理のプロセス数（0はスレッドで実行）
+
+    def host_limit(self, host: str) -> int:
+        """ホストごとの同時リクエスト数"""
+        if host.endswith('edinet-fsa.go.jp'):
+            return self.edinet_host_limit
+        if host.endswith('finance.yahoo.com'):
+            return self.yahoo_host_limit
+        return self.default_host_limit
 
 
 # 設定インスタンス（シングルトン）
 DB_CONFIG = DatabaseConfig()
 APP_CONFIG = AppConfig()
+CACHE_CONFIG = CacheConfig()
+RATE_LIMIT_CONFIG = RateLimitConfig()
+ASYNC_FETCH_CONFIG = AsyncFetchConfig()
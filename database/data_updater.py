@@ -5,14 +5,16 @@ yfinanceからデータを取得してMySQLに保存
 
 import yfinance as yf
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
+from config import APP_CONFIG
 from database.db_config import DatabaseManager
+from repository.rate_limiter import get_rate_limiter, is_rate_limit_error
+from repository.ticker_snapshot import TickerSnapshot
+from repository.update_job_tracker import UpdateJobTracker
 import streamlit as st
-from concurrent.futures import ThreadPoolExecutor, as_completed
 import sys
 import os
-import time
-import random
 
 # パスを追加してメインアプリのモジュールをインポート
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
@@ -23,10 +25,9 @@ class StockDataUpdater:
 
     def __init__(self):
         self.db = DatabaseManager()
+        self.last_pipeline_stats = None  # 直前の update_all_stocks のパイプライン統計
 
-    def update_stock_basic_info(self, ticker, name, sector=None, industry=None, market=None, market_cap=None):
-        """銘柄基本情報を更新"""
-        query = """
+    STOCK_UPSERT_QUERY = """
         INSERT INTO stocks (ticker, name, sector, industry, market, market_cap)
         VALUES (%s, %s, %s, %s, %s, %s)
         ON DUPLICATE KEY UPDATE
@@ -37,12 +38,16 @@ class StockDataUpdater:
             market_cap = VALUES(market_cap),
             updated_at = CURRENT_TIMESTAMP
         """
-        params = (ticker, name, sector, industry, market, market_cap)
-        return self.db.execute_query(query, params, fetch=False)
 
-    def update_financial_metrics(self, ticker, fiscal_date, metrics_dict):
-        """財務指標を更新"""
-        query = """
+    # 株価のみの更新で未登録の銘柄を登録する（既存銘柄のセクター等は変更せず、銘柄名がない場合は既存の名前を残す）
+    STOCK_NAME_UPSERT_QUERY = """
+        INSERT INTO stocks (ticker, name)
+        VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE
+            name = IF(VALUES(name) = ticker, name, VALUES(name))
+        """
+
+    METRICS_UPSERT_QUERY = """
         INSERT INTO financial_metrics (
             ticker, fiscal_date, per, pbr, roe, dividend_yield,
             dividend_rate, payout_ratio, profit_margin, revenue_growth,
@@ -64,7 +69,16 @@ class StockDataUpdater:
             total_equity = VALUES(total_equity),
             updated_at = CURRENT_TIMESTAMP
         """
-        params = (
+
+    def update_stock_basic_info(self, ticker, name, sector=None, industry=None, market=None, market_cap=None):
+        """銘柄基本情報を更新"""
+        params = (ticker, name, sector, industry, market, market_cap)
+        return self.db.execute_query(self.STOCK_UPSERT_QUERY, params, fetch=False)
+
+    @staticmethod
+    def _metrics_row(ticker, fiscal_date, metrics_dict):
+        """財務指標をfinancial_metrics用のタプルに変換"""
+        return (
             ticker,
             fiscal_date,
             metrics_dict.get('per'),
@@ -80,20 +94,81 @@ class StockDataUpdater:
             metrics_dict.get('total_assets'),
             metrics_dict.get('total_equity')
         )
-        return self.db.execute_query(query, params, fetch=False)
 
-    def update_dividends(self, ticker: str, dividends_df: pd.Series):
+    def update_financial_metrics(self, ticker, fiscal_date, metrics_dict):
+        """財務指標を更新"""
+        params = self._metrics_row(ticker, fiscal_date, metrics_dict)
+        return self.db.execute_query(self.METRICS_UPSERT_QUERY, params, fetch=False)
+
+    EPS_HISTORY_UPSERT_QUERY = """
+        INSERT INTO eps_history (ticker, fiscal_date, eps, net_income, shares, source)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            eps = VALUES(eps),
+            net_income = VALUES(net_income),
+            shares = VALUES(shares),
+            source = VALUES(source),
+            updated_at = CURRENT_TIMESTAMP
+        """
+
+    @staticmethod
+    def _build_eps_rows(ticker, financials, source='yfinance'):
+        """
+        年次financialsをeps_history用のタプルリストに変換
+        Returns:
+            (ticker, fiscal_date, eps, net_income, shares, source) のリスト
+        """
+        from domain.calculators.historical_metrics import extract_eps_history
+
+        eps_history = extract_eps_history(financials)
+        rows = []
+        for fiscal_date, eps, net_income, shares in eps_history.itertuples(index=False):
+            rows.append((
+                ticker,
+                fiscal_date.strftime('%Y-%m-%d'),
+                float(eps),
+                None if np.isnan(net_income) else float(net_income),
+                None if np.isnan(shares) else int(shares),
+                source
+            ))
+        return rows
+
+    def update_dividends(self, ticker: str, dividends_df: pd.Series, since=None):
         """
         配当履歴を更新する。
         過去5年間の「通常配当」の中央値を基準に、特別配当を動的に判定する。
+
+        Args:
+            ticker: 銘柄コード
+            dividends_df: 配当Series（権利落ち日インデックス）
+            since: 指定時はこの日付より後の配当のみ保存（差分更新）。
+                   新規行がなければ中央値の再計算もしない
         """
         if dividends_df is None or dividends_df.empty:
             return 0
 
-        # 1. データベースから既存の配当履歴を取得
+        if since is not None:
+            dividends_df = dividends_df[dividends_df.index.date > since]
+            if dividends_df.empty:
+                return 0
+
         # Note: get_dividends_historyはdb_config.pyに追加済み
         db_dividends_data = self.db.get_dividends_history(ticker)
-        db_dividends_df = pd.DataFrame(db_dividends_data)
+        data_list = self._build_dividend_rows(ticker, dividends_df, db_dividends_data)
+        return self._save_dividend_rows(data_list)
+
+    @staticmethod
+    def _build_dividend_rows(ticker, dividends_df, db_dividends_data):
+        """
+        配当Seriesをdividends用のタプルリストに変換（特別配当の判定を含む）
+
+        Args:
+            ticker: 銘柄コード
+            dividends_df: 保存する配当Series（権利落ち日インデックス）
+            db_dividends_data: DB上の既存の配当履歴（get_dividends_history の戻り値）
+        """
+        # 1. データベースの既存の配当履歴
+        db_dividends_df = pd.DataFrame(db_dividends_data or [])
         
         if not db_dividends_df.empty:
             db_dividends_df['date'] = pd.to_datetime(db_dividends_df['date'])
@@ -117,7 +192,11 @@ class StockDataUpdater:
         # フォールバック: DBに通常配当データがない場合、yfinanceの過去5年データの中央値を使用
         if regular_median is None:
             five_years_ago = datetime.now() - timedelta(days=365 * 5)
-            recent_yf_dividends = dividends_df[dividends_df.index > five_years_ago]
+            # yfinanceの配当はタイムゾーン付きのため、比較用にタイムゾーンを外す
+            index = dividends_df.index
+            if getattr(index, 'tz', None) is not None:
+                index = index.tz_localize(None)
+            recent_yf_dividends = dividends_df[index > five_years_ago]
             if not recent_yf_dividends.empty:
                 regular_median = recent_yf_dividends.median()
 
@@ -142,23 +221,17 @@ class StockDataUpdater:
                 float(amount),
                 is_special
             ))
+        return data_list
 
-        # 4. データベースを更新
-        query = """
+    DIVIDEND_UPSERT_QUERY = """
         INSERT INTO dividends (ticker, ex_date, amount, is_special)
         VALUES (%s, %s, %s, %s)
         ON DUPLICATE KEY UPDATE
             amount = VALUES(amount),
             is_special = VALUES(is_special)
         """
-        return self.db.execute_many(query, data_list)
 
-    def update_stock_prices(self, ticker, hist_df):
-        """株価履歴を更新"""
-        if hist_df is None or len(hist_df) == 0:
-            return 0
-
-        query = """
+    PRICE_UPSERT_QUERY = """
         INSERT INTO stock_prices (ticker, date, open, high, low, close, volume)
         VALUES (%s, %s, %s, %s, %s, %s, %s)
         ON DUPLICATE KEY UPDATE
@@ -169,29 +242,282 @@ class StockDataUpdater:
             volume = VALUES(volume)
         """
 
-        data_list = []
-        for date, row in hist_df.iterrows():
-            # dateがTimestampオブジェクトか文字列かをチェック
-            if hasattr(date, 'strftime'):
-                date_str = date.strftime('%Y-%m-%d')
-            else:
-                date_str = str(date)[:10]
+    # 年末終値は、既存より新しい（同日を含む）最終取引日の行だけで上書きする
+    # （close を先に更新するため、IF内の date は更新前の値）
+    YEAR_END_UPSERT_QUERY = """
+        INSERT INTO year_end_prices (ticker, year, date, close)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            close = IF(VALUES(date) >= date, VALUES(close), close),
+            date = GREATEST(date, VALUES(date))
+        """
 
-            data_list.append((
-                ticker,
-                date_str,
-                float(row['Open']) if pd.notna(row['Open']) else None,
-                float(row['High']) if pd.notna(row['High']) else None,
-                float(row['Low']) if pd.notna(row['Low']) else None,
-                float(row['Close']) if pd.notna(row['Close']) else None,
-                int(row['Volume']) if pd.notna(row['Volume']) else None
-            ))
+    def _build_price_rows(self, ticker, hist_df):
+        """
+        株価DataFrameをstock_prices用のタプルリストに変換
+        行ごとのループではなく列単位で一括変換する（NaN→None、日付整形、型変換）
+        """
+        index = hist_df.index
+        if isinstance(index, pd.DatetimeIndex):
+            # タイムゾーン付きの場合は現地日付に変換してから日単位で文字列化
+            if index.tz is not None:
+                index = index.tz_localize(None)
+            dates = np.datetime_as_string(index.values.astype('datetime64[D]')).tolist()
+        else:
+            dates = [str(date)[:10] for date in index]
+
+        # OHLCはfloat、欠損はNone（object配列にするとPythonのfloatになる）
+        prices = hist_df[['Open', 'High', 'Low', 'Close']].to_numpy(dtype='float64', na_value=np.nan)
+        price_values = prices.astype(object)
+        price_values[np.isnan(prices)] = None
+
+        # 出来高はint、欠損はNone
+        volume = hist_df['Volume'].to_numpy(dtype='float64', na_value=np.nan)
+        volume_missing = np.isnan(volume)
+        volume_values = np.where(volume_missing, 0, volume).astype('int64').astype(object)
+        volume_values[volume_missing] = None
+
+        return list(zip(
+            [ticker] * len(dates),
+            dates,
+            price_values[:, 0],
+            price_values[:, 1],
+            price_values[:, 2],
+            price_values[:, 3],
+            volume_values
+        ))
+
+    def _save_price_rows(self, data_list):
+        """
+        stock_pricesへ行を保存し、year_end_pricesの年末終値も更新する
+        閾値以上の行数ならLOAD DATA LOCAL INFILEで一括ロードし、
+        使えない場合や少量の場合はexecutemanyで保存する
 
-        return self.db.execute_many(query, data_list)
+        Returns:
+            影響を受けた行数（保存に失敗した場合はNone）
+        """
+        affected_rows = None
+        if len(data_list) >= self.db.config.local_infile_threshold:
+            affected_rows = self.db.bulk_load_stock_prices(data_list)
+        if affected_rows is None:
+            affected_rows = self.db.execute_many(self.PRICE_UPSERT_QUERY, data_list)
+        if affected_rows is None:
+            return None
+
+        # 保存した株価から年末終値を更新
+        if self.db.execute_many(self.YEAR_END_UPSERT_QUERY, self._build_year_end_rows(data_list)) is None:
+            return None
+        return affected_rows
+
+    @staticmethod
+    def _build_year_end_rows(price_rows):
+        """
+        stock_prices用の行から、銘柄・年ごとの最終取引日の行を抽出（year_end_prices用）
+        Args:
+            price_rows: (ticker, date, open, high, low, close, volume) のリスト（日付は'YYYY-MM-DD'）
+        Returns:
+            (ticker, year, date, close) のリスト
+        """
+        latest = {}
+        for ticker, date, _, _, _, close, _ in price_rows:
+            date = str(date)[:10]
+            key = (ticker, int(date[:4]))
+            current = latest.get(key)
+            if current is None or date >= current[0]:
+                latest[key] = (date, close)
+        return [(ticker, year, date, close) for (ticker, year), (date, close) in latest.items()]
+
+    def _save_dividend_rows(self, data_list):
+        """
+        dividendsへ行を保存し、保存した権利落ち日を含む年のyearly_dividendsを集計し直す
+        （保存方法は_save_price_rowsと同じ切り替え）
 
-    def update_dividend_analysis(self, ticker, analysis_results):
-        """配当分析結果を更新"""
-        query = """
+        Returns:
+            影響を受けた行数（保存に失敗した場合はNone）
+        """
+        affected_rows = None
+        if len(data_list) >= self.db.config.local_infile_threshold:
+            affected_rows = self.db.bulk_load_dividends(data_list)
+        if affected_rows is None:
+            affected_rows = self.db.execute_many(self.DIVIDEND_UPSERT_QUERY, data_list)
+        if affected_rows is None:
+            return None
+
+        if data_list:
+            # 銘柄ごとに、保存した最も古い権利落ち日の年以降だけを集計し直す
+            first_years = {}
+            for ticker, ex_date, _, _ in data_list:
+                year = int(str(ex_date)[:4])
+                first_years[ticker] = min(year, first_years.get(ticker, year))
+            if self.refresh_yearly_dividends(first_years) is None:
+                return None
+        return affected_rows
+
+    # dividendsを銘柄・年ごとに集計してyearly_dividendsに保存する（{conditions} で対象の行を絞る）
+    YEARLY_DIVIDEND_REFRESH_QUERY = """
+        INSERT INTO yearly_dividends (ticker, year, total, regular_total, special_count, payments)
+        SELECT
+            ticker,
+            YEAR(ex_date),
+            SUM(amount),
+            SUM(CASE WHEN is_special THEN 0 ELSE amount END),
+            SUM(CASE WHEN is_special THEN 1 ELSE 0 END),
+            COUNT(*)
+        FROM dividends
+        WHERE {conditions}
+        GROUP BY ticker, YEAR(ex_date)
+        ON DUPLICATE KEY UPDATE
+            total = VALUES(total),
+            regular_total = VALUES(regular_total),
+            special_count = VALUES(special_count),
+            payments = VALUES(payments)
+        """
+
+    def refresh_yearly_dividends(self, first_years=None, chunk_size=200):
+        """
+        yearly_dividendsをdividendsから集計し直す
+
+        Args:
+            first_years: {ticker: この年以降を集計し直す} の辞書（Noneの場合は全銘柄・全期間）
+            chunk_size: 1回の文で集計する銘柄数
+
+        Returns:
+            影響を受けた行数の合計（失敗時はNone）
+        """
+        if first_years is None:
+            return self.db.execute_query(
+                self.YEARLY_DIVIDEND_REFRESH_QUERY.format(conditions='1 = 1'), fetch=False
+            )
+
+        total = 0
+        items = list(first_years.items())
+        for start in range(0, len(items), chunk_size):
+            chunk = items[start:start + chunk_size]
+            # (ticker, ex_date) の一意キーを銘柄ごとの範囲で読む
+            conditions = ' OR '.join(['(ticker = %s AND ex_date >= %s)'] * len(chunk))
+            params = []
+            for ticker, year in chunk:
+                params.extend([ticker, f"{year}-01-01"])
+            result = self.db.execute_query(
+                self.YEARLY_DIVIDEND_REFRESH_QUERY.format(conditions=conditions), tuple(params), fetch=False
+            )
+            if result is None:
+                return None
+            total += result
+        return total
+
+    def update_stock_prices(self, ticker, hist_df):
+        """株価履歴を更新"""
+        if hist_df is None or len(hist_df) == 0:
+            return 0
+
+        data_list = self._build_price_rows(ticker, hist_df)
+        return self._save_price_rows(data_list)
+
+    @staticmethod
+    def download_prices_bulk(tickers, period='5y'):
+        """
+        複数銘柄の株価をyf.downloadで一括取得し、銘柄ごとに分割
+
+        Args:
+            tickers: 銘柄コードのリスト
+            period: 取得期間（例: '5y'）
+
+        Returns:
+            {ticker: 株価DataFrame}（取得できなかった銘柄は含まない）
+        """
+        if not tickers:
+            return {}
+
+        data = get_rate_limiter().call(
+            yf.download,
+            tickers=list(tickers),
+            period=period,
+            group_by='ticker',
+            auto_adjust=True,  # Ticker.history() のデフォルトと揃える
+            actions=False,
+            threads=True,
+            progress=False
+        )
+        if data is None or data.empty:
+            return {}
+
+        frames = {}
+        if isinstance(data.columns, pd.MultiIndex):
+            available = set(data.columns.get_level_values(0))
+            for ticker in tickers:
+                if ticker not in available:
+                    continue
+                frame = data[ticker].dropna(how='all')
+                if len(frame) > 0:
+                    frames[ticker] = frame
+        elif len(tickers) == 1:
+            frame = data.dropna(how='all')
+            if len(frame) > 0:
+                frames[tickers[0]] = frame
+        return frames
+
+    def update_prices_bulk(self, stock_list, chunk_size=None, period='5y'):
+        """
+        株価履歴のみをチャンク単位の一括ダウンロードで更新
+
+        Args:
+            stock_list: {ticker: name} の辞書、または銘柄コードのリスト
+            chunk_size: 1回のyf.downloadで取得する銘柄数（Noneの場合は設定値）
+            period: 取得期間
+
+        Returns:
+            (成功件数, 失敗件数)
+        """
+        tickers = list(stock_list)
+        names = stock_list if isinstance(stock_list, dict) else {}
+        chunk_size = chunk_size or APP_CONFIG.price_chunk_size
+        total = len(tickers)
+        success_count = 0
+        error_count = 0
+
+        progress_bar = st.progress(0)
+        status_text = st.empty()
+
+        for start in range(0, total, chunk_size):
+            chunk = tickers[start:start + chunk_size]
+            try:
+                frames = self.download_prices_bulk(chunk, period=period)
+            except Exception as e:
+                frames = {}
+                st.warning(f"❌ 一括取得エラー（{chunk[0]}〜{chunk[-1]}）: {str(e)[:100]}")
+
+            # チャンク内の全銘柄をまとめて保存（大量ならLOAD DATA、少量ならexecutemany）
+            data_list = []
+            fetched_tickers = []
+            for ticker in chunk:
+                frame = frames.get(ticker)
+                if frame is None:
+                    error_count += 1
+                    continue
+                data_list.extend(self._build_price_rows(ticker, frame))
+                fetched_tickers.append(ticker)
+            if data_list:
+                # stock_prices・year_end_pricesは stocks を参照するため、未登録の銘柄を先に登録する
+                stock_rows = [(ticker, names.get(ticker) or ticker) for ticker in fetched_tickers]
+                saved = self.db.execute_many(self.STOCK_NAME_UPSERT_QUERY, stock_rows) is not None
+                if saved:
+                    saved = self._save_price_rows(data_list) is not None
+                if saved:
+                    success_count += len(fetched_tickers)
+                else:
+                    error_count += len(fetched_tickers)
+
+            done = min(start + chunk_size, total)
+            progress_bar.progress(done / total)
+            status_text.text(f"進捗: {done}/{total} (成功: {success_count}, 失敗: {error_count})")
+
+        progress_bar.empty()
+        status_text.empty()
+
+        return success_count, error_count
+
+    DIVIDEND_ANALYSIS_UPSERT_QUERY = """
         INSERT INTO dividend_analysis (
             ticker, analysis_years, avg_dividend_yield, dividend_cv,
             current_dividend_yield, regular_dividend_yield, dividend_trend,
@@ -208,22 +534,8 @@ class StockDataUpdater:
             dividend_quality_score = VALUES(dividend_quality_score),
             calculated_at = CURRENT_TIMESTAMP
         """
-        params = (
-            ticker,
-            analysis_results.get('years', 5),
-            analysis_results.get('avg_yield'),
-            analysis_results.get('cv'),
-            analysis_results.get('current_yield'),
-            analysis_results.get('regular_yield'),
-            analysis_results.get('trend'),
-            analysis_results.get('has_special'),
-            analysis_results.get('quality_score')
-        )
-        return self.db.execute_query(query, params, fetch=False)
 
-    def update_per_analysis(self, ticker, analysis_results):
-        """PER分析結果を更新"""
-        query = """
+    PER_ANALYSIS_UPSERT_QUERY = """
         INSERT INTO per_analysis (
             ticker, analysis_years, avg_per, min_per, max_per,
             per_cv, current_per, is_low_per
@@ -238,7 +550,26 @@ class StockDataUpdater:
             is_low_per = VALUES(is_low_per),
             calculated_at = CURRENT_TIMESTAMP
         """
-        params = (
+
+    @staticmethod
+    def _dividend_analysis_row(ticker, analysis_results):
+        """配当分析結果をdividend_analysis用のタプルに変換"""
+        return (
+            ticker,
+            analysis_results.get('years', 5),
+            analysis_results.get('avg_yield'),
+            analysis_results.get('cv'),
+            analysis_results.get('current_yield'),
+            analysis_results.get('regular_yield'),
+            analysis_results.get('trend'),
+            analysis_results.get('has_special'),
+            analysis_results.get('quality_score')
+        )
+
+    @staticmethod
+    def _per_analysis_row(ticker, analysis_results):
+        """PER分析結果をper_analysis用のタプルに変換"""
+        return (
             ticker,
             analysis_results.get('years', 4),
             analysis_results.get('avg_per'),
@@ -248,259 +579,770 @@ class StockDataUpdater:
             analysis_results.get('current_per'),
             analysis_results.get('is_low_per', False)
         )
-        return self.db.execute_query(query, params, fetch=False)
 
-    def fetch_and_save_single_stock(self, ticker, name):
-        """単一銘柄のデータを取得してDBに保存"""
-        try:
-            # レート制限回避のため、ランダムな遅延を追加（1.5-3.0秒）
-            time.sleep(random.uniform(1.5, 3.0))
-
-            # yfinanceからデータ取得（リトライ機能付き）
-            stock = None
-            info = None
-            max_retries = 3
-
-            for attempt in range(max_retries):
-                try:
-                    stock = yf.Ticker(ticker)
-                    info = stock.info
-                    break  # 成功したらループを抜ける
-                except Exception as e:
-                    # レート制限エラーの場合は指数バックオフで再試行
-                    if "Too Many Requests" in str(e) or "Rate limited" in str(e) or "429" in str(e):
-                        if attempt < max_retries - 1:
-                            wait_time = 5 * (2 ** attempt)  # 5秒、10秒、20秒
-                            time.sleep(wait_time)
-                            continue
-                        else:
-                            # 最後の試行でも失敗したら長時間待機して1回だけ再試行
-                            time.sleep(30)
-                            try:
-                                stock = yf.Ticker(ticker)
-                                info = stock.info
-                            except:
-                                return False, f"レート制限エラー（{max_retries}回再試行失敗）"
-                    else:
-                        return False, f"yfinanceエラー: {str(e)[:50]}"
-
-            if info is None:
-                return False, "データ取得失敗"
-
-            # 基本情報を保存
+    def update_dividend_analysis(self, ticker, analysis_results):
+        """配当分析結果を更新"""
+        params = self._dividend_analysis_row(ticker, analysis_results)
+        return self.db.execute_query(self.DIVIDEND_ANALYSIS_UPSERT_QUERY, params, fetch=False)
+
+    def update_per_analysis(self, ticker, analysis_results):
+        """PER分析結果を更新"""
+        params = self._per_analysis_row(ticker, analysis_results)
+        return self.db.execute_query(self.PER_ANALYSIS_UPSERT_QUERY, params, fetch=False)
+
+    # 書き込みステージで保存するテーブル（外部キーの参照先から順に保存する）
+    WRITE_ORDER = ('stocks', 'financial_metrics', 'eps_history', 'dividends', 'stock_prices',
+                   'dividend_analysis', 'per_analysis')
+
+    UPSERT_QUERIES = {
+        'stocks': STOCK_UPSERT_QUERY,
+        'financial_metrics': METRICS_UPSERT_QUERY,
+        'eps_history': EPS_HISTORY_UPSERT_QUERY,
+        'dividend_analysis': DIVIDEND_ANALYSIS_UPSERT_QUERY,
+        'per_analysis': PER_ANALYSIS_UPSERT_QUERY,
+    }
+
+    # DB上の最新権利落ち日が最新株価日付よりこの日数以上古い（またはない）場合は、配当履歴全体から取り込み直す
+    # （株価のみの一括更新で保存した銘柄や、配当を取得できなかった銘柄の配当を補完する）
+    DIVIDEND_CATCHUP_DAYS = 400
+
+    def _fetch_incremental_tail(self, fetched, stock, last_price_date, last_dividend_date):
+        """
+        最新日付以降の株価・配当のみを取得し、分析用にDBの履歴とつなげる
+
+        Args:
+            fetched: fetch_stock() の取得結果（new_prices・new_dividends・dividends・hist・db_dividends を設定する）
+            stock: TickerSnapshot（または yfinance Ticker）
+            last_price_date: DB上の最新株価日付
+            last_dividend_date: DB上の最新権利落ち日（なければNone）
+        """
+        ticker = fetched['ticker']
+        # 株価は最新株価日付の続きだけを取得する
+        # （最新権利落ち日から取得すると、数か月〜数年分を毎回取得し直すことになる）
+        fetch_from = last_price_date + timedelta(days=1)
+
+        # 株価と配当は1回のhistory呼び出し（Dividends列）でまとめて取得
+        new_prices = None
+        new_dividends = None
+        if fetch_from <= datetime.now().date():
             try:
-                self.update_stock_basic_info(
-                    ticker=ticker,
-                    name=name,
-                    sector=info.get('sector'),
-                    industry=info.get('industry'),
-                    market=info.get('market'),
-                    market_cap=info.get('marketCap')
-                )
-            except Exception as e:
-                return False, f"基本情報保存エラー: {str(e)[:50]}"
+                tail = stock.history(start=fetch_from.strftime('%Y-%m-%d'))
+            except Exception:
+                tail = None
+
+            if tail is not None and len(tail) > 0:
+                new_prices = tail[tail.index.date > last_price_date]
+                if 'Dividends' in tail.columns:
+                    new_dividends = tail['Dividends'][tail['Dividends'] > 0]
+                    if last_dividend_date is not None:
+                        new_dividends = new_dividends[new_dividends.index.date > last_dividend_date]
+
+        # 配当が株価に追いついていない銘柄は、配当履歴全体から最新権利落ち日より後の分を取り込む
+        if last_dividend_date is None or (last_price_date - last_dividend_date).days > self.DIVIDEND_CATCHUP_DAYS:
+            try:
+                all_dividends = stock.dividends
+            except Exception:
+                all_dividends = None
+            if all_dividends is not None and len(all_dividends) > 0:
+                new_dividends = all_dividends[all_dividends > 0]
+                if last_dividend_date is not None:
+                    new_dividends = new_dividends[new_dividends.index.date > last_dividend_date]
+
+        # 分析は全期間が必要なため、DBの履歴に今回の差分をつなげて使う
+        db_dividends = self.db.get_dividends_history(ticker) or []
+        dividends = self._dividend_series_from_rows(db_dividends)
+        hist = self._load_price_history(ticker, years=5)
+
+        if new_dividends is not None and len(new_dividends) > 0:
+            new_dividends = new_dividends.rename('Dividends')
+            if dividends is None:
+                dividends = new_dividends
+            else:
+                dividends = pd.concat([dividends, new_dividends.tz_convert(dividends.index.tz)]).sort_index()
+        if new_prices is not None and len(new_prices) > 0:
+            columns = ['Open', 'High', 'Low', 'Close', 'Volume']
+            if hist is None:
+                hist = new_prices[columns]
+            else:
+                hist = pd.concat([hist, new_prices[columns].tz_convert(hist.index.tz)])
+
+        fetched.update(new_prices=new_prices, new_dividends=new_dividends,
+                       dividends=dividends, hist=hist, db_dividends=db_dividends)
+
+    def _load_price_history(self, ticker, years=5):
+        """DBから株価履歴を読み込み、yfinanceのhistory()と同じ形のDataFrameで返す"""
+        start_date = (datetime.now() - timedelta(days=365 * years)).date()
+        rows = self.db.get_price_history(ticker, start_date=start_date)
+        if not rows:
+            return None
+
+        hist = pd.DataFrame(rows)
+        hist.index = pd.DatetimeIndex(pd.to_datetime(hist.pop('date'))).tz_localize('Asia/Tokyo')
+        hist = hist.rename(columns={
+            'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close', 'volume': 'Volume'
+        })
+        return hist.astype({'Open': 'float64', 'High': 'float64', 'Low': 'float64', 'Close': 'float64'})
+
+    @staticmethod
+    def _dividend_series_from_rows(rows):
+        """DBの配当履歴（get_dividends_history の戻り値）をyfinanceのdividendsと同じ形のSeriesに変換"""
+        if not rows:
+            return None
+
+        dividends = pd.DataFrame(rows)
+        index = pd.DatetimeIndex(pd.to_datetime(dividends['date'])).tz_localize('Asia/Tokyo')
+        return pd.Series(dividends['dividend'].astype('float64').values, index=index, name='Dividends')
+
+    def fetch_stock(self, ticker, name, incremental=False):
+        """
+        単一銘柄のデータをyfinance・DBから読み込む（更新パイプラインの取得ステージ）
+
+        Args:
+            ticker: 銘柄コード
+            name: 銘柄名
+            incremental: Trueの場合、株価・配当はDBの最新日付以降の差分のみ取得
 
-            # 財務指標を保存
+        Returns:
+            (取得結果の辞書, エラーメッセージ)。取得結果は compute_stock_rows() に渡す
+        """
+        # info・配当・株価は1回だけ取得し、以降の計算で共有する
+        # （呼び出し間隔とレート制限時の待機・再試行は共有レートリミッターが制御）
+        stock = TickerSnapshot(ticker)
+        try:
+            info = stock.info
+        except Exception as e:
+            if is_rate_limit_error(e):
+                return None, "レート制限エラー（再試行失敗）"
+            return None, f"yfinanceエラー: {str(e)[:50]}"
+
+        if info is None:
+            return None, "データ取得失敗"
+
+        fetched = {
+            'ticker': ticker, 'name': name, 'info': info,
+            'dividends': None, 'hist': None,          # 分析に使う全期間のデータ
+            'new_dividends': None, 'new_prices': None,  # 今回保存するデータ
+            'db_dividends': None,                      # 特別配当の判定に使うDB上の配当履歴
+            'financials': None,                        # 過去EPS（時点PER）の計算に使う年次損益計算書
+        }
+
+        # 年次損益計算書（キャッシュの有効期間が長いため、ほとんどの更新では通信しない）
+        try:
+            fetched['financials'] = stock.financials
+        except Exception:
+            pass
+
+        # 差分更新: DBにある最新日付より後のデータだけを取得
+        latest = self.db.get_latest_data_dates(ticker) if incremental else {}
+        last_price_date = latest.get('last_price_date')
+
+        if incremental and last_price_date is not None:
+            self._fetch_incremental_tail(fetched, stock, last_price_date, latest.get('last_dividend_date'))
+        else:
+            # 配当・株価履歴（過去5年）がなくても続行
             try:
-                metrics = {
-                    'per': info.get('trailingPE'),
-                    'pbr': info.get('priceToBook'),
-                    'roe': info.get('returnOnEquity'),
-                    'dividend_yield': info.get('dividendYield'),  # yfinanceは既にパーセント単位で返す
-                    'dividend_rate': info.get('dividendRate'),
-                    'payout_ratio': info.get('payoutRatio'),
-                    'profit_margin': info.get('profitMargins'),
-                    'revenue_growth': info.get('revenueGrowth')
-                }
-
-                fiscal_date = datetime.now().date()
-                self.update_financial_metrics(ticker, fiscal_date, metrics)
-            except Exception as e:
-                # 財務指標がなくても続行
+                fetched['dividends'] = fetched['new_dividends'] = stock.dividends
+            except Exception:
                 pass
-
-            # 配当履歴を保存
             try:
-                dividends = stock.dividends
-                if dividends is not None and len(dividends) > 0:
-                    result = self.update_dividends(ticker, dividends)
-                    # デバッグ: 配当保存の成功を確認
-            except Exception as e:
-                # 配当がなくても続行（エラーを記録）
+                fetched['hist'] = fetched['new_prices'] = stock.history(period='5y')
+            except Exception:
                 pass
+            if fetched['dividends'] is not None and len(fetched['dividends']) > 0:
+                fetched['db_dividends'] = self.db.get_dividends_history(ticker) or []
+
+        return fetched, None
+
+    def compute_stock_rows(self, fetched):
+        """
+        取得結果から各テーブルに保存する行を計算（更新パイプラインの計算ステージ）
+        ネットワーク・DBには接続しない
 
-            # 株価履歴を保存（過去5年）
-            hist = None
+        Args:
+            fetched: fetch_stock() の取得結果
+
+        Returns:
+            {テーブル名: 行タプルのリスト}（WRITE_ORDER のテーブル）
+        """
+        ticker = fetched['ticker']
+        info = fetched['info']
+        rows = {table: [] for table in self.WRITE_ORDER}
+
+        # 基本情報
+        rows['stocks'].append((
+            ticker, fetched['name'], info.get('sector'), info.get('industry'),
+            info.get('market'), info.get('marketCap')
+        ))
+
+        # 財務指標
+        metrics = {
+            'per': info.get('trailingPE'),
+            'pbr': info.get('priceToBook'),
+            'roe': info.get('returnOnEquity'),
+            'dividend_yield': info.get('dividendYield'),  # yfinanceは既にパーセント単位で返す
+            'dividend_rate': info.get('dividendRate'),
+            'payout_ratio': info.get('payoutRatio'),
+            'profit_margin': info.get('profitMargins'),
+            'revenue_growth': info.get('revenueGrowth')
+        }
+        rows['financial_metrics'].append(self._metrics_row(ticker, datetime.now().date(), metrics))
+
+        # EPS履歴（変換できなくても続行）
+        eps_history = None
+        if fetched.get('financials') is not None:
             try:
-                hist = stock.history(period='5y')
-                if hist is not None and len(hist) > 0:
-                    self.update_stock_prices(ticker, hist)
-            except Exception as e:
-                # 株価履歴がなくても続行
-                hist = None
+                rows['eps_history'] = self._build_eps_rows(ticker, fetched['financials'])
+                eps_history = pd.DataFrame(rows['eps_history'], columns=['ticker', 'fiscal_date', 'eps',
+                                                                         'net_income', 'shares', 'source'])
+            except Exception:
                 pass
 
-            # 配当分析結果を計算して保存
+        # 配当履歴・株価履歴（変換できなくても続行）
+        new_dividends = fetched['new_dividends']
+        if new_dividends is not None and len(new_dividends) > 0:
+            try:
+                rows['dividends'] = self._build_dividend_rows(ticker, new_dividends, fetched['db_dividends'])
+            except Exception:
+                pass
+        new_prices = fetched['new_prices']
+        if new_prices is not None and len(new_prices) > 0:
             try:
-                if dividends is not None and len(dividends) > 0 and hist is not None and len(hist) > 0:
-                    # メインアプリの関数をインポート
-                    from stock_analysis_app import calculate_historical_dividend_yield, calculate_dividend_quality_score
-                    from services.investment_screener import InvestmentScreener
-
-                    # 配当分析を実行
-                    avg_yield, cv, current_yield, trend, has_special = calculate_historical_dividend_yield(
-                        stock, dividends, hist, years=5
+                rows['stock_prices'] = self._build_price_rows(ticker, new_prices)
+            except Exception:
+                pass
+
+        # 分析は取得済みのデータだけを使う（オフラインのスナップショットで未取得の項目は空として扱う）
+        dividends, hist = fetched['dividends'], fetched['hist']
+        stock = TickerSnapshot.from_data(ticker, info=info, dividends=dividends, history=hist)
+
+        dividend_analysis = self._analyze_dividends(ticker, stock, dividends, hist)
+        if dividend_analysis is not None:
+            rows['dividend_analysis'].append(self._dividend_analysis_row(ticker, dividend_analysis))
+
+        per_analysis = self._analyze_per(ticker, info, hist, eps_history=eps_history)
+        if per_analysis is not None:
+            rows['per_analysis'].append(self._per_analysis_row(ticker, per_analysis))
+
+        return rows
+
+    def _analyze_dividends(self, ticker, stock, dividends, hist):
+        """
+        配当分析結果を計算
+        Returns:
+            update_dividend_analysis() に渡す結果辞書（計算できない場合はNone）
+        """
+        try:
+            if dividends is not None and len(dividends) > 0 and hist is not None and len(hist) > 0:
+                # メインアプリの関数をインポート
+                from domain.calculators.historical_metrics import calculate_historical_dividend_yield, calculate_dividend_quality_score
+                from services.investment_screener import InvestmentScreener
+
+                # 配当分析を実行
+                avg_yield, cv, current_yield, trend, has_special = calculate_historical_dividend_yield(
+                    stock, dividends, hist, years=5
+                )
+
+                # 通常配当利回りを計算（特別配当除く）
+                regular_yield, _ = InvestmentScreener.calculate_regular_dividend_yield(ticker, snapshot=stock)
+
+                # スコアを計算
+                if avg_yield is not None:
+                    quality_score = calculate_dividend_quality_score(avg_yield, cv, trend, has_special)
+                    print(f"✓ 配当分析: {ticker}")
+                    return {
+                        'years': 5,
+                        'avg_yield': avg_yield,
+                        'cv': cv,
+                        'current_yield': current_yield,
+                        'regular_yield': regular_yield,
+                        'trend': trend,
+                        'has_special': has_special,
+                        'quality_score': quality_score
+                    }
+        except Exception as e:
+            # 配当分析エラーをログに出力
+            print(f"✗ 配当分析エラー {ticker}: {str(e)}")
+        return None
+
+    @staticmethod
+    def _per_analysis_from_panel(metrics):
+        """
+        calculate_point_in_time_per_panel の1銘柄分の行を update_per_analysis() に渡す結果辞書に変換
+        （numpy型をPython標準型に変換）
+        """
+        return {
+            'years': 4,
+            'avg_per': float(metrics['avg_per']),
+            'min_per': float(metrics['min_per']),
+            'max_per': float(metrics['max_per']),
+            'per_cv': float(metrics['per_cv']),
+            'current_per': float(metrics['current_per']),
+            'is_low_per': bool(metrics['is_low_per'])
+        }
+
+    def _analyze_per(self, ticker, info, hist, eps_history=None):
+        """
+        PER分析結果を計算
+        EPS履歴がある場合は各年末時点で公表済みだったEPSでPERを計算し、
+        ない場合は現在のEPS（trailingEps）で過去の株価を割る
+
+        Args:
+            ticker: 銘柄コード
+            info: info辞書
+            hist: 株価履歴DataFrame
+            eps_history: EPS履歴DataFrame（列: fiscal_date, eps。Noneの場合は現在のEPSを使用）
+        Returns:
+            update_per_analysis() に渡す結果辞書（計算できない場合はNone）
+        """
+        try:
+            if hist is not None and len(hist) > 0:
+                from domain.calculators.historical_metrics import (
+                    calculate_historical_per_from_data, calculate_point_in_time_per_panel,
+                    year_end_closes, year_end_pers
+                )
+
+                # 年末終値インデックスを1回だけ作成し、平均PERと最小/最大で共用する
+                current_eps = info.get('trailingEps')
+                year_ends = year_end_closes(hist)
+
+                if eps_history is not None and len(eps_history) > 0:
+                    panel = calculate_point_in_time_per_panel(
+                        year_ends.reset_index().assign(ticker=ticker),
+                        eps_history.assign(ticker=ticker),
+                        years=4
                     )
+                    if ticker in panel.index:
+                        print(f"✓ PER分析: {ticker}")
+                        return self._per_analysis_from_panel(panel.loc[ticker])
 
-                    # 通常配当利回りを計算（特別配当除く）
-                    regular_yield, _ = InvestmentScreener.calculate_regular_dividend_yield(ticker)
-
-                    # スコアを計算
-                    if avg_yield is not None:
-                        quality_score = calculate_dividend_quality_score(avg_yield, cv, trend, has_special)
-
-                        # 分析結果を保存
-                        analysis_results = {
-                            'years': 5,
-                            'avg_yield': avg_yield,
-                            'cv': cv,
-                            'current_yield': current_yield,
-                            'regular_yield': regular_yield,
-                            'trend': trend,
-                            'has_special': has_special,
-                            'quality_score': quality_score
-                        }
-                        self.update_dividend_analysis(ticker, analysis_results)
-                        print(f"✓ 配当分析保存: {ticker}")
-            except Exception as e:
-                # 配当分析エラーをログに出力
-                print(f"✗ 配当分析エラー {ticker}: {str(e)}")
-                pass
+                # PER分析を実行（過去4年、取得済みの株価とinfoを使用）
+                avg_per, per_cv, current_per = calculate_historical_per_from_data(
+                    hist, current_eps, years=4, year_ends=year_ends
+                )
+
+                if avg_per is not None and current_per is not None:
+                    # 過去のPER履歴から最小/最大を計算
+                    per_history = year_end_pers(year_ends, current_eps, years=4)
+                    min_per_val = min(per_history) if per_history else None
+                    max_per_val = max(per_history) if per_history else None
+
+                    # 割安フラグ: 現在PERが平均より20%以上低い
+                    is_low_per = current_per < (avg_per * 0.8) if (current_per and avg_per) else False
+
+                    print(f"✓ PER分析: {ticker}")
+                    # numpy型をPython標準型に変換
+                    return {
+                        'years': 4,
+                        'avg_per': float(avg_per) if avg_per is not None else None,
+                        'min_per': float(min_per_val) if min_per_val is not None else None,
+                        'max_per': float(max_per_val) if max_per_val is not None else None,
+                        'per_cv': float(per_cv) if per_cv is not None else None,
+                        'current_per': float(current_per) if current_per is not None else None,
+                        'is_low_per': bool(is_low_per)
+                    }
+        except Exception as e:
+            # PER分析エラーをログに出力
+            print(f"✗ PER分析エラー {ticker}: {str(e)}")
+        return None
 
-            # PER分析結果を計算して保存
+    def write_stock_rows(self, rows):
+        """
+        計算ステージの行をテーブルごとに保存（更新パイプラインの書き込みステージ）
+        複数銘柄分の行をまとめて渡すと、テーブルごとに1回のexecutemany（大量ならLOAD DATA）で保存する
+
+        Args:
+            rows: {テーブル名: 行タプルのリスト}
+
+        Raises:
+            RuntimeError: 保存に失敗した場合（DB接続エラー・SQLエラー）。
+                          ON DUPLICATE KEY UPDATE で変更がなかった0行は成功として扱う
+        """
+        for table in self.WRITE_ORDER:
+            table_rows = rows.get(table)
+            if not table_rows:
+                continue
+            if table == 'stock_prices':
+                result = self._save_price_rows(table_rows)
+            elif table == 'dividends':
+                result = self._save_dividend_rows(table_rows)
+            else:
+                result = self.db.execute_many(self.UPSERT_QUERIES[table], table_rows)
+            if result is None:
+                raise RuntimeError(f"{table} の保存に失敗しました")
+
+    def fetch_and_save_single_stock(self, ticker, name, incremental=False):
+        """
+        単一銘柄のデータを取得してDBに保存
+
+        Args:
+            ticker: 銘柄コード
+            name: 銘柄名
+            incremental: Trueの場合、株価・配当はDBの最新日付以降の差分のみ取得
+        """
+        try:
+            fetched, error = self.fetch_stock(ticker, name, incremental=incremental)
+            if error is not None:
+                return False, error
+
+            rows = self.compute_stock_rows(fetched)
             try:
-                if hist is not None and len(hist) > 0:
-                    # メインアプリの関数をインポート
-                    from stock_analysis_app import calculate_historical_per
-
-                    # PER分析を実行（過去4年）
-                    avg_per, per_cv, current_per = calculate_historical_per(stock, years=4)
-
-                    if avg_per is not None and current_per is not None:
-                        # 過去のPER履歴を取得して最小/最大を計算
-                        # calculate_historical_perで計算した値を使用
-                        from datetime import datetime
-                        import pandas as pd
-
-                        per_history = []
-                        info = stock.info
-                        current_eps = info.get('trailingEps')
-
-                        if current_eps and current_eps > 0:
-                            for year_offset in range(4):  # 過去4年
-                                try:
-                                    target_year = datetime.now().year - year_offset
-                                    year_end = pd.Timestamp(target_year, 12, 31, tz='Asia/Tokyo')
-
-                                    # その年末以前の最も近い株価を取得
-                                    hist_before = hist[hist.index <= year_end]
-                                    if len(hist_before) > 0:
-                                        close_price = hist_before['Close'].iloc[-1]
-                                        per = close_price / current_eps
-                                        if per > 0:
-                                            per_history.append(per)
-                                except:
-                                    continue
-
-                        min_per_val = min(per_history) if per_history else None
-                        max_per_val = max(per_history) if per_history else None
-
-                        # 割安フラグ: 現在PERが平均より20%以上低い
-                        is_low_per = current_per < (avg_per * 0.8) if (current_per and avg_per) else False
-
-                        # 分析結果を保存（numpy型をPython標準型に変換）
-                        analysis_results = {
-                            'years': 4,
-                            'avg_per': float(avg_per) if avg_per is not None else None,
-                            'min_per': float(min_per_val) if min_per_val is not None else None,
-                            'max_per': float(max_per_val) if max_per_val is not None else None,
-                            'per_cv': float(per_cv) if per_cv is not None else None,
-                            'current_per': float(current_per) if current_per is not None else None,
-                            'is_low_per': bool(is_low_per)
-                        }
-                        self.update_per_analysis(ticker, analysis_results)
-                        print(f"✓ PER分析保存: {ticker}")
+                self.write_stock_rows(rows)
             except Exception as e:
-                # PER分析エラーをログに出力
-                print(f"✗ PER分析エラー {ticker}: {str(e)}")
-                pass
+                return False, f"保存エラー: {str(e)[:50]}"
 
             return True, None
 
         except Exception as e:
             return False, f"予期しないエラー: {str(e)[:50]}"
 
-    def update_all_stocks(self, stock_list, max_workers=5):
-        """全銘柄を並列処理で更新"""
-        total = len(stock_list)
+    def _load_analysis_inputs(self, tickers, years=5):
+        """
+        分析に使うデータを複数銘柄分まとめてDBから読み込む（銘柄ごとのクエリ・ネットワーク取得なし）
+
+        Args:
+            tickers: 銘柄コードのリスト
+            years: 読み込む配当・株価の年数
+
+        Returns:
+            ({ticker: (配当Series, 株価DataFrame, info辞書)}, 配当の縦持ちDataFrame, 株価の縦持ちDataFrame)
+            （infoは現在株価と、保存済みのPERから逆算したEPSのみ。
+              縦持ちDataFrameは calculate_historical_dividend_yield_panel の入力形式）
+        """
+        placeholders = ', '.join(['%s'] * len(tickers))
+        start_date = (datetime.now() - timedelta(days=365 * years)).date()
+
+        # 配当利回りは基準日から365日ごとの区間・直近1年の支払いごとの中央値で計算するため、
+        # 暦年で集計した yearly_dividends ではなく権利落ち日ごとの行を、分析期間の分だけ読み込む
+        dividend_rows = self.db.execute_query(f"""
+            SELECT ticker, ex_date AS date, amount AS dividend
+            FROM dividends
+            WHERE ticker IN ({placeholders}) AND ex_date >= %s
+            ORDER BY ticker, ex_date
+        """, (*tickers, start_date)) or []
+        price_rows = self.db.execute_query(f"""
+            SELECT ticker, date, close AS Close
+            FROM stock_prices
+            WHERE ticker IN ({placeholders}) AND date >= %s
+            ORDER BY ticker, date
+        """, (*tickers, start_date)) or []
+        metric_rows = self.db.execute_query(f"""
+            SELECT fm.ticker, fm.fiscal_date, fm.per
+            FROM financial_metrics fm
+            INNER JOIN (
+                SELECT ticker, MAX(fiscal_date) AS fiscal_date
+                FROM financial_metrics
+                WHERE ticker IN ({placeholders})
+                GROUP BY ticker
+            ) latest ON fm.ticker = latest.ticker AND fm.fiscal_date = latest.fiscal_date
+        """, tuple(tickers)) or []
+
+        dividend_frame = pd.DataFrame(dividend_rows, columns=['ticker', 'date', 'dividend'])
+        dividend_frame['date'] = pd.DatetimeIndex(pd.to_datetime(dividend_frame['date'])).tz_localize('Asia/Tokyo')
+        dividend_frame = dividend_frame.rename(columns={'dividend': 'amount'}).astype({'amount': 'float64'})
+        dividends_by_ticker = {}
+        for ticker, group in dividend_frame.groupby('ticker', sort=False):
+            dividends_by_ticker[ticker] = pd.Series(
+                group['amount'].to_numpy(), index=pd.DatetimeIndex(group['date']), name='Dividends'
+            )
+
+        price_frame = pd.DataFrame(price_rows, columns=['ticker', 'date', 'Close'])
+        price_frame['date'] = pd.DatetimeIndex(pd.to_datetime(price_frame['date'])).tz_localize('Asia/Tokyo')
+        price_frame = price_frame.rename(columns={'Close': 'close'}).astype({'close': 'float64'})
+        prices_by_ticker = {}
+        for ticker, group in price_frame.groupby('ticker', sort=False):
+            prices_by_ticker[ticker] = pd.DataFrame(
+                {'Close': group['close'].to_numpy()}, index=pd.DatetimeIndex(group['date'])
+            )
+
+        metrics_by_ticker = {row['ticker']: row for row in metric_rows}
+
+        inputs = {}
+        for ticker in tickers:
+            hist = prices_by_ticker.get(ticker)
+            info = {}
+            if hist is not None and len(hist) > 0:
+                info['currentPrice'] = float(hist['Close'].iloc[-1])
+                # PER = 株価 / EPS のため、PERを保存した日の終値からEPSを逆算する
+                metric = metrics_by_ticker.get(ticker)
+                if metric is not None and metric['per'] is not None and float(metric['per']) > 0:
+                    fiscal_date = pd.Timestamp(metric['fiscal_date'], tz='Asia/Tokyo')
+                    closes = hist['Close'][hist.index <= fiscal_date]
+                    if len(closes) > 0:
+                        info['trailingEps'] = float(closes.iloc[-1]) / float(metric['per'])
+            inputs[ticker] = (dividends_by_ticker.get(ticker), hist, info)
+        return inputs, dividend_frame, price_frame
+
+    def _load_per_inputs(self, tickers, price_frame, years=4):
+        """
+        時点PERの計算に使う年末終値とEPS履歴を複数銘柄分まとめてDBから読み込む
+
+        Args:
+            tickers: 銘柄コードのリスト
+            price_frame: _load_analysis_inputs() の株価の縦持ちDataFrame
+                         （year_end_prices を読めない場合に年末終値を作る）
+            years: 読み込む年数
+
+        Returns:
+            (年末終値の縦持ちDataFrame, EPS履歴の縦持ちDataFrame)
+            （calculate_point_in_time_per_panel の入力形式）
+        """
+        placeholders = ', '.join(['%s'] * len(tickers))
+        first_year = datetime.now().year - years + 1
+
+        year_end_rows = self.db.execute_query(f"""
+            SELECT ticker, year, date, close
+            FROM year_end_prices
+            WHERE ticker IN ({placeholders}) AND year >= %s
+        """, (*tickers, first_year))
+        if year_end_rows is None:
+            # year_end_prices がない場合は読み込み済みの日次株価から各年の最終行を取る
+            year_end_frame = price_frame.assign(year=price_frame['date'].dt.year)
+            year_end_frame = year_end_frame.drop_duplicates(['ticker', 'year'], keep='last')
+        else:
+            year_end_frame = pd.DataFrame(year_end_rows, columns=['ticker', 'year', 'date', 'close'])
+
+        eps_rows = self.db.execute_query(f"""
+            SELECT ticker, fiscal_date, eps
+            FROM eps_history
+            WHERE ticker IN ({placeholders})
+            ORDER BY ticker, fiscal_date
+        """, tuple(tickers)) or []
+        eps_frame = pd.DataFrame(eps_rows, columns=['ticker', 'fiscal_date', 'eps'])
+        return year_end_frame, eps_frame
+
+    def recompute_analysis_from_db(self, tickers=None, chunk_size=200):
+        """
+        配当分析・PER分析をDBの配当・株価から再計算して保存（ネットワーク接続なし）
+        スコアの計算方法を変えた後などに、全銘柄を取得し直さずに分析結果だけを更新する
+
+        Args:
+            tickers: 対象の銘柄コードのリスト（Noneの場合は株価データがある全銘柄）
+            chunk_size: 1回に読み込む銘柄数
+
+        Returns:
+            (配当分析の成功件数, 配当分析できなかった件数)
+        """
+        if tickers is None:
+            rows = self.db.execute_query("SELECT DISTINCT ticker FROM stock_prices ORDER BY ticker")
+            tickers = [row['ticker'] for row in rows or []]
+        if not tickers:
+            print("株価データがある銘柄が見つかりません")
+            return 0, 0
+
+        total = len(tickers)
+        print(f"\nDBのデータから分析を再計算: {total}件")
         success_count = 0
         error_count = 0
+        per_count = 0
 
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = {
-                executor.submit(self.fetch_and_save_single_stock, ticker, name): (ticker, name)
-                for ticker, name in stock_list.items()
-            }
-
-            for idx, future in enumerate(as_completed(futures), 1):
-                ticker, name = futures[future]
-                try:
-                    success, error = future.result()
-                    if success:
-                        success_count += 1
-                    else:
-                        error_count += 1
-                        # エラーの詳細を表示（最初の10件のみ）
-                        if error_count <= 10:
-                            st.warning(f"❌ {ticker} ({name}): {error}")
-                except Exception as e:
+        from domain.calculators.historical_metrics import (
+            calculate_dividend_quality_score, calculate_historical_dividend_yield_panel,
+            calculate_point_in_time_per_panel
+        )
+        from services.investment_screener import InvestmentScreener
+
+        for start in range(0, total, chunk_size):
+            chunk = tickers[start:start + chunk_size]
+            rows = {'dividend_analysis': [], 'per_analysis': []}
+            inputs, dividend_frame, price_frame = self._load_analysis_inputs(chunk)
+
+            # 配当利回り指標は銘柄ごとのループではなくチャンク全体を一括計算
+            panel = calculate_historical_dividend_yield_panel(dividend_frame, price_frame, years=5)
+            # PERはEPS履歴がある銘柄を年末時点のEPSで一括計算（ない銘柄は現在のEPSで銘柄ごとに計算）
+            year_end_frame, eps_frame = self._load_per_inputs(chunk, price_frame)
+            per_panel = calculate_point_in_time_per_panel(year_end_frame, eps_frame, years=4)
+
+            for ticker, (dividends, hist, info) in inputs.items():
+                stock = TickerSnapshot.from_data(ticker, info=info, dividends=dividends, history=hist)
+
+                dividend_analysis = None
+                if ticker in panel.index:
+                    metrics = panel.loc[ticker]
+                    avg_yield, cv, trend = float(metrics['avg_yield']), float(metrics['cv']), float(metrics['trend'])
+                    has_special = bool(metrics['has_special'])
+                    regular_yield, _ = InvestmentScreener.calculate_regular_dividend_yield(ticker, snapshot=stock)
+                    dividend_analysis = {
+                        'years': 5,
+                        'avg_yield': avg_yield,
+                        'cv': cv,
+                        'current_yield': float(metrics['current_yield']),
+                        'regular_yield': regular_yield,
+                        'trend': trend,
+                        'has_special': has_special,
+                        'quality_score': calculate_dividend_quality_score(avg_yield, cv, trend, has_special)
+                    }
+                if dividend_analysis is not None:
+                    rows['dividend_analysis'].append(self._dividend_analysis_row(ticker, dividend_analysis))
+                    success_count += 1
+                else:
                     error_count += 1
-                    # エラーの詳細を表示（最初の10件のみ）
-                    if error_count <= 10:
-                        st.error(f"❌ {ticker} ({name}): {e}")
 
-                progress = idx / total
-                progress_bar.progress(progress)
-                status_text.text(f"進捗: {idx}/{total} (成功: {success_count}, 失敗: {error_count})")
+                if ticker in per_panel.index:
+                    per_analysis = self._per_analysis_from_panel(per_panel.loc[ticker])
+                else:
+                    per_analysis = self._analyze_per(ticker, info, hist)
+                if per_analysis is not None:
+                    rows['per_analysis'].append(self._per_analysis_row(ticker, per_analysis))
+                    per_count += 1
 
-        progress_bar.empty()
-        status_text.empty()
+            self.write_stock_rows(rows)
+            print(f"[{min(start + chunk_size, total)}/{total}] 配当分析: 成功={success_count}, 対象外={error_count} / PER分析: {per_count}")
 
+        print(f"\n分析の再計算完了: 配当分析={success_count}件, PER分析={per_count}件, 配当分析対象外={error_count}件")
         return success_count, error_count
 
+    def refresh_screening_snapshot(self, tickers=None):
+        """
+        screening_snapshot を更新し、update_history に記録
+
+        Args:
+            tickers: 更新した銘柄コードのリスト（Noneの場合は全件再構築）
+
+        Returns:
+            更新した行数（失敗時はNone）
+        """
+        started_at = datetime.now()
+        affected_rows = self.db.refresh_screening_snapshot(tickers)
+
+        status = 'success' if affected_rows is not None else 'failed'
+        update_type = 'screening_snapshot' if tickers is None else 'screening_snapshot_incremental'
+        self.db.execute_query("""
+            INSERT INTO update_history (update_type, status, records_updated, started_at, completed_at)
+            VALUES (%s, %s, %s, %s, %s)
+        """, params=(update_type, status, affected_rows or 0, started_at, datetime.now()), fetch=False)
+
+        return affected_rows
+
+    def update_all_stocks(self, stock_list, max_workers=5, incremental=False, tracker=None,
+                          progress_callback=None):
+        """
+        全銘柄を取得→計算→書き込みのパイプラインで更新
+
+        Args:
+            stock_list: {ticker: name} の辞書
+            max_workers: 取得ステージの並列処理数
+            incremental: Trueの場合、株価・配当は差分のみ取得
+            tracker: UpdateJobTracker（指定時は銘柄ごとの結果を update_progress に記録）
+            progress_callback: 進捗通知関数 (処理済み数, 総数, 成功数, 失敗数) -> Falseで中止。
+                               指定時はStreamlitを使わず、エラーは標準出力に表示（ワーカー用）
+        """
+        from database.update_pipeline import UpdatePipeline
+
+        total = len(stock_list)
+        counts = {'processed': 0, 'success': 0, 'error': 0}
+        pipeline = UpdatePipeline(self, fetch_workers=max_workers)
+
+        if progress_callback is None:
+            progress_bar = st.progress(0)
+            status_text = st.empty()
+
+        def on_result(ticker, name, success, error):
+            counts['processed'] += 1
+            if success:
+                counts['success'] += 1
+            else:
+                counts['error'] += 1
+                # エラーの詳細を表示（画面では最初の10件のみ）
+                message = f"❌ {ticker} ({name}): {error}"
+                if progress_callback is not None:
+                    print(message)
+                elif counts['error'] <= 10:
+                    st.warning(message)
+
+            if progress_callback is not None:
+                return progress_callback(counts['processed'], total, counts['success'], counts['error'])
+
+            progress_bar.progress(counts['processed'] / total)
+            status_text.text(
+                f"進捗: {counts['processed']}/{total} (成功: {counts['success']}, 失敗: {counts['error']})\n"
+                + "\n".join(UpdatePipeline.format_stats(pipeline.stats()))
+            )
+            return True
+
+        # 中止要求時は未着手の銘柄を取得せず、処理中の銘柄の書き込みを待つ（未着手分は再開可能）
+        updated_tickers = pipeline.run(stock_list, incremental=incremental, tracker=tracker, on_result=on_result)
+        self.last_pipeline_stats = pipeline.stats()
+
+        if progress_callback is None:
+            progress_bar.empty()
+            status_text.empty()
+
+        # 更新した銘柄のスクリーニング用スナップショットを差分更新
+        if updated_tickers:
+            self.refresh_screening_snapshot(updated_tickers)
+
+        return counts['success'], counts['error']
+
+    def run_update_job(self, stock_list=None, update_type='full', max_workers=5, incremental=False,
+                       resume=False, failed_only=False, progress_callback=None):
+        """
+        進捗を記録しながら全銘柄を更新（中断したジョブの再開に対応）
+
+        Args:
+            stock_list: {ticker: name} の辞書（新規ジョブの場合に指定）
+            update_type: update_history に記録する更新タイプ
+            max_workers: 並列処理数
+            incremental: Trueの場合、株価・配当は差分のみ取得
+            resume: Trueの場合、最新の中断ジョブの未処理・失敗銘柄のみを更新
+            failed_only: Trueの場合、最新ジョブの失敗銘柄のみを更新
+            progress_callback: update_all_stocks と同じ進捗通知関数（ワーカー用）
+
+        Returns:
+            (更新履歴ID, 今回の成功数, 今回の失敗数, ジョブ全体の件数辞書)
+            （再開するジョブがない場合はNone）
+        """
+        tracker = UpdateJobTracker(self.db, update_type)
+        if resume or failed_only:
+            job = tracker.resume(failed_only=failed_only)
+            if job is None:
+                return None
+            update_id, targets = job
+        else:
+            targets = stock_list or {}
+            update_id = tracker.start(targets)
+
+        success_count, error_count = self.update_all_stocks(
+            targets, max_workers=max_workers, incremental=incremental, tracker=tracker,
+            progress_callback=progress_callback
+        )
+        return update_id, success_count, error_count, tracker.finish()
+
 
 # グローバルインスタンス
 data_updater = StockDataUpdater()
 
 
-def batch_update_dividend_analysis():
-    """配当データがある全銘柄の配当分析を一括計算"""
-    import yfinance as yf
-    from stock_analysis_app import calculate_historical_dividend_yield, calculate_dividend_quality_score
+def batch_update_dividend_analysis(refetch=False):
+    """
+    配当データがある全銘柄の配当分析を一括計算
+
+    Args:
+        refetch: Falseの場合はDBの配当・株価から計算（ネットワーク接続なし、PER分析も更新）。
+                 Trueの場合はyfinanceから取得し直して計算
+
+    Returns:
+        (成功件数, エラー件数)
+    """
+    from domain.calculators.historical_metrics import calculate_historical_dividend_yield, calculate_dividend_quality_score
     from services.investment_screener import InvestmentScreener
 
     db = DatabaseManager()
     updater = StockDataUpdater()
 
-    # 配当データがある銘柄のリストを取得
+    if not refetch:
+        success_count, error_count = updater.recompute_analysis_from_db()
+        # 分析結果をスクリーニング用スナップショットに反映（全件再構築）
+        if success_count > 0:
+            refreshed = updater.refresh_screening_snapshot()
+            print(f"スクリーニングスナップショット更新: {refreshed if refreshed is not None else '失敗'}")
+        return success_count, error_count
+
+    # 配当データがある銘柄のリストを取得（年次集計を読む）
     query = """
-    SELECT DISTINCT d.ticker, s.name
-    FROM dividends d
-    INNER JOIN stocks s ON d.ticker = s.ticker
-    ORDER BY d.ticker
+    SELECT DISTINCT y.ticker, s.name
+    FROM yearly_dividends y
+    INNER JOIN stocks s ON y.ticker = s.ticker
+    ORDER BY y.ticker
     """
 
     stocks_with_dividends = db.execute_query(query)
@@ -520,8 +1362,8 @@ def batch_update_dividend_analysis():
         name = stock_info['name']
 
         try:
-            # yfinanceからデータを取得
-            stock = yf.Ticker(ticker)
+            # yfinanceからデータを取得（infoは通常配当利回りの計算と共有）
+            stock = TickerSnapshot(ticker)
             dividends = stock.dividends
             hist = stock.history(period='5y')
 
@@ -532,7 +1374,7 @@ def batch_update_dividend_analysis():
                 )
 
                 # 通常配当利回りを計算（特別配当除く）
-                regular_yield, regular_msg = InvestmentScreener.calculate_regular_dividend_yield(ticker)
+                regular_yield, regular_msg = InvestmentScreener.calculate_regular_dividend_yield(ticker, snapshot=stock)
 
                 # スコアを計算
                 if avg_yield is not None:
@@ -573,4 +1415,10 @@ def batch_update_dividend_analysis():
             print(f"ERROR [{idx}/{total}] {ticker} ({name}): {str(e)[:100]}")
 
     print(f"\n配当分析完了: 成功={success_count}件, エラー={error_count}件")
+
+    # 配当分析結果をスクリーニング用スナップショットに反映（全件再構築）
+    if success_count > 0:
+        refreshed = updater.refresh_screening_snapshot()
+        print(f"スクリーニングスナップショット更新: {refreshed if refreshed is not None else '失敗'}")
+
     return success_count, error_count
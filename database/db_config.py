@@ -4,9 +4,17 @@
 """
 
 import os
+import tempfile
 import mysql.connector
 from mysql.connector import Error
 import streamlit as st
+from contextlib import contextmanager
+from config import DB_CONFIG, APP_CONFIG
+from repository.connection_pool import get_pool
+
+# スナップショットを参照できると確認済みの接続先（host, port, database）
+# 全件再構築はDELETEとINSERTを1トランザクションで行うため、一度データが入れば空には戻らない
+_snapshot_ready = set()
 
 class DatabaseConfig:
     """データベース接続設定クラス"""
@@ -19,19 +27,31 @@ class DatabaseConfig:
         self.password = os.getenv('MYSQL_PASSWORD', '')
         self.database = os.getenv('MYSQL_DATABASE', 'stock_analysis')
 
+        # プール設定は config.DatabaseConfig と共通
+        self.pool_enabled = DB_CONFIG.pool_enabled
+        self.pool_size = DB_CONFIG.pool_size
+        self.pool_timeout = DB_CONFIG.pool_timeout
+        self.pool_health_check_interval = DB_CONFIG.pool_health_check_interval
+        self.local_infile_enabled = DB_CONFIG.local_infile_enabled
+        self.local_infile_threshold = DB_CONFIG.local_infile_threshold
+
+    def connect_kwargs(self):
+        """mysql.connector.connect() 用の接続パラメータ"""
+        return {
+            'host': self.host,
+            'port': self.port,
+            'user': self.user,
+            'password': self.password,
+            'database': self.database,
+            'charset': 'utf8mb4',
+            'collation': 'utf8mb4_unicode_ci',
+            'autocommit': False
+        }
+
     def get_connection(self):
-        """データベース接続を取得"""
+        """データベース接続を取得（プール外の専用接続）"""
         try:
-            connection = mysql.connector.connect(
-                host=self.host,
-                port=self.port,
-                user=self.user,
-                password=self.password,
-                database=self.database,
-                charset='utf8mb4',
-                collation='utf8mb4_unicode_ci',
-                autocommit=False
-            )
+            connection = mysql.connector.connect(**self.connect_kwargs())
             return connection
         except Error as e:
             st.error(f"❌ データベース接続エラー: {e}")
@@ -81,10 +101,60 @@ class DatabaseManager:
 
     def __init__(self):
         self.config = DatabaseConfig()
+        self._pool = None
+        if self.config.pool_enabled:
+            self._pool = get_pool(
+                self.config.connect_kwargs(),
+                pool_size=self.config.pool_size,
+                timeout=self.config.pool_timeout,
+                health_check_interval=self.config.pool_health_check_interval
+            )
+
+    def _acquire_connection(self):
+        """クエリ実行用の接続を取得（プール有効時はプールから）"""
+        if self._pool is None:
+            return self.config.get_connection()
+        try:
+            return self._pool.acquire()
+        except Error as e:
+            st.error(f"❌ データベース接続エラー: {e}")
+            return None
+
+    def _release_connection(self, connection, discard=False):
+        """_acquire_connection() で取得した接続を返却"""
+        if self._pool is None:
+            connection.close()
+        else:
+            self._pool.release(connection, discard=discard)
+
+    def _rollback_and_release(self, connection):
+        """エラー時にロールバックして接続を返却（切断済みなら破棄）"""
+        try:
+            connection.rollback()
+        except Error:
+            self._release_connection(connection, discard=True)
+            return
+        self._release_connection(connection)
+
+    @contextmanager
+    def session(self):
+        """
+        現在のスレッドに接続を1本固定するコンテキスト
+        ワーカースレッド単位のチェックアウトやセッション変数の利用時に使用
+        """
+        if self._pool is None:
+            yield
+            return
+        with self._pool.thread_connection():
+            yield
+
+    def get_pool_stats(self):
+        """コネクションプールの統計を取得（プール無効時はNone）"""
+        return self._pool.stats() if self._pool else None
 
     def execute_query(self, query, params=None, fetch=True):
         """クエリを実行"""
-        connection = self.config.get_connection()
+        connection = self._acquire_connection()
         if not connection:
             return None
 
@@ -99,24 +169,46 @@ class DatabaseManager:
                 result = cursor.rowcount
 
             cursor.close()
-            connection.close()
+            self._release_connection(connection)
             return result
 
         except Error as e:
             st.error(f"❌ クエリ実行エラー: {e}")
-            if connection:
-                connection.rollback()
-                connection.close()
+            self._rollback_and_release(connection)
+            return None
+
+    def execute_insert(self, query, params=None):
+        """INSERTを実行して自動採番されたIDを返す（失敗時はNone）"""
+        connection = self._acquire_connection()
+        if not connection:
+            return None
+
+        try:
+            cursor = connection.cursor()
+            cursor.execute(query, params or ())
+            connection.commit()
+            last_id = cursor.lastrowid
+            cursor.close()
+            self._release_connection(connection)
+            return last_id
+
+        except Error as e:
+            st.error(f"❌ クエリ実行エラー: {e}")
+            self._rollback_and_release(connection)
             return None
 
     def execute_many(self, query, data_list):
-        """複数レコードを一括挿入"""
+        """
+        複数レコードを一括挿入
+        Returns:
+            影響を受けた行数（ON DUPLICATE KEY UPDATE で変更がなければ0）。接続エラー・SQLエラー時はNone
+        """
         if not data_list or len(data_list) == 0:
             return 0
 
-        connection = self.config.get_connection()
+        connection = self._acquire_connection()
         if not connection:
-            return False
+            return None
 
         try:
             cursor = connection.cursor()
@@ -124,7 +216,7 @@ class DatabaseManager:
             connection.commit()
             affected_rows = cursor.rowcount
             cursor.close()
-            connection.close()
+            self._release_connection(connection)
             return affected_rows
 
         except Error as e:
@@ -132,10 +224,120 @@ class DatabaseManager:
             st.error(f"❌ 一括挿入エラー: {e}")
             st.error(f"クエリ: {query[:100]}...")
             st.error(f"データサンプル: {data_list[0] if data_list else 'なし'}")
-            if connection:
-                connection.rollback()
-                connection.close()
+            self._rollback_and_release(connection)
+            return None
+
+    def bulk_load(self, table, columns, rows, update_columns):
+        """
+        LOAD DATA LOCAL INFILE で一時ステージングテーブルに流し込み、
+        1回のINSERT ... SELECT ... ON DUPLICATE KEY UPDATE で本テーブルにマージする
+
+        Args:
+            table: マージ先テーブル名
+            columns: rowsの列名リスト
+            rows: タプルのリスト
+            update_columns: 重複時に更新する列名リスト
+
+        Returns:
+            影響を受けた行数。LOAD DATAが使えない場合やマージに失敗した場合はNone
+            （呼び出し側でexecute_manyにフォールバックし、データのエラーはそちらの戻り値で判定する）
+        """
+        if not rows:
             return 0
+        if not self.config.local_infile_enabled:
+            return None
+
+        # 一時ファイルにタブ区切りで書き出し（NULLは\N、真偽値は1/0）
+        tmp = tempfile.NamedTemporaryFile('w', suffix='.tsv', delete=False, encoding='utf-8', newline='\n')
+        try:
+            with tmp:
+                for row in rows:
+                    tmp.write('\t'.join(self._to_infile_field(value) for value in row))
+                    tmp.write('\n')
+
+            connection = None
+            try:
+                connection = mysql.connector.connect(**self.config.connect_kwargs(), allow_local_infile=True)
+                cursor = connection.cursor()
+
+                staging = f"tmp_{table}_load"
+                column_list = ', '.join(columns)
+                update_list = ',\n                    '.join(f"{col} = VALUES({col})" for col in update_columns)
+                infile_path = tmp.name.replace('\\', '/')
+
+                cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging}")
+                cursor.execute(f"CREATE TEMPORARY TABLE {staging} LIKE {table}")
+                cursor.execute(f"""
+                    LOAD DATA LOCAL INFILE '{infile_path}'
+                    INTO TABLE {staging}
+                    CHARACTER SET utf8mb4
+                    FIELDS TERMINATED BY '\\t'
+                    LINES TERMINATED BY '\\n'
+                    ({column_list})
+                """)
+                cursor.execute(f"""
+                    INSERT INTO {table} ({column_list})
+                    SELECT {column_list} FROM {staging}
+                    ON DUPLICATE KEY UPDATE
+                    {update_list}
+                """)
+                affected_rows = cursor.rowcount
+                cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {staging}")
+                connection.commit()
+                cursor.close()
+                connection.close()
+                return affected_rows
+
+            except Error as e:
+                st.warning(f"⚠️ LOAD DATA LOCAL INFILE が使用できないため通常の一括挿入に切り替えます: {e}")
+                if connection:
+                    try:
+                        connection.rollback()
+                        connection.close()
+                    except Error:
+                        pass
+                return None
+        finally:
+            os.remove(tmp.name)
+
+    @staticmethod
+    def _to_infile_field(value):
+        """LOAD DATA用に値をテキスト化"""
+        if value is None:
+            return '\\N'
+        if isinstance(value, bool):
+            return '1' if value else '0'
+        return str(value)
+
+    def bulk_load_stock_prices(self, rows):
+        """
+        stock_pricesへLOAD DATAで一括マージ
+        Args:
+            rows: (ticker, date, open, high, low, close, volume) のリスト
+        Returns:
+            影響を受けた行数、またはNone（LOAD DATA不可）
+        """
+        return self.bulk_load(
+            'stock_prices',
+            ['ticker', 'date', 'open', 'high', 'low', 'close', 'volume'],
+            rows,
+            ['open', 'high', 'low', 'close', 'volume']
+        )
+
+    def bulk_load_dividends(self, rows):
+        """
+        dividendsへLOAD DATAで一括マージ
+        Args:
+            rows: (ticker, ex_date, amount, is_special) のリスト
+        Returns:
+            影響を受けた行数、またはNone（LOAD DATA不可）
+        """
+        return self.bulk_load(
+            'dividends',
+            ['ticker', 'ex_date', 'amount', 'is_special'],
+            rows,
+            ['amount', 'is_special']
+        )
 
     def get_dividends_history(self, stock_code: str):
         """
@@ -153,15 +355,191 @@ class DatabaseManager:
         """
         return self.execute_query(query, params=(stock_code,))
 
+    def get_latest_data_dates(self, stock_code: str):
+        """
+        特定の銘柄の最新株価日付・最新配当権利落ち日を取得
+        Args:
+            stock_code: 銘柄コード
+        Returns:
+            {'last_price_date': date or None, 'last_dividend_date': date or None}
+        """
+        query = """
+            SELECT
+                (SELECT MAX(date) FROM stock_prices WHERE ticker = %s) AS last_price_date,
+                (SELECT MAX(ex_date) FROM dividends WHERE ticker = %s) AS last_dividend_date
+        """
+        result = self.execute_query(query, params=(stock_code, stock_code))
+        if result:
+            return result[0]
+        return {'last_price_date': None, 'last_dividend_date': None}
+
+    def get_price_history(self, stock_code: str, start_date=None):
+        """
+        特定の銘柄の株価履歴を取得
+        Args:
+            stock_code: 銘柄コード
+            start_date: この日付以降を取得（Noneの場合は全期間）
+        Returns:
+            株価履歴のリスト
+        """
+        query = """
+            SELECT date, open, high, low, close, volume
+            FROM stock_prices
+            WHERE ticker = %s
+        """
+        params = [stock_code]
+        if start_date is not None:
+            query += " AND date >= %s"
+            params.append(start_date)
+        query += " ORDER BY date"
+        return self.execute_query(query, params=tuple(params))
+
     def get_stocks_list(self):
         """全銘柄リストを取得"""
         query = "SELECT ticker, name, sector, market FROM stocks ORDER BY ticker"
         return self.execute_query(query)
 
-    def get_screening_data(self, conditions=None):
-        """スクリーニング用データを取得"""
+    # screening_snapshot の列（v_screening_data + 最新決算日）
+    SCREENING_SNAPSHOT_COLUMNS = [
+        'ticker', 'name', 'sector', 'industry', 'market', 'market_cap', 'fiscal_date',
+        'per', 'pbr', 'roe', 'dividend_yield', 'dividend_rate', 'payout_ratio',
+        'profit_margin', 'revenue_growth',
+        'avg_dividend_yield', 'dividend_cv', 'dividend_trend', 'has_special_dividend',
+        'dividend_quality_score', 'current_dividend_yield', 'regular_dividend_yield',
+        'avg_per', 'min_per', 'max_per', 'per_cv', 'current_per', 'is_low_per',
+        'updated_at'
+    ]
+
+    SCREENING_SNAPSHOT_SELECT = """
+        SELECT
+            s.ticker, s.name, s.sector, s.industry, s.market, s.market_cap, latest.fiscal_date,
+            fm.per, fm.pbr, fm.roe, fm.dividend_yield, fm.dividend_rate, fm.payout_ratio,
+            fm.profit_margin, fm.revenue_growth,
+            da.avg_dividend_yield, da.dividend_cv, da.dividend_trend, da.has_special_dividend,
+            da.dividend_quality_score, da.current_dividend_yield, da.regular_dividend_yield,
+            pa.avg_per, pa.min_per, pa.max_per, pa.per_cv, pa.current_per, pa.is_low_per,
+            s.updated_at
+        FROM stocks s
+        LEFT JOIN (
+            SELECT ticker, MAX(fiscal_date) AS fiscal_date
+            FROM financial_metrics
+            {latest_filter}
+            GROUP BY ticker
+        ) latest ON s.ticker = latest.ticker
+        LEFT JOIN financial_metrics fm ON fm.ticker = latest.ticker
+            AND fm.fiscal_date = latest.fiscal_date
+        LEFT JOIN dividend_analysis da ON s.ticker = da.ticker
+        LEFT JOIN per_analysis pa ON s.ticker = pa.ticker
+        {stock_filter}
+    """
+
+    def refresh_screening_snapshot(self, tickers=None, chunk_size=500):
+        """
+        screening_snapshot を再構築（または指定銘柄のみ差分更新）
+
+        Args:
+            tickers: 更新する銘柄コードのリスト（Noneの場合は全件再構築）
+            chunk_size: 差分更新時に1文で処理する銘柄数
+
+        Returns:
+            更新した行数（失敗時はNone）
+        """
+        column_list = ', '.join(self.SCREENING_SNAPSHOT_COLUMNS)
+        # 再構築後に参照先を確認し直す
+        _snapshot_ready.discard(self._snapshot_key())
+
+        if tickers is None:
+            # 全件再構築: 削除済み銘柄の行も消すため、DELETEとINSERTを1つのトランザクションで入れ替える
+            # （コミットまで他の接続からは旧データが見え、INSERTに失敗した場合は旧データに戻る）
+            select = self.SCREENING_SNAPSHOT_SELECT.format(latest_filter='', stock_filter='')
+            connection = self._acquire_connection()
+            if not connection:
+                return None
+            try:
+                cursor = connection.cursor()
+                cursor.execute("DELETE FROM screening_snapshot")
+                cursor.execute(f"INSERT INTO screening_snapshot ({column_list}) {select}")
+                affected_rows = cursor.rowcount
+                connection.commit()
+                cursor.close()
+                self._release_connection(connection)
+                return affected_rows
+            except Error as e:
+                st.error(f"❌ スナップショット再構築エラー: {e}")
+                self._rollback_and_release(connection)
+                return None
+
+        tickers = list(tickers)
+        if not tickers:
+            return 0
+
+        update_list = ', '.join(
+            f"{col} = VALUES({col})" for col in self.SCREENING_SNAPSHOT_COLUMNS if col != 'ticker'
+        )
+        total = 0
+        for start in range(0, len(tickers), chunk_size):
+            chunk = tickers[start:start + chunk_size]
+            placeholders = ', '.join(['%s'] * len(chunk))
+            select = self.SCREENING_SNAPSHOT_SELECT.format(
+                latest_filter=f"WHERE ticker IN ({placeholders})",
+                stock_filter=f"WHERE s.ticker IN ({placeholders})"
+            )
+            query = f"""
+                INSERT INTO screening_snapshot ({column_list}) {select}
+                ON DUPLICATE KEY UPDATE {update_list}
+            """
+            affected_rows = self.execute_query(query, params=tuple(chunk) * 2, fetch=False)
+            if affected_rows is None:
+                return None
+            total += affected_rows
+        return total
+
+    def _snapshot_key(self):
+        """スナップショット確認結果のキャッシュキー"""
+        return (self.config.host, self.config.port, self.config.database)
+
+    def _screening_source(self):
+        """
+        スクリーニングの参照先（スナップショットが未作成/空の場合はビュー）
+        スナップショットを参照できると確認できた後はプロセス内でキャッシュし、問い合わせを省く
+        """
+        key = self._snapshot_key()
+        if key in _snapshot_ready:
+            return 'screening_snapshot'
         query = """
-        SELECT * FROM v_screening_data
+            SELECT COUNT(*) AS cnt FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'screening_snapshot'
+        """
+        result = self.execute_query(query)
+        if result and result[0]['cnt'] > 0:
+            if self.execute_query("SELECT 1 AS found FROM screening_snapshot LIMIT 1"):
+                _snapshot_ready.add(key)
+                return 'screening_snapshot'
+        return 'v_screening_data'
+
+    def get_screening_data(self, conditions=None, use_engine=None):
+        """
+        スクリーニング用データを取得（screening_snapshot を参照）
+        Args:
+            conditions: 条件辞書
+            use_engine: Trueの場合はインメモリエンジンで絞り込む（Noneの場合は設定値）
+        Returns:
+            行辞書のリスト
+        """
+        if use_engine is None:
+            use_engine = APP_CONFIG.screening_engine_enabled
+        if use_engine:
+            from services.screening_engine import get_screening_engine
+            engine = get_screening_engine(self, APP_CONFIG.screening_version_check_interval)
+            rows = engine.screen(conditions)
+            if rows is not None:
+                return rows
+            # エンジンがまだ読み込めていない場合はSQLで絞り込む
+
+        # v_screening_data と同じ列だけを返す（fiscal_date等のスナップショット管理列は除く）
+        view_columns = ', '.join(col for col in self.SCREENING_SNAPSHOT_COLUMNS if col != 'fiscal_date')
+        query = f"""
+        SELECT {view_columns} FROM {self._screening_source()}
         WHERE 1=1
         """
         params = []
@@ -48,6 +48,20 @@ CREATE TABLE IF NOT EXISTS financial_metrics (
     INDEX idx_per (per)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='財務指標（年次）';
 
+-- 2-2. EPS履歴テーブル（年次）
+-- 年次損益計算書の1株当たり利益。各年末時点で公表済みだったEPSでPERを計算する（時点PER）
+CREATE TABLE IF NOT EXISTS eps_history (
+    ticker VARCHAR(10) NOT NULL COMMENT '銘柄コード',
+    fiscal_date DATE NOT NULL COMMENT '決算日',
+    eps DECIMAL(15,4) NOT NULL COMMENT '1株当たり利益（希薄化後、なければ純利益/期中平均株式数）',
+    net_income BIGINT COMMENT '純利益',
+    shares BIGINT COMMENT '期中平均株式数',
+    source VARCHAR(20) DEFAULT 'yfinance' COMMENT '取得元（yfinance / edinet）',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (ticker, fiscal_date),
+    FOREIGN KEY (ticker) REFERENCES stocks(ticker) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='EPS履歴（年次）';
+
 -- 3. 配当履歴テーブル
 CREATE TABLE IF NOT EXISTS dividends (
     id BIGINT AUTO_INCREMENT PRIMARY KEY,
@@ -63,6 +77,21 @@ CREATE TABLE IF NOT EXISTS dividends (
     INDEX idx_ex_date (ex_date)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='配当履歴';
 
+-- 3-2. 年次配当テーブル（配当履歴から派生）
+-- 銘柄・年ごとの配当合計・通常配当合計・特別配当回数・支払回数。配当の保存時に該当年だけ集計し直す
+CREATE TABLE IF NOT EXISTS yearly_dividends (
+    ticker VARCHAR(10) NOT NULL COMMENT '銘柄コード',
+    year SMALLINT NOT NULL COMMENT '年（権利落ち日の年）',
+    total DECIMAL(12,2) NOT NULL COMMENT '年間配当合計',
+    regular_total DECIMAL(12,2) NOT NULL COMMENT '通常配当合計（特別配当除く）',
+    special_count INT NOT NULL DEFAULT 0 COMMENT '特別配当の回数',
+    payments INT NOT NULL COMMENT '支払回数',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (ticker, year),
+    FOREIGN KEY (ticker) REFERENCES stocks(ticker) ON DELETE CASCADE,
+    INDEX idx_year (year)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='年次配当（配当履歴から派生）';
+
 -- 4. 株価履歴テーブル（日次）
 CREATE TABLE IF NOT EXISTS stock_prices (
     id BIGINT AUTO_INCREMENT PRIMARY KEY,
@@ -80,6 +109,17 @@ CREATE TABLE IF NOT EXISTS stock_prices (
     INDEX idx_date (date)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='株価履歴（日次）';
 
+-- 4-2. 年末終値テーブル（株価履歴から派生）
+-- 銘柄・年ごとの最終取引日の終値。年末時点のPER・配当利回りを日次株価の走査なしで参照する
+CREATE TABLE IF NOT EXISTS year_end_prices (
+    ticker VARCHAR(10) NOT NULL COMMENT '銘柄コード',
+    year SMALLINT NOT NULL COMMENT '年',
+    date DATE NOT NULL COMMENT 'その年の最終取引日',
+    close DECIMAL(10,2) COMMENT '最終取引日の終値',
+    PRIMARY KEY (ticker, year),
+    FOREIGN KEY (ticker) REFERENCES stocks(ticker) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='年末終値（株価履歴から派生）';
+
 -- 5. 配当分析結果テーブル（計算済みデータ）
 CREATE TABLE IF NOT EXISTS dividend_analysis (
     ticker VARCHAR(10) PRIMARY KEY COMMENT '銘柄コード',
@@ -156,7 +196,7 @@ CREATE TABLE IF NOT EXISTS update_history (
     id BIGINT AUTO_INCREMENT PRIMARY KEY,
     update_type VARCHAR(50) NOT NULL COMMENT '更新タイプ（full/incremental/single）',
     ticker VARCHAR(10) COMMENT '銘柄コード（単一更新の場合）',
-    status VARCHAR(20) NOT NULL COMMENT 'ステータス（success/failed/running）',
+    status VARCHAR(20) NOT NULL COMMENT 'ステータス（success/partial/failed/running）',
     records_updated INT DEFAULT 0 COMMENT '更新レコード数',
     error_message TEXT COMMENT 'エラーメッセージ',
     started_at TIMESTAMP NOT NULL COMMENT '開始日時',
@@ -166,7 +206,132 @@ CREATE TABLE IF NOT EXISTS update_history (
     INDEX idx_started_at (started_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='データ更新履歴';
 
+-- 8. スクリーニング用スナップショットテーブル（v_screening_data の実体化）
+-- 更新処理の最後に再構築/銘柄単位で差分更新する
+CREATE TABLE IF NOT EXISTS screening_snapshot (
+    ticker VARCHAR(10) PRIMARY KEY COMMENT '銘柄コード',
+    name VARCHAR(100) COMMENT '銘柄名',
+    sector VARCHAR(100) COMMENT 'セクター',
+    industry VARCHAR(100) COMMENT '業種',
+    market VARCHAR(50) COMMENT '市場区分',
+    market_cap BIGINT COMMENT '時価総額',
+    fiscal_date DATE COMMENT '財務指標の決算日（最新）',
+    per DECIMAL(10,2) COMMENT 'PER',
+    pbr DECIMAL(10,2) COMMENT 'PBR',
+    roe DECIMAL(10,4) COMMENT 'ROE',
+    dividend_yield DECIMAL(10,4) COMMENT '配当利回り(%)',
+    dividend_rate DECIMAL(10,2) COMMENT '年間配当金',
+    payout_ratio DECIMAL(10,4) COMMENT '配当性向',
+    profit_margin DECIMAL(10,4) COMMENT '利益率',
+    revenue_growth DECIMAL(10,4) COMMENT '売上高成長率',
+    avg_dividend_yield DECIMAL(10,4) COMMENT '平均配当利回り',
+    dividend_cv DECIMAL(10,4) COMMENT '配当変動係数',
+    dividend_trend DECIMAL(10,4) COMMENT '配当トレンド',
+    has_special_dividend BOOLEAN COMMENT '特別配当有無',
+    dividend_quality_score INT COMMENT '配当クオリティスコア',
+    current_dividend_yield DECIMAL(10,4) COMMENT '最新配当利回り',
+    regular_dividend_yield DECIMAL(10,4) COMMENT '通常配当利回り',
+    avg_per DECIMAL(10,2) COMMENT '平均PER',
+    min_per DECIMAL(10,2) COMMENT '最小PER',
+    max_per DECIMAL(10,2) COMMENT '最大PER',
+    per_cv DECIMAL(10,4) COMMENT 'PER変動係数',
+    current_per DECIMAL(10,2) COMMENT '最新PER',
+    is_low_per BOOLEAN COMMENT '割安フラグ',
+    updated_at TIMESTAMP NULL COMMENT '銘柄情報の更新日時',
+    refreshed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT 'スナップショット更新日時',
+    FOREIGN KEY (ticker) REFERENCES stocks(ticker) ON DELETE CASCADE,
+    -- get_screening_data の絞り込み条件に対応する複合インデックス
+    INDEX idx_market_quality (market, dividend_quality_score),
+    INDEX idx_quality_per (dividend_quality_score, per),
+    INDEX idx_dividend_yield (dividend_yield, dividend_quality_score),
+    INDEX idx_avg_dividend_yield (avg_dividend_yield, dividend_quality_score),
+    INDEX idx_regular_dividend_yield (regular_dividend_yield, dividend_quality_score),
+    INDEX idx_per_pbr (per, pbr),
+    INDEX idx_avg_per_cv (avg_per, per_cv),
+    INDEX idx_low_per_avg (is_low_per, avg_per)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='スクリーニング用スナップショット';
+
+-- 9. 更新ジョブの銘柄別進捗テーブル
+-- 全銘柄更新を update_history の1行＋銘柄ごとの進捗行で記録し、中断時は未完了・失敗分のみ再開する
+CREATE TABLE IF NOT EXISTS update_progress (
+    update_id BIGINT NOT NULL COMMENT '更新履歴ID',
+    ticker VARCHAR(10) NOT NULL COMMENT '銘柄コード',
+    name VARCHAR(100) COMMENT '銘柄名',
+    status VARCHAR(20) NOT NULL DEFAULT 'pending' COMMENT 'ステータス（pending/success/failed）',
+    attempts INT DEFAULT 0 COMMENT '試行回数',
+    error_message TEXT COMMENT 'エラーメッセージ',
+    lease_owner VARCHAR(100) COMMENT '処理中のワーカー（リース保持者）',
+    lease_expires_at TIMESTAMP NULL COMMENT 'リース期限（過ぎたら他のワーカーが取り直す）',
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP COMMENT '更新日時',
+    PRIMARY KEY (update_id, ticker),
+    FOREIGN KEY (update_id) REFERENCES update_history(id) ON DELETE CASCADE,
+    INDEX idx_update_status (update_id, status),
+    INDEX idx_lease_owner (lease_owner)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='更新ジョブの銘柄別進捗';
+
+-- 10. 更新ジョブキューテーブル
+-- 画面はジョブを登録して状態を参照するだけにし、実際の更新は scripts/update_worker.py が別プロセスで実行する
+CREATE TABLE IF NOT EXISTS update_jobs (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    job_type VARCHAR(30) NOT NULL COMMENT 'ジョブ種別（full/incremental/resume/retry_failed）',
+    params TEXT COMMENT 'ジョブ引数（JSON）',
+    status VARCHAR(20) NOT NULL DEFAULT 'queued' COMMENT 'ステータス（queued/running/success/partial/failed/cancelled）',
+    update_id BIGINT COMMENT '更新履歴ID（update_history.id）',
+    total INT DEFAULT 0 COMMENT '対象銘柄数',
+    processed INT DEFAULT 0 COMMENT '処理済み銘柄数',
+    success_count INT DEFAULT 0 COMMENT '成功数',
+    error_count INT DEFAULT 0 COMMENT '失敗数',
+    message TEXT COMMENT '結果・エラーメッセージ',
+    worker VARCHAR(100) COMMENT '実行中のワーカー（ホスト名:PID:トークン）',
+    cancel_requested BOOLEAN DEFAULT FALSE COMMENT '中止要求',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '登録日時',
+    started_at TIMESTAMP NULL COMMENT '開始日時',
+    heartbeat_at TIMESTAMP NULL COMMENT '最終進捗日時',
+    completed_at TIMESTAMP NULL COMMENT '完了日時',
+    INDEX idx_status_id (status, id),
+    INDEX idx_worker (worker)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='更新ジョブキュー';
+
+-- 11. 更新ワーカー登録テーブル
+-- 稼働中のワーカーをハートビートで管理し、送信元（egress）ごとのレート予算を稼働数で分け合う
+CREATE TABLE IF NOT EXISTS update_workers (
+    worker VARCHAR(100) PRIMARY KEY COMMENT 'ワーカー名（ホスト名:PID:トークン）',
+    host VARCHAR(100) COMMENT 'ホスト名',
+    pid INT COMMENT 'プロセスID',
+    egress VARCHAR(100) NOT NULL COMMENT '送信元の識別名（同じ値のワーカーでレート予算を共有）',
+    job_id BIGINT COMMENT '処理中のジョブID',
+    rate_share DECIMAL(10,4) COMMENT '割り当てられた最大レート（回/秒）',
+    processed INT DEFAULT 0 COMMENT '処理した銘柄数',
+    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP COMMENT '起動日時',
+    heartbeat_at TIMESTAMP NULL COMMENT '最終ハートビート',
+    INDEX idx_egress_heartbeat (egress, heartbeat_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='更新ワーカー';
+
+-- 12. EDINET書類一覧インデックステーブル
+-- 日付ごとの書類一覧（documents.json）を保存し、企業ごとの書類を証券コード・EDINETコードで検索する
+CREATE TABLE IF NOT EXISTS edinet_documents (
+    doc_id VARCHAR(8) PRIMARY KEY COMMENT '書類管理番号（docID）',
+    filing_date DATE NOT NULL COMMENT '書類一覧の日付（提出日）',
+    sec_code VARCHAR(5) COMMENT '証券コード（5桁）',
+    edinet_code VARCHAR(6) COMMENT 'EDINETコード',
+    doc_type_code VARCHAR(3) COMMENT '書類種類コード',
+    period_end DATE COMMENT '期間（至）',
+    filer_name VARCHAR(255) COMMENT '提出者名',
+    INDEX idx_sec_code (sec_code, filing_date),
+    INDEX idx_edinet_code (edinet_code, filing_date),
+    INDEX idx_filing_date (filing_date)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='EDINET書類一覧インデックス';
+
+-- 12-2. EDINET書類一覧の取り込み済み日付テーブル
+-- 翌日以降に取り込んだ日付は取得済みとして扱い、差分更新で取得し直さない
+CREATE TABLE IF NOT EXISTS edinet_index_dates (
+    filing_date DATE PRIMARY KEY COMMENT '書類一覧の日付',
+    document_count INT NOT NULL DEFAULT 0 COMMENT '書類数',
+    indexed_at TIMESTAMP NOT NULL COMMENT '取り込み日時'
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COMMENT='EDINET書類一覧の取り込み済み日付';
+
 -- ビュー: スクリーニング用の統合ビュー
+-- 最新決算は銘柄ごとのMAX(fiscal_date)を1回集計して結合（相関サブクエリを使わない）
 CREATE OR REPLACE VIEW v_screening_data AS
 SELECT
     s.ticker,
@@ -198,11 +363,16 @@ SELECT
     pa.is_low_per,
     s.updated_at
 FROM stocks s
-LEFT JOIN financial_metrics fm ON s.ticker = fm.ticker
-    AND fm.fiscal_date = (SELECT MAX(fiscal_date) FROM financial_metrics WHERE ticker = s.ticker)
+LEFT JOIN (
+    SELECT ticker, MAX(fiscal_date) AS fiscal_date
+    FROM financial_metrics
+    GROUP BY ticker
+) latest ON s.ticker = latest.ticker
+LEFT JOIN financial_metrics fm ON fm.ticker = latest.ticker
+    AND fm.fiscal_date = latest.fiscal_date
 LEFT JOIN dividend_analysis da ON s.ticker = da.ticker
 LEFT JOIN per_analysis pa ON s.ticker = pa.ticker;
 
 -- 初期データ確認用クエリ
 -- SELECT * FROM stocks LIMIT 10;
--- SELECT * FROM v_screening_data WHERE dividend_yield > 3.0 ORDER BY dividend_quality_score DESC LIMIT 20;
+-- SELECT * FROM screening_snapshot WHERE dividend_yield > 3.0 ORDER BY dividend_quality_score DESC LIMIT 20;
@@ -0,0 +1,308 @@
+"""
+段階型の銘柄更新パイプライン
+取得（yfinance・DBの読み込み）→ 計算（pandasの分析）→ 書き込み（テーブルごとの一括保存）を
+別スレッドのステージに分け、上限付きキューでつなぐ。ネットワーク待ち・CPU処理・DB書き込みが重なって進み、
+書き込みは複数銘柄の行をまとめて1テーブル1回の executemany にする。
+ステージごとの処理速度と入力キューの滞留数を記録し、どこが律速になっているかを確認できる。
+"""
+
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import APP_CONFIG
+
+# キューの終端を示す値
+_DONE = object()
+
+
+class StageStats:
+    """1ステージの処理件数・稼働時間・入力キューの滞留数（スレッドセーフ）"""
+
+    def __init__(self, name: str, workers: int, input_queue: Optional[queue.Queue] = None):
+        """
+        初期化
+        Args:
+            name: ステージ名
+            workers: スレッド数
+            input_queue: 入力キュー（滞留数を記録する）
+        """
+        self.name = name
+        self.workers = workers
+        self.input_queue = input_queue
+        self.processed = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.max_queue_depth = 0
+        self._lock = threading.Lock()
+
+    def record(self, busy_seconds: float, count: int = 1, errors: int = 0):
+        """処理を記録"""
+        with self._lock:
+            self.processed += count
+            self.errors += errors
+            self.busy_seconds += busy_seconds
+            if self.input_queue is not None:
+                self.max_queue_depth = max(self.max_queue_depth, self.input_queue.qsize())
+
+    def to_dict(self, elapsed: float) -> Dict[str, Any]:
+        """
+        統計を辞書に変換
+        Args:
+            elapsed: パイプラインの経過秒数
+        Returns:
+            {'workers', 'processed', 'errors', 'per_second', 'busy_ratio', 'queue_depth', 'max_queue_depth'}
+        """
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'processed': self.processed,
+                'errors': self.errors,
+                'per_second': self.processed / elapsed if elapsed > 0 else 0.0,
+                # 全スレッドが処理中だった時間の割合（1に近いステージが律速）
+                'busy_ratio': self.busy_seconds / (elapsed * self.workers) if elapsed > 0 else 0.0,
+                'queue_depth': self.input_queue.qsize() if self.input_queue is not None else 0,
+                'max_queue_depth': self.max_queue_depth,
+            }
+
+
+class UpdatePipeline:
+    """
+    StockDataUpdater の fetch_stock / compute_stock_rows / write_stock_rows をステージとして並べるパイプライン
+
+    on_result は呼び出し元のスレッドで呼ばれるため、Streamlitの進捗表示をそのまま行える。
+    """
+
+    STAGES = ('fetch', 'compute', 'write')
+    STAGE_LABELS = {'fetch': '取得', 'compute': '計算', 'write': '書き込み'}
+
+    def __init__(self, updater, fetch_workers: int = 5, compute_workers: Optional[int] = None,
+                 queue_size: Optional[int] = None, write_batch_size: Optional[int] = None,
+                 flush_interval: Optional[float] = None):
+        """
+        初期化
+        Args:
+            updater: StockDataUpdater
+            fetch_workers: 取得ステージのスレッド数
+            compute_workers: 計算ステージのスレッド数（Noneの場合は設定値）
+            queue_size: ステージ間キューの上限（Noneの場合は設定値）
+            write_batch_size: 1回の書き込みにまとめる銘柄数（Noneの場合は設定値）
+            flush_interval: バッチが揃わなくても書き込む間隔（秒、Noneの場合は設定値）
+        """
+        self.updater = updater
+        self.fetch_workers = max(1, fetch_workers)
+        self.compute_workers = max(1, compute_workers or APP_CONFIG.update_compute_workers)
+        self.queue_size = queue_size or APP_CONFIG.update_queue_size
+        self.write_batch_size = max(1, write_batch_size or APP_CONFIG.update_write_batch_size)
+        self.flush_interval = flush_interval or APP_CONFIG.update_flush_interval
+
+        self._stats: Dict[str, StageStats] = {}
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+        self.batches = 0
+        self.rows_written = 0
+
+    def run(self, stock_list: Dict[str, str], incremental: bool = False, tracker=None,
+            on_result: Optional[Callable[[str, str, bool, Optional[str]], bool]] = None) -> List[str]:
+        """
+        全銘柄をパイプラインで更新
+        Args:
+            stock_list: {ticker: name} の辞書
+            incremental: Trueの場合、株価・配当は差分のみ取得
+            tracker: UpdateJobTracker（指定時は書き込みごとに結果をまとめて記録）
+            on_result: 銘柄の結果通知 (ticker, name, 成功したか, エラー) -> Falseで中止
+                       （未着手の銘柄は取得せず、処理中の銘柄は最後まで書き込む）
+        Returns:
+            保存に成功した銘柄コードのリスト
+        """
+        tickers = queue.Queue()
+        for item in stock_list.items():
+            tickers.put(item)
+        fetched = queue.Queue(maxsize=self.queue_size)
+        computed = queue.Queue(maxsize=self.queue_size)
+        results = queue.Queue()
+        stop = threading.Event()
+
+        self._stats = {
+            'fetch': StageStats('fetch', self.fetch_workers, tickers),
+            'compute': StageStats('compute', self.compute_workers, fetched),
+            'write': StageStats('write', 1, computed),
+        }
+        self.batches = 0
+        self.rows_written = 0
+        self._started_at = time.monotonic()
+        self._finished_at = None
+
+        fetchers = self._start(self.fetch_workers, self._fetch_loop, tickers, fetched, incremental, stop)
+        computers = self._start(self.compute_workers, self._compute_loop, fetched, computed)
+        writer = self._start(1, self._write_loop, computed, results, tracker)
+        # 前段のスレッドがすべて終わったら、次段のスレッド数だけ終端を送る
+        self._start(1, self._close_after, fetchers, fetched, self.compute_workers)
+        self._start(1, self._close_after, computers, computed, 1)
+
+        updated_tickers = []
+        while True:
+            result = results.get()
+            if result is _DONE:
+                break
+            ticker, name, success, error = result
+            if success:
+                updated_tickers.append(ticker)
+            if on_result is not None and on_result(ticker, name, success, error) is False:
+                stop.set()
+
+        for thread in writer:
+            thread.join()
+        self._finished_at = time.monotonic()
+        return updated_tickers
+
+    @staticmethod
+    def _start(count: int, target: Callable, *args) -> List[threading.Thread]:
+        """ステージのスレッドを起動"""
+        threads = [threading.Thread(target=target, args=args, daemon=True) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads
+
+    @staticmethod
+    def _close_after(threads: List[threading.Thread], output: queue.Queue, consumers: int):
+        """前段のスレッドの終了を待ち、次段に終端を送る"""
+        for thread in threads:
+            thread.join()
+        for _ in range(consumers):
+            output.put(_DONE)
+
+    def _fetch_loop(self, tickers: queue.Queue, output: queue.Queue, incremental: bool, stop: threading.Event):
+        """取得ステージ: yfinance・DBから読み込み、計算ステージへ渡す"""
+        stats = self._stats['fetch']
+        while not stop.is_set():
+            try:
+                ticker, name = tickers.get_nowait()
+            except queue.Empty:
+                return
+            started = time.monotonic()
+            try:
+                fetched, error = self.updater.fetch_stock(ticker, name, incremental=incremental)
+            except Exception as e:
+                fetched, error = None, f"予期しないエラー: {str(e)[:50]}"
+            stats.record(time.monotonic() - started, errors=int(error is not None))
+            # 失敗した銘柄も書き込みステージで結果を記録するため、そのまま流す
+            output.put((ticker, name, fetched, error))
+
+    def _compute_loop(self, source: queue.Queue, output: queue.Queue):
+        """計算ステージ: 保存する行と分析結果を計算し、書き込みステージへ渡す"""
+        stats = self._stats['compute']
+        while True:
+            item = source.get()
+            if item is _DONE:
+                return
+            ticker, name, fetched, error = item
+            rows = None
+            started = time.monotonic()
+            if error is None:
+                try:
+                    rows = self.updater.compute_stock_rows(fetched)
+                except Exception as e:
+                    error = f"予期しないエラー: {str(e)[:50]}"
+                stats.record(time.monotonic() - started, errors=int(error is not None))
+            output.put((ticker, name, rows, error))
+
+    def _write_loop(self, source: queue.Queue, results: queue.Queue, tracker):
+        """書き込みステージ: 複数銘柄の行をまとめて保存し、結果を記録する"""
+        pending = []
+        last_flush = time.monotonic()
+        # 書き込みスレッドに接続を1本固定する
+        with self.updater.db.session():
+            while True:
+                timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+                try:
+                    item = source.get(timeout=timeout)
+                except queue.Empty:
+                    item = None
+
+                if item is _DONE:
+                    self._flush(pending, results, tracker)
+                    break
+                if item is not None:
+                    pending.append(item)
+                ready = sum(1 for _, _, rows, _ in pending if rows is not None)
+                if ready >= self.write_batch_size or (pending and time.monotonic() - last_flush >= self.flush_interval):
+                    self._flush(pending, results, tracker)
+                    pending = []
+                    last_flush = time.monotonic()
+        results.put(_DONE)
+
+    def _flush(self, pending: List[Tuple], results: queue.Queue, tracker):
+        """溜まった銘柄の行をテーブルごとに1回で保存し、結果を通知"""
+        if not pending:
+            return
+        stats = self._stats['write']
+        started = time.monotonic()
+
+        merged: Dict[str, list] = {}
+        for _, _, rows, error in pending:
+            if error is None and rows is not None:
+                for table, table_rows in rows.items():
+                    merged.setdefault(table, []).extend(table_rows)
+
+        write_error = None
+        if merged:
+            try:
+                self.updater.write_stock_rows(merged)
+                self.batches += 1
+                self.rows_written += sum(len(table_rows) for table_rows in merged.values())
+            except Exception as e:
+                write_error = f"保存エラー: {str(e)[:50]}"
+
+        outcomes = []
+        for ticker, name, rows, error in pending:
+            if error is None and write_error is not None:
+                error = write_error
+            outcomes.append((ticker, name, error is None, error))
+        if tracker is not None:
+            tracker.mark_many([(ticker, success, error) for ticker, _, success, error in outcomes])
+        stats.record(time.monotonic() - started, count=len(pending),
+                     errors=sum(1 for outcome in outcomes if not outcome[2]))
+
+        for outcome in outcomes:
+            results.put(outcome)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        ステージごとの統計を取得（実行中でも取得できる）
+        Returns:
+            {'elapsed', 'batches', 'rows_written', 'bottleneck', 'stages': {ステージ名: StageStats.to_dict()}}
+        """
+        if self._started_at is None:
+            return {'elapsed': 0.0, 'batches': 0, 'rows_written': 0, 'bottleneck': None, 'stages': {}}
+        elapsed = (self._finished_at or time.monotonic()) - self._started_at
+        stages = {name: self._stats[name].to_dict(elapsed) for name in self.STAGES}
+        return {
+            'elapsed': elapsed,
+            'batches': self.batches,
+            'rows_written': self.rows_written,
+            'bottleneck': max(stages, key=lambda name: stages[name]['busy_ratio']),
+            'stages': stages,
+        }
+
+    @classmethod
+    def format_stats(cls, stats: Dict[str, Any]) -> List[str]:
+        """
+        統計を表示用の文字列に変換
+        Args:
+            stats: stats() の戻り値
+        Returns:
+            1ステージ1行の文字列リスト
+        """
+        lines = []
+        for name, stage in stats.get('stages', {}).items():
+            lines.append(
+                f"{cls.STAGE_LABELS[name]}（{stage['workers']}並列）: {stage['processed']}件 "
+                f"{stage['per_second']:.2f}件/秒 稼働率{stage['busy_ratio'] * 100:.0f}% "
+                f"キュー{stage['queue_depth']}（最大{stage['max_queue_depth']}）"
+            )
+        if stats.get('bottleneck'):
+            lines.append(f"律速: {cls.STAGE_LABELS[stats['bottleneck']]}"
+                         f"（書き込み {stats['batches']}回・{stats['rows_written']}行）")
+        return lines
@@ -0,0 +1,134 @@
+"""
+年次配当の集計と配当成長指標（CAGR・連続増配年数）の計算
+1銘柄の配当Seriesでも、dividendsテーブル全体の縦持ちDataFrameでも同じ年次集計から計算する
+Streamlitに依存しないため、ワーカープロセスからも import できる
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def yearly_dividends(dividends):
+    """
+    配当Seriesを年ごとに集計
+
+    Args:
+        dividends: 配当履歴（権利落ち日インデックスのSeries）
+
+    Returns:
+        年をインデックスとするDataFrame（列: dividend=年間配当合計, payments=支払回数。年の昇順）
+    """
+    if dividends is None or len(dividends) == 0:
+        return pd.DataFrame({'dividend': pd.Series(dtype='float64'), 'payments': pd.Series(dtype='int64')},
+                            index=pd.Index([], name='year'))
+
+    years = pd.DatetimeIndex(dividends.index).year
+    grouped = pd.Series(dividends.to_numpy(dtype='float64'), index=years).groupby(level=0)
+    result = pd.DataFrame({'dividend': grouped.sum(), 'payments': grouped.size()})
+    result.index.name = 'year'
+    return result
+
+
+def yearly_dividends_panel(dividends):
+    """
+    縦持ちの配当を銘柄・年ごとに集計（yearly_dividends のパネル版）
+
+    Args:
+        dividends: 配当の縦持ちDataFrame（列: ticker, date, amount）
+
+    Returns:
+        (ticker, year) をインデックスとするDataFrame（列: dividend, payments。銘柄・年の昇順）
+    """
+    if dividends is None or len(dividends) == 0:
+        index = pd.MultiIndex.from_arrays([[], []], names=['ticker', 'year'])
+        return pd.DataFrame({'dividend': pd.Series(dtype='float64'), 'payments': pd.Series(dtype='int64')},
+                            index=index)
+
+    frame = pd.DataFrame({
+        'ticker': dividends['ticker'].to_numpy(),
+        'year': pd.DatetimeIndex(pd.to_datetime(dividends['date'])).year,
+        'amount': dividends['amount'].to_numpy(dtype='float64'),
+    })
+    grouped = frame.groupby(['ticker', 'year'], sort=True)['amount']
+    return pd.DataFrame({'dividend': grouped.sum(), 'payments': grouped.size()})
+
+
+def dividend_growth_panel(yearly, years=5):
+    """
+    年次配当から配当CAGRと連続増配年数を全銘柄まとめて計算
+
+    Args:
+        yearly: yearly_dividends_panel() の戻り値（(ticker, year) のインデックス、列: dividend, payments）
+        years: CAGRの計算期間（年）
+
+    Returns:
+        銘柄コードをインデックスとするDataFrame
+        （列: cagr=直近N年の配当CAGR(%)、計算できない場合はNaN / consecutive_increases=連続増配年数）
+    """
+    if len(yearly) == 0:
+        return pd.DataFrame({'cagr': pd.Series(dtype='float64'), 'consecutive_increases': pd.Series(dtype='int64')},
+                            index=pd.Index([], name='ticker'))
+
+    grouped = yearly['dividend'].groupby(level='ticker', sort=True)
+
+    # 連続増配年数: 前年より増えた年を1、それ以外（各銘柄の最初の年を含む）を0として、
+    # 最新年から遡った累積積の合計 = 最新年から途切れずに続く増配の年数
+    increased = (grouped.diff() > 0).astype('int64')
+    streak = increased.iloc[::-1].groupby(level='ticker', sort=True).cumprod()
+    consecutive = streak.groupby(level='ticker', sort=True).sum()
+
+    # CAGR: 直近N年の最初と最後の年間配当から計算。年数・支払回数がN未満、最初の年が0以下は計算しない
+    recent = yearly.groupby(level='ticker', sort=True).tail(years)['dividend']
+    recent_grouped = recent.groupby(level='ticker', sort=True)
+    first, last = recent_grouped.first(), recent_grouped.last()
+    year_count = grouped.size()
+    payment_count = yearly['payments'].groupby(level='ticker', sort=True).sum()
+    valid = (year_count >= years) & (payment_count >= years) & (first > 0)
+    if years > 1:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cagr = ((last / first) ** (1 / (years - 1)) - 1) * 100
+    else:
+        cagr = pd.Series(np.nan, index=first.index)
+
+    return pd.DataFrame({
+        'cagr': cagr.where(valid),
+        'consecutive_increases': consecutive.astype('int64'),
+    })
+
+
+def dividend_cagr(yearly, years=5):
+    """
+    1銘柄の年次配当から配当CAGRを計算
+
+    Args:
+        yearly: yearly_dividends() の戻り値
+        years: 計算期間（年）
+
+    Returns:
+        CAGR（%）またはNone
+    """
+    if len(yearly) == 0:
+        return None
+    growth = dividend_growth_panel(_single_ticker(yearly), years=years)
+    value = growth['cagr'].iloc[0]
+    return None if pd.isna(value) else float(value)
+
+
+def consecutive_increases(yearly):
+    """
+    1銘柄の年次配当から連続増配年数を計算
+
+    Args:
+        yearly: yearly_dividends() の戻り値
+
+    Returns:
+        連続増配年数
+    """
+    if len(yearly) < 2:
+        return 0
+    return int(dividend_growth_panel(_single_ticker(yearly))['consecutive_increases'].iloc[0])
+
+
+def _single_ticker(yearly):
+    """1銘柄の年次配当をパネル形式（ticker, year のインデックス）に変換"""
+    return yearly.set_index(pd.MultiIndex.from_product([[''], yearly.index], names=['ticker', 'year']))
@@ -0,0 +1,503 @@
+"""
+過去データに基づく配当・PER指標の計算
+stock_analysis_app（画面）・データ更新・リアルタイムスクリーニングで共通利用する
+Streamlitに依存しないため、ワーカープロセスからも import できる
+"""
+
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+
+
+def calculate_historical_dividend_yield(ticker_obj, dividends, hist_prices, years=5):
+    """過去N年の配当利回りを計算（トレンド分析と特別配当検出付き）"""
+    try:
+        if dividends is None or len(dividends) == 0 or hist_prices is None or len(hist_prices) == 0:
+            return None, None, None, None, None
+
+        # タイムゾーン情報を削除（yfinanceのデータはUTC、datetime.now()はnaive）
+        dividends = dividends.copy()
+        hist_prices = hist_prices.copy()
+        if hasattr(dividends.index, 'tz') and dividends.index.tz is not None:
+            dividends.index = dividends.index.tz_localize(None)
+        if hasattr(hist_prices.index, 'tz') and hist_prices.index.tz is not None:
+            hist_prices.index = hist_prices.index.tz_localize(None)
+
+        # 過去N年分のデータを取得
+        cutoff_date = datetime.now() - timedelta(days=365 * years)
+        recent_dividends = dividends[dividends.index >= cutoff_date]
+
+        if len(recent_dividends) == 0:
+            return None, None, None, None, None
+
+        # 年次配当利回りを計算
+        yearly_yields = []
+        for year in range(years):
+            year_start = datetime.now() - timedelta(days=365 * (year + 1))
+            year_end = datetime.now() - timedelta(days=365 * year)
+
+            # その年の配当合計
+            year_divs = recent_dividends[(recent_dividends.index >= year_start) & (recent_dividends.index < year_end)]
+            if len(year_divs) == 0:
+                continue
+
+            total_div = year_divs.sum()
+
+            # その年の平均株価（年初の価格を使用）
+            year_prices = hist_prices[(hist_prices.index >= year_start) & (hist_prices.index < year_end)]
+            if len(year_prices) == 0:
+                continue
+
+            avg_price = year_prices['Close'].iloc[0] if len(year_prices) > 0 else None
+            if avg_price and avg_price > 0:
+                yield_pct = (total_div / avg_price) * 100
+                yearly_yields.append(yield_pct)
+
+        if len(yearly_yields) == 0:
+            return None, None, None, None, None
+
+        # データを新しい順から古い順に並べ替え（時系列分析用）
+        yearly_yields.reverse()
+
+
+        # 特別配当の検出と除外（中央値の2倍ルール）
+        if len(yearly_yields) >= 1:
+            median = pd.Series(yearly_yields).median()
+            filtered_yields = [y for y in yearly_yields if y <= median * 2]
+            has_special_dividend = len(filtered_yields) < len(yearly_yields)
+        else:
+            filtered_yields = yearly_yields
+            has_special_dividend = False
+
+        # フィルタ後のデータで再計算
+        if len(filtered_yields) == 0:
+            filtered_yields = yearly_yields  # 全て外れ値の場合は元データを使用
+
+        # 平均配当利回り（特別配当除外後）
+        avg_yield = sum(filtered_yields) / len(filtered_yields)
+
+        # 配当の変動係数（CV = 標準偏差 / 平均）
+        if len(filtered_yields) >= 2:
+            std_dev = pd.Series(filtered_yields).std()
+            cv = (std_dev / avg_yield) if avg_yield > 0 else float('inf')
+        else:
+            cv = 0
+
+        # 配当トレンド分析（線形回帰の傾き）
+        if len(filtered_yields) >= 3:
+            # x = 年数（0, 1, 2, ...）、y = 配当利回り
+            x = list(range(len(filtered_yields)))
+            y = filtered_yields
+
+            # 線形回帰: y = ax + b
+            n = len(x)
+            sum_x = sum(x)
+            sum_y = sum(y)
+            sum_xy = sum(x[i] * y[i] for i in range(n))
+            sum_x2 = sum(xi ** 2 for xi in x)
+
+            # 傾き a = (n*Σxy - Σx*Σy) / (n*Σx² - (Σx)²)
+            denominator = (n * sum_x2 - sum_x ** 2)
+            if denominator != 0:
+                slope = (n * sum_xy - sum_x * sum_y) / denominator
+                dividend_trend = slope  # 正なら増配傾向、負なら減配傾向
+            else:
+                dividend_trend = 0
+        else:
+            dividend_trend = 0
+
+        # 最新年の配当利回り
+        current_yield = yearly_yields[-1] if len(yearly_yields) > 0 else None
+
+        return avg_yield, cv, current_yield, dividend_trend, has_special_dividend
+
+    except Exception as e:
+        return None, None, None, None, None
+
+def calculate_historical_dividend_yield_panel(dividends, prices, years=5, now=None):
+    """
+    過去N年の配当利回り指標を全銘柄まとめて計算（calculate_historical_dividend_yield のパネル版）
+    銘柄ごとのループを使わず、年ごとの集計・特別配当の除外・変動係数・トレンドをgroupbyで一括計算する
+
+    Args:
+        dividends: 配当の縦持ちDataFrame（列: ticker, date, amount）
+        prices: 株価の縦持ちDataFrame（列: ticker, date, close）。日付順に並んでいること
+        years: 分析する年数
+        now: 基準日時（Noneの場合は現在時刻）
+
+    Returns:
+        銘柄コードをインデックスとするDataFrame
+        （列: avg_yield, cv, current_yield, trend, has_special。計算できない銘柄は含まない）
+    """
+    columns = ['avg_yield', 'cv', 'current_yield', 'trend', 'has_special']
+    if dividends is None or len(dividends) == 0 or prices is None or len(prices) == 0:
+        return pd.DataFrame(columns=columns, index=pd.Index([], name='ticker'))
+
+    now = pd.Timestamp(now or datetime.now())
+    year_length = pd.Timedelta(days=365)
+
+    def year_offset(frame):
+        """基準日時から何年前の区間か（区間kは [now-365(k+1)日, now-365k日)）"""
+        dates = pd.DatetimeIndex(frame['date'])
+        if dates.tz is not None:
+            dates = dates.tz_localize(None)
+        delta = (now - dates).to_numpy()
+        valid = delta > np.timedelta64(0)
+        offset = (delta - np.timedelta64(1, 'ns')) // year_length.to_timedelta64()
+        frame = frame.assign(year=offset)[valid & (offset < years)]
+        return frame
+
+    # 1. 年ごとの配当合計と、その年の最初の株価
+    dividend_years = year_offset(dividends[['ticker', 'date', 'amount']])
+    totals = dividend_years.groupby(['ticker', 'year'])['amount'].sum()
+
+    price_years = year_offset(prices[['ticker', 'date', 'close']])
+    first_prices = price_years.drop_duplicates(['ticker', 'year'], keep='first').set_index(['ticker', 'year'])['close']
+
+    yearly = pd.concat([totals.rename('total'), first_prices.rename('price')], axis=1, join='inner')
+    yearly = yearly[yearly['price'] > 0]
+    if len(yearly) == 0:
+        return pd.DataFrame(columns=columns, index=pd.Index([], name='ticker'))
+    yearly['yield'] = yearly['total'] / yearly['price'] * 100
+
+    # 古い年から新しい年の順に並べる（単独版で反転した後の順序）
+    yearly = yearly.reset_index().sort_values(['ticker', 'year'], ascending=[True, False])
+    grouped = yearly.groupby('ticker', sort=True)['yield']
+
+    # 2. 特別配当の検出と除外（中央値の2倍ルール）
+    yearly['keep'] = yearly['yield'] <= grouped.transform('median') * 2
+    filtered = yearly[yearly['keep']].copy()
+
+    result = pd.DataFrame({
+        'count': grouped.size(),
+        # 最新年の配当利回り（除外前）
+        'current_yield': yearly.groupby('ticker', sort=True)['yield'].last(),
+    })
+    stats = filtered.groupby('ticker', sort=True)['yield'].agg(['size', 'mean', 'std'])
+    result['filtered_count'] = stats['size']
+    result['avg_yield'] = stats['mean']
+    result['has_special'] = result['filtered_count'] < result['count']
+
+    # 3. 変動係数（CV = 標準偏差 / 平均）。2年未満は0、平均が0以下は無限大
+    cv = np.where(result['avg_yield'] > 0, stats['std'] / result['avg_yield'], np.inf)
+    result['cv'] = np.where(result['filtered_count'] >= 2, cv, 0.0)
+
+    # 4. トレンド（除外後の利回りを x=0,1,2,... に対して最小二乗法で回帰した傾き）。3年未満は0
+    filtered['x'] = filtered.groupby('ticker', sort=True).cumcount()
+    filtered['xy'] = filtered['x'] * filtered['yield']
+    filtered['x2'] = filtered['x'] ** 2
+    sums = filtered.groupby('ticker', sort=True)[['x', 'yield', 'xy', 'x2']].sum()
+    n = result['filtered_count']
+    denominator = n * sums['x2'] - sums['x'] ** 2
+    slope = (n * sums['xy'] - sums['x'] * sums['yield']) / denominator.where(denominator != 0)
+    result['trend'] = np.where(n >= 3, slope.fillna(0.0), 0.0)
+
+    return result[columns]
+
+
+def calculate_dividend_quality_score(avg_yield, cv, trend, has_special_div):
+    """配当の質を総合的にスコアリング（0-100点）"""
+    try:
+        if avg_yield is None or cv is None or trend is None:
+            return None
+
+        score = 0
+
+        # 1. 配当利回り（最大40点）
+        if avg_yield >= 5.0:
+            score += 40
+        elif avg_yield >= 4.0:
+            score += 35
+        elif avg_yield >= 3.0:
+            score += 30
+        elif avg_yield >= 2.0:
+            score += 20
+        else:
+            score += 10
+
+        # 2. 安定性（最大30点）
+        if cv <= 0.15:
+            score += 30  # 非常に安定
+        elif cv <= 0.25:
+            score += 25  # 安定
+        elif cv <= 0.35:
+            score += 20  # やや安定
+        elif cv <= 0.50:
+            score += 10  # 中程度
+        else:
+            score += 0   # 不安定
+
+        # 3. トレンド（最大30点）
+        if trend > 0.3:
+            score += 30  # 強い増配傾向
+        elif trend > 0.15:
+            score += 25  # 増配傾向
+        elif trend > 0:
+            score += 20  # 緩やかな増配
+        elif trend > -0.15:
+            score += 10  # 横ばい
+        else:
+            score += 0   # 減配傾向
+
+        # 4. 特別配当ペナルティ（-10点）
+        if has_special_div:
+            score -= 10
+
+        # スコアを0-100の範囲に収める
+        score = max(0, min(100, score))
+
+        return score
+
+    except Exception:
+        return None
+
+def calculate_historical_per(ticker_obj, years=5):
+    """過去N年のPERを計算（過去の各年末時点のPER）"""
+    try:
+        # 過去N年+1年の株価データを取得（十分な履歴を確保）
+        hist = ticker_obj.history(period=f'{years + 1}y')
+        if hist is None or len(hist) == 0 or 'Close' not in hist.columns:
+            return None, None, None
+
+        # 現在のEPSを取得
+        info = ticker_obj.info
+        return calculate_historical_per_from_data(hist, info.get('trailingEps'), years=years)
+
+    except Exception as e:
+        return None, None, None
+
+def year_end_closes(hist):
+    """
+    年ごとの最終取引日の終値（年末終値インデックス）を作成
+    日付順のインデックスを searchsorted で年の境界に分割し、各年の最後の行を一度に取り出す
+
+    Args:
+        hist: 株価履歴DataFrame（Close列、DatetimeIndex）
+
+    Returns:
+        年をインデックスとするDataFrame（列: date, close。年の昇順）
+    """
+    if hist is None or len(hist) == 0 or 'Close' not in hist.columns:
+        return pd.DataFrame(columns=['date', 'close'], index=pd.Index([], name='year'))
+
+    if not hist.index.is_monotonic_increasing:
+        hist = hist.sort_index()
+    index = hist.index
+    years = np.unique(index.year)
+    # 翌年1月1日より前の最後の行 = その年の最終取引日
+    next_year_starts = pd.DatetimeIndex([pd.Timestamp(int(year) + 1, 1, 1) for year in years])
+    if index.tz is not None:
+        next_year_starts = next_year_starts.tz_localize(index.tz)
+    positions = index.searchsorted(next_year_starts, side='left') - 1
+
+    return pd.DataFrame(
+        {'date': index[positions], 'close': hist['Close'].to_numpy()[positions]},
+        index=pd.Index(years, name='year')
+    )
+
+
+def close_at_year_end(year_ends, year):
+    """
+    指定年の年末時点の終値を取得（その年に取引がない場合はそれ以前の直近の年末）
+
+    Args:
+        year_ends: year_end_closes() の戻り値
+        year: 年
+
+    Returns:
+        終値（それ以前のデータがない場合はNone）
+    """
+    position = year_ends.index.searchsorted(year, side='right') - 1
+    if position < 0:
+        return None
+    return year_ends['close'].iloc[position]
+
+
+def year_end_pers(year_ends, current_eps, years=5, now=None):
+    """
+    過去N年の各年末時点のPERを計算（最新年から順）
+    注意: 現在のEPSを使用（過去のEPSは取得不可）
+
+    Args:
+        year_ends: year_end_closes() の戻り値
+        current_eps: 現在のEPS（trailingEps）
+        years: 分析する年数
+        now: 基準日時（Noneの場合は現在時刻）
+
+    Returns:
+        PERのリスト（0以下・欠損の年は含まない）
+    """
+    if not current_eps or current_eps <= 0:
+        return []
+
+    current_year = (now or datetime.now()).year
+    pers = []
+    for year_offset in range(years):
+        close_price = close_at_year_end(year_ends, current_year - year_offset)
+        if close_price is None:
+            continue
+        # PER = 株価 / EPS
+        per = close_price / current_eps
+        if per > 0:
+            pers.append(per)
+    return pers
+
+
+def calculate_historical_per_from_data(hist, current_eps, years=5, year_ends=None):
+    """
+    取得済みの株価履歴とEPSから過去N年のPERを計算
+    （calculate_historical_per の計算部分。ダウンロードを伴わない）
+
+    Args:
+        hist: 株価履歴DataFrame（過去N+1年分、Asia/Tokyoのタイムゾーン付き）
+        current_eps: 現在のEPS（trailingEps）
+        years: 分析する年数
+        year_ends: 作成済みの年末終値インデックス（Noneの場合はhistから作成）
+
+    Returns:
+        (平均PER, PER変動係数, 現在PER)
+    """
+    try:
+        if year_ends is None:
+            if hist is None or len(hist) == 0 or 'Close' not in hist.columns:
+                return None, None, None
+            year_ends = year_end_closes(hist)
+
+        # 年次PERを計算（過去N年の各年末時点）
+        yearly_pers = year_end_pers(year_ends, current_eps, years=years)
+        if len(yearly_pers) == 0:
+            return None, None, None
+
+        # 平均PER
+        avg_per = sum(yearly_pers) / len(yearly_pers)
+
+        # PERの変動係数
+        if len(yearly_pers) >= 2:
+            std_dev = pd.Series(yearly_pers).std()
+            cv = (std_dev / avg_per) if avg_per > 0 else float('inf')
+        else:
+            cv = 0
+
+        # 現在のPER（最新＝0年前）
+        current_per = yearly_pers[0] if len(yearly_pers) > 0 else None
+
+        return avg_per, cv, current_per
+
+    except Exception as e:
+        return None, None, None
+
+
+
+# 決算日から決算短信・有価証券報告書でEPSが公表されるまでの日数（この日以降の株価にそのEPSを使う）
+EPS_REPORT_LAG_DAYS = 90
+
+
+def extract_eps_history(financials):
+    """
+    yfinanceの年次financials（行: 項目、列: 決算日）から1株当たり利益の履歴を抽出
+    EPSの行がない期は 純利益 / 期中平均株式数 で計算する
+
+    Args:
+        financials: 年次の損益計算書DataFrame
+
+    Returns:
+        DataFrame（列: fiscal_date, eps, net_income, shares。決算日の昇順、EPSを計算できない期は含まない）
+    """
+    columns = ['fiscal_date', 'eps', 'net_income', 'shares']
+    if financials is None or len(financials) == 0 or len(financials.columns) == 0:
+        return pd.DataFrame(columns=columns)
+
+    def first_row(*names):
+        """候補の項目名のうち最初に見つかった行（なければ欠損）"""
+        for name in names:
+            if name in financials.index:
+                row = financials.loc[name]
+                if isinstance(row, pd.DataFrame):
+                    row = row.iloc[0]
+                return pd.to_numeric(row, errors='coerce').to_numpy(dtype='float64')
+        return np.full(len(financials.columns), np.nan)
+
+    eps = first_row('Diluted EPS', 'Basic EPS')
+    net_income = first_row('Net Income Common Stockholders', 'Net Income')
+    shares = first_row('Diluted Average Shares', 'Basic Average Shares')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        computed = np.where(shares > 0, net_income / shares, np.nan)
+
+    fiscal_dates = pd.DatetimeIndex(pd.to_datetime(financials.columns))
+    if fiscal_dates.tz is not None:
+        fiscal_dates = fiscal_dates.tz_localize(None)
+    frame = pd.DataFrame({
+        'fiscal_date': fiscal_dates.normalize(),
+        'eps': np.where(np.isnan(eps), computed, eps),
+        'net_income': net_income,
+        'shares': shares,
+    })
+    return frame.dropna(subset=['eps']).sort_values('fiscal_date').reset_index(drop=True)
+
+
+def calculate_point_in_time_per_panel(year_ends, eps_history, years=4, now=None,
+                                      report_lag_days=EPS_REPORT_LAG_DAYS):
+    """
+    各年末時点で公表済みだったEPSを使って過去N年のPERを全銘柄まとめて計算
+    年末終値とEPSを銘柄ごとに merge_asof で結合するため、銘柄ごとのループを使わない
+
+    Args:
+        year_ends: 年末終値の縦持ちDataFrame（列: ticker, year, date, close。year_end_prices と同じ形式。
+                   今年の行は最新の終値）
+        eps_history: EPSの縦持ちDataFrame（列: ticker, fiscal_date, eps）
+        years: 分析する年数（今年を含む）
+        now: 基準日時（Noneの場合は現在時刻）
+        report_lag_days: 決算日からEPSを使い始めるまでの日数
+
+    Returns:
+        銘柄コードをインデックスとするDataFrame
+        （列: avg_per, min_per, max_per, per_cv, current_per, is_low_per。
+          公表済みのEPSが正の年が1つもない銘柄は含まない。取引のない年は除く）
+    """
+    columns = ['avg_per', 'min_per', 'max_per', 'per_cv', 'current_per', 'is_low_per']
+    empty = pd.DataFrame(columns=columns, index=pd.Index([], name='ticker'))
+    if year_ends is None or len(year_ends) == 0 or eps_history is None or len(eps_history) == 0:
+        return empty
+
+    def naive_dates(values):
+        dates = pd.DatetimeIndex(pd.to_datetime(values))
+        return dates.tz_localize(None) if dates.tz is not None else dates
+
+    current_year = (now or datetime.now()).year
+    prices = year_ends[['ticker', 'year', 'date', 'close']]
+    prices = prices[(prices['year'] > current_year - years) & (prices['year'] <= current_year)]
+    prices = prices.assign(date=naive_dates(prices['date']), close=prices['close'].astype('float64'))
+
+    eps = eps_history[['ticker', 'fiscal_date', 'eps']]
+    eps = eps.assign(
+        available_date=naive_dates(eps['fiscal_date']) + pd.Timedelta(days=report_lag_days),
+        eps=eps['eps'].astype('float64')
+    )
+
+    # 各年末時点で直近に公表されていたEPSを結合
+    merged = pd.merge_asof(
+        prices.sort_values('date'), eps[['ticker', 'available_date', 'eps']].sort_values('available_date'),
+        left_on='date', right_on='available_date', by='ticker', direction='backward'
+    )
+    merged = merged[merged['eps'] > 0]
+    merged = merged.assign(per=merged['close'] / merged['eps'])
+    merged = merged[merged['per'] > 0]
+    if len(merged) == 0:
+        return empty
+
+    # 新しい年から順に並べ、最新年のPERを現在PERとする
+    merged = merged.sort_values(['ticker', 'year'], ascending=[True, False])
+    stats = merged.groupby('ticker', sort=True)['per'].agg(['size', 'mean', 'std', 'min', 'max', 'first'])
+
+    result = pd.DataFrame({
+        'avg_per': stats['mean'],
+        'min_per': stats['min'],
+        'max_per': stats['max'],
+        # PERの変動係数（2年未満は0）
+        'per_cv': np.where(stats['size'] >= 2, stats['std'] / stats['mean'], 0.0),
+        'current_per': stats['first'],
+    }, index=stats.index)
+    # 割安フラグ: 現在PERが平均より20%以上低い
+    result['is_low_per'] = result['current_per'] < result['avg_per'] * 0.8
+    result.index.name = 'ticker'
+    return result[columns]
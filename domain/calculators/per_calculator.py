@@ -3,9 +3,9 @@ PER計算ロジック
 """
 
 import pandas as pd
-from datetime import datetime
 from typing import Optional
 from domain.models.per_info import PERAnalysisResult
+from domain.calculators.historical_metrics import year_end_closes, year_end_pers
 
 
 class PERCalculator:
@@ -35,28 +35,8 @@ class PERCalculator:
             if not current_eps or current_eps <= 0:
                 return PERAnalysisResult()
 
-            # 年次PERを計算（過去N年の各年末時点）
-            yearly_pers = []
-            current_date = datetime.now()
-
-            for year_offset in range(years):
-                try:
-                    # N年前の年末日付を計算（12月31日）
-                    target_year = current_date.year - year_offset
-                    year_end = pd.Timestamp(target_year, 12, 31, tz='Asia/Tokyo')
-
-                    # その年末以前の最も近い株価を取得
-                    hist_before = hist[hist.index <= year_end]
-                    if len(hist_before) > 0:
-                        close_price = hist_before['Close'].iloc[-1]
-
-                        # PER = 株価 / EPS
-                        per = close_price / current_eps
-                        if per > 0:
-                            yearly_pers.append(per)
-
-                except Exception:
-                    continue
+            # 年次PERを計算（過去N年の各年末時点、年末終値インデックスを二分探索）
+            yearly_pers = year_end_pers(year_end_closes(hist), current_eps, years=years)
 
             if len(yearly_pers) == 0:
                 return PERAnalysisResult()
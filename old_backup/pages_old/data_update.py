@@ -5,6 +5,7 @@
 
 import streamlit as st
 from datetime import datetime
+import time
 import sys
 import os
 
@@ -13,6 +14,9 @@ sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 
 from database.db_config import DatabaseConfig, DatabaseManager
 from database.data_updater import StockDataUpdater, batch_update_dividend_analysis
+from repository.update_job_queue import UpdateJobQueue
+from repository.update_job_tracker import UpdateJobTracker
+from config import APP_CONFIG
 
 st.set_page_config(
     page_title="データ更新 - 株価分析アプリ",
@@ -29,6 +33,7 @@ st.sidebar.header("データ更新")
 db_config = DatabaseConfig()
 db_manager = DatabaseManager()
 updater = StockDataUpdater()
+job_queue = UpdateJobQueue(db_manager)
 
 # タブ作成
 tab1, tab2, tab3, tab4 = st.tabs(["🔄 データ更新", "📊 データベース状態", "⚙️ 設定確認", "📚 更新履歴"])
@@ -51,52 +56,40 @@ with tab1:
         # 並列処理数の選択
         max_workers = st.slider("並列処理数", 1, 5, 2, help="同時に処理する銘柄数（推奨: 1-2、多すぎるとレート制限エラー）")
         st.warning("⚠️ **重要**: レート制限を避けるため、並列処理数は1-2を強く推奨します。3以上は高確率でエラーになります。")
+        full_incremental = st.checkbox(
+            "株価・配当は不足分のみ取得", value=False, key="full_incremental",
+            help="DBにある最新日付より後のデータだけを取得します（初回はOFF）"
+        )
 
-        # JPXから銘柄リストを取得して更新を開始
+        # 更新は別プロセスのワーカー（scripts/update_worker.py）が実行する
         if st.button("🔄 プライム市場全銘柄を更新", type="primary"):
-            with st.spinner("銘柄リストを取得中..."):
-                # メインアプリの関数をインポート
-                from stock_analysis_app import get_premium_market_stocks
-
-                stocks = get_premium_market_stocks()
-
-                if stocks and len(stocks) > 0:
-                    st.success(f"✅ {len(stocks)}銘柄を取得しました")
-                    st.info(f"⏳ {len(stocks)}銘柄の更新を開始します...")
-
-                    start_time = datetime.now()
-
-                    # 更新履歴を記録
-                    query = """
-                    INSERT INTO update_history (update_type, status, started_at)
-                    VALUES ('full', 'running', %s)
-                    """
-                    db_manager.execute_query(query, (start_time,), fetch=False)
-
-                    # 全銘柄更新
-                    success_count, error_count = updater.update_all_stocks(stocks, max_workers=max_workers)
-
-                    end_time = datetime.now()
-                    duration = (end_time - start_time).total_seconds()
-
-                    # 更新履歴を更新
-                    query = """
-                    UPDATE update_history
-                    SET status = 'success',
-                        records_updated = %s,
-                        completed_at = %s
-                    WHERE started_at = %s
-                    """
-                    db_manager.execute_query(query, (success_count, end_time, start_time), fetch=False)
-
-                    st.success(f"""
-                    ✅ 更新完了！
-                    - 成功: {success_count}銘柄
-                    - 失敗: {error_count}銘柄
-                    - 所要時間: {duration/60:.1f}分
-                    """)
-                else:
-                    st.error("❌ 銘柄リストの取得に失敗しました")
+            job_id = job_queue.enqueue('full', {'max_workers': max_workers, 'incremental': full_incremental})
+            if job_id:
+                st.success(f"✅ ジョブ #{job_id} を登録しました（下の「更新ジョブ」で進捗を確認できます）")
+
+        # 中断・失敗したジョブの再開（実行中のジョブがある間は、その未処理分と区別できないため表示しない）
+        resumable_job = None if job_queue.has_active_jobs() else UpdateJobTracker(db_manager, 'full').find_resumable()
+        if resumable_job:
+            st.info(
+                f"⏸️ 未完了の全銘柄更新があります（{resumable_job['started_at']} 開始、"
+                f"完了 {resumable_job['success']} / 未処理 {resumable_job['pending']} / 失敗 {resumable_job['failed']}）"
+            )
+            col_resume, col_retry = st.columns(2)
+            with col_resume:
+                resume_clicked = st.button("▶️ 未完了分を再開", help="未処理と失敗の銘柄のみを更新します")
+            with col_retry:
+                retry_clicked = st.button(
+                    "🔁 失敗分のみ再試行", disabled=resumable_job['failed'] == 0,
+                    help="失敗した銘柄のみを更新します"
+                )
+
+            if resume_clicked or retry_clicked:
+                job_id = job_queue.enqueue(
+                    'resume' if resume_clicked else 'retry_failed',
+                    {'update_type': 'full', 'max_workers': max_workers, 'incremental': full_incremental}
+                )
+                if job_id:
+                    st.success(f"✅ ジョブ #{job_id} を登録しました")
 
     with col2:
         st.subheader("単一銘柄更新")
@@ -109,43 +102,115 @@ with tab1:
                 success, error = updater.fetch_and_save_single_stock(ticker_input, name_input)
 
                 if success:
+                    updater.refresh_screening_snapshot([ticker_input])
                     st.success(f"✅ {ticker_input} ({name_input}) の更新完了")
                 else:
                     st.error(f"❌ エラー: {error}")
 
     st.divider()
 
-    st.subheader("差分更新（推奨）")
-    st.info("📅 最終更新から24時間以上経過した銘柄のみを更新します")
+    st.subheader("株価の一括更新（高速）")
+    st.info("📦 複数銘柄の株価履歴をまとめてダウンロードします（株価のみ・財務指標や配当は更新しません）")
 
-    days_old = st.number_input("何日以上前のデータを更新するか", 1, 30, 1)
+    price_chunk_size = st.number_input(
+        "1回に取得する銘柄数", 10, 500, APP_CONFIG.price_chunk_size, step=10,
+        help="大きいほど高速ですが、1回のダウンロードが重くなります"
+    )
 
-    if st.button("🔄 差分更新を実行"):
-        # 古いデータの銘柄リストを取得
-        query = f"""
-        SELECT ticker, name FROM stocks
-        WHERE updated_at < DATE_SUB(NOW(), INTERVAL {days_old} DAY)
-        """
-        old_stocks = db_manager.execute_query(query)
+    if st.button("📦 プライム市場全銘柄の株価を一括更新"):
+        with st.spinner("銘柄リストを取得中..."):
+            from stock_analysis_app import get_premium_market_stocks
 
-        if old_stocks:
-            st.info(f"⏳ {len(old_stocks)}銘柄を更新します...")
+            stocks = get_premium_market_stocks()
 
-            stocks_dict = {row['ticker']: row['name'] for row in old_stocks}
-            success_count, error_count = updater.update_all_stocks(stocks_dict, max_workers=5)
+        if stocks and len(stocks) > 0:
+            start_time = datetime.now()
+            success_count, error_count = updater.update_prices_bulk(stocks, chunk_size=int(price_chunk_size))
+            duration = (datetime.now() - start_time).total_seconds()
 
             st.success(f"""
-            ✅ 差分更新完了！
+            ✅ 株価一括更新完了！
             - 成功: {success_count}銘柄
             - 失敗: {error_count}銘柄
+            - 所要時間: {duration/60:.1f}分
             """)
         else:
-            st.info("✅ 更新が必要な銘柄はありません")
+            st.error("❌ 銘柄リストの取得に失敗しました")
+
+    st.divider()
+
+    st.subheader("差分更新（推奨）")
+    st.info("📅 最終更新から24時間以上経過した銘柄のみを更新します")
+
+    days_old = st.number_input("何日以上前のデータを更新するか", 1, 30, 1)
+    delta_only = st.checkbox(
+        "株価・配当は不足分のみ取得（高速）", value=True,
+        help="stock_prices / dividends の最新日付以降だけをダウンロードします"
+    )
+
+    if st.button("🔄 差分更新を実行"):
+        job_id = job_queue.enqueue('incremental', {
+            'days_old': int(days_old), 'max_workers': APP_CONFIG.max_workers, 'incremental': delta_only
+        })
+        if job_id:
+            st.success(f"✅ ジョブ #{job_id} を登録しました（下の「更新ジョブ」で進捗を確認できます）")
+
+    st.divider()
+
+    # 更新ジョブの状態（ワーカーの進捗をDBから参照するだけで、画面を閉じても更新は続く）
+    st.subheader("更新ジョブ")
+    st.caption("ジョブは `python scripts/update_worker.py` で起動したワーカーが実行します（複数台で分担可能）")
+
+    jobs = job_queue.list_jobs(limit=10)
+    if jobs:
+        for job in jobs:
+            label = UpdateJobQueue.JOB_TYPES.get(job['job_type'], job['job_type'])
+            status_icon = {
+                'queued': '⏳', 'running': '🔄', 'success': '✅', 'partial': '⚠️', 'failed': '❌', 'cancelled': '⏹️'
+            }.get(job['status'], '')
+            col_j1, col_j2 = st.columns([4, 1])
+            with col_j1:
+                st.markdown(f"{status_icon} **#{job['id']} {label}** — {job['status']}（登録: {job['created_at']}）")
+                if job['status'] == 'running' and job['total']:
+                    st.progress(
+                        min(1.0, job['processed'] / job['total']),
+                        text=f"進捗: {job['processed']}/{job['total']} (成功: {job['success_count']}, 失敗: {job['error_count']})"
+                    )
+                if job['message']:
+                    st.caption(job['message'])
+            with col_j2:
+                if job['status'] in ('queued', 'running') and not job['cancel_requested']:
+                    if st.button("中止", key=f"cancel_job_{job['id']}"):
+                        job_queue.request_cancel(job['id'])
+                        st.rerun()
+    else:
+        st.info("登録されたジョブはありません")
+
+    # 稼働中のワーカー（複数ホスト・プロセスでジョブを分担）
+    workers = job_queue.list_workers()
+    if workers:
+        with st.expander(f"稼働中のワーカー: {len(workers)}台"):
+            for worker in workers:
+                rate_text = f"{float(worker['rate_share']):.2f} 回/秒" if worker['rate_share'] is not None else "-"
+                job_text = f"ジョブ #{worker['job_id']}" if worker['job_id'] else "待機中"
+                st.text(
+                    f"{worker['worker']}（送信元: {worker['egress']}）: {job_text} / "
+                    f"処理 {worker['processed']:,}銘柄 / 最大レート {rate_text}"
+                )
+    else:
+        st.warning("稼働中のワーカーがありません。`python scripts/update_worker.py` を起動してください")
+
+    col_refresh, col_auto = st.columns(2)
+    with col_refresh:
+        if st.button("🔄 状態を更新"):
+            st.rerun()
+    with col_auto:
+        auto_refresh = st.checkbox("実行中は5秒ごとに自動更新", value=True)
 
     st.divider()
 
     st.subheader("配当分析の一括計算")
-    st.info("💡 配当データがある全銘柄の5年平均利回りを計算してdividend_analysisテーブルに保存します")
+    st.info("💡 保存済みの配当・株価データから全銘柄の5年平均利回り・PERを再計算してdividend_analysis・per_analysisテーブルに保存します（yfinanceへの再取得なし）")
 
     # 配当データの状況を表示
     dividend_stats = db_manager.execute_query("""
@@ -265,6 +330,78 @@ with tab3:
                 3. ユーザーに適切な権限があることを確認
                 """)
 
+    st.divider()
+
+    # コネクションプール統計
+    st.subheader("コネクションプール")
+
+    pool_stats = db_manager.get_pool_stats()
+    if pool_stats:
+        col_p1, col_p2, col_p3, col_p4 = st.columns(4)
+        with col_p1:
+            st.metric("接続数（使用中/上限）", f"{pool_stats['in_use']}/{pool_stats['pool_size']}")
+        with col_p2:
+            st.metric("プールヒット", f"{pool_stats['hits'] + pool_stats['thread_hits']:,}")
+        with col_p3:
+            st.metric("新規接続", f"{pool_stats['misses']:,}")
+        with col_p4:
+            st.metric("待機 / タイムアウト", f"{pool_stats['waits']:,} / {pool_stats['timeouts']:,}")
+    else:
+        st.info("コネクションプールは無効です（MYSQL_POOL_ENABLED=0）")
+
+    st.divider()
+
+    # レスポンスキャッシュ統計
+    st.subheader("レスポンスキャッシュ")
+
+    from repository.response_cache import get_response_cache
+    response_cache = get_response_cache()
+    cache_stats = response_cache.stats()
+    if cache_stats:
+        col_c1, col_c2, col_c3, col_c4 = st.columns(4)
+        with col_c1:
+            st.metric("エントリ数", f"{cache_stats['entries']:,}")
+        with col_c2:
+            st.metric("サイズ", f"{cache_stats['bytes'] / 1024 / 1024:.1f} / {cache_stats['max_bytes'] / 1024 / 1024:.0f} MB")
+        with col_c3:
+            st.metric("ヒット率", f"{cache_stats['hit_rate'] * 100:.1f}%")
+        with col_c4:
+            st.metric("ヒット / ミス", f"{cache_stats['hits']:,} / {cache_stats['misses']:,}")
+
+        if cache_stats['namespaces']:
+            with st.expander("名前空間ごとの統計"):
+                for namespace, ns_stats in sorted(cache_stats['namespaces'].items()):
+                    st.text(
+                        f"{namespace}: {ns_stats['entries']:,}件 / {ns_stats['bytes'] / 1024 / 1024:.1f} MB"
+                        f"（ヒット {ns_stats.get('hits', 0):,} / ミス {ns_stats.get('misses', 0):,}）"
+                    )
+
+        if st.button("🗑️ キャッシュをクリア"):
+            response_cache.clear()
+            st.success("レスポンスキャッシュをクリアしました")
+    else:
+        st.info("レスポンスキャッシュは無効です（RESPONSE_CACHE_ENABLED=0）")
+
+    st.divider()
+
+    # yfinanceレートリミッター統計
+    st.subheader("yfinanceレートリミッター")
+
+    from repository.rate_limiter import get_rate_limiter
+    rate_stats = get_rate_limiter().stats()
+    col_r1, col_r2, col_r3, col_r4 = st.columns(4)
+    with col_r1:
+        st.metric("現在のレート", f"{rate_stats['rate']:.2f} 回/秒",
+                  help=f"{rate_stats['min_rate']:.2f}〜{rate_stats['max_rate']:.2f} 回/秒の範囲で自動調整")
+    with col_r2:
+        st.metric("リクエスト数", f"{rate_stats['requests']:,}")
+    with col_r3:
+        st.metric("レート制限 / 再試行", f"{rate_stats['rate_limited']:,} / {rate_stats['retries']:,}")
+    with col_r4:
+        st.metric("累計待機", f"{rate_stats['wait_seconds']:.1f} 秒")
+    if rate_stats['paused_seconds'] > 0:
+        st.warning(f"レート制限のため一時停止中（残り {rate_stats['paused_seconds']:.0f} 秒）")
+
 with tab4:
     st.header("更新履歴")
 
@@ -294,3 +431,8 @@ with tab4:
         db_manager.execute_query("DELETE FROM update_history", fetch=False)
         st.success("✅ 履歴をクリアしました")
         st.rerun()
+
+# 実行中のジョブがあれば自動更新（画面全体を描画してから待機する）
+if auto_refresh and job_queue.has_active_jobs():
+    time.sleep(5)
+    st.rerun()
@@ -0,0 +1,246 @@
+"""
+asyncio による並列取得レイヤー
+1スレッドのイベントループで数百件のHTTPリクエストを同時に待ち、ホストごとの同時接続数をセマフォで制限する。
+HTTPクライアントには yfinance と同じ curl_cffi（ブラウザ偽装付き）の AsyncSession を使う。
+XBRL解析などのCPU処理は run_cpu() でエグゼキューターに渡し、イベントループを止めない。
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Any, Callable, Coroutine, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from curl_cffi.requests import AsyncSession
+
+from config import ASYNC_FETCH_CONFIG
+from repository.rate_limiter import AdaptiveRateLimiter
+from repository.response_cache import get_response_cache
+
+
+class FetchError(Exception):
+    """HTTP取得の失敗（200以外の応答を含む）"""
+
+    def __init__(self, url: str, status: Optional[int] = None, message: str = ''):
+        self.url = url
+        self.status = status
+        super().__init__(f"{url}: {message or f'HTTP {status}'}")
+
+
+class AsyncFetcher:
+    """
+    ホストごとの同時接続数を制限する非同期HTTPクライアント
+
+    使い方:
+        async with AsyncFetcher() as fetcher:
+            bodies = await asyncio.gather(*(fetcher.get(url) for url in urls))
+    """
+
+    def __init__(self, max_in_flight: Optional[int] = None, host_limits: Optional[Dict[str, int]] = None,
+                 timeout: Optional[float] = None, max_retries: Optional[int] = None,
+                 impersonate: Optional[str] = 'chrome', executor: Optional[Executor] = None):
+        """
+        初期化
+        Args:
+            max_in_flight: 全ホスト合計の同時リクエスト数（Noneの場合は設定値）
+            host_limits: {ホスト名: 同時リクエスト数}（未指定のホストは設定値）
+            timeout: 1リクエストのタイムアウト秒数
+            max_retries: 429・接続エラー時の再試行回数
+            impersonate: curl_cffiのブラウザ偽装（Noneで無効）
+            executor: run_cpu() で使うエグゼキューター（Noneの場合は設定に応じて作成）
+        """
+        config = ASYNC_FETCH_CONFIG
+        self.max_in_flight = max_in_flight or config.max_in_flight
+        self.host_limits = dict(host_limits or {})
+        self.timeout = timeout or config.timeout
+        self.max_retries = config.max_retries if max_retries is None else max_retries
+        self.impersonate = impersonate
+
+        self._executor = executor
+        self._owns_executor = False
+        self._session: Optional[AsyncSession] = None
+        self._in_flight: Optional[asyncio.Semaphore] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+        # 統計カウンタ
+        self.requests = 0
+        self.cache_hits = 0
+        self.errors = 0
+
+    async def __aenter__(self) -> 'AsyncFetcher':
+        self._session = AsyncSession(max_clients=self.max_in_flight, impersonate=self.impersonate)
+        self._in_flight = asyncio.Semaphore(self.max_in_flight)
+        if self._executor is None and ASYNC_FETCH_CONFIG.cpu_processes > 0:
+            self._executor = ProcessPoolExecutor(max_workers=ASYNC_FETCH_CONFIG.cpu_processes)
+            self._owns_executor = True
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._session.close()
+        self._session = None
+        if self._owns_executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+            self._owns_executor = False
+
+    def host_slot(self, host: str) -> asyncio.Semaphore:
+        """
+        ホストの同時接続数を制限するセマフォを取得
+        （HTTP以外の方法で同じホストに接続する処理も、このセマフォで枠を共有できる）
+
+        Args:
+            host: ホスト名
+        Returns:
+            asyncio.Semaphore
+        """
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            limit = self.host_limits.get(host) or ASYNC_FETCH_CONFIG.host_limit(host)
+            semaphore = asyncio.Semaphore(limit)
+            self._host_semaphores[host] = semaphore
+        return semaphore
+
+    async def get(self, url: str, params: Optional[Dict[str, Any]] = None,
+                  limiter: Optional[AdaptiveRateLimiter] = None, timeout: Optional[float] = None) -> bytes:
+        """
+        GETリクエストの本文を取得（429・接続エラー時は再試行）
+        Args:
+            url: URL
+            params: クエリパラメータ
+            limiter: 送信間隔を制御するレートリミッター（yfinanceなど）
+            timeout: タイムアウト秒数（Noneの場合は既定値）
+        Returns:
+            レスポンス本文
+        Raises:
+            FetchError: 200以外の応答、または再試行し尽くした場合
+        """
+        if self._session is None:
+            raise RuntimeError("AsyncFetcher は async with で開いてから使用してください")
+
+        host = urlsplit(url).hostname or ''
+        attempt = 0
+        while True:
+            if limiter is not None:
+                await limiter.acquire_async()
+            async with self._in_flight, self.host_slot(host):
+                self.requests += 1
+                try:
+                    response = await self._session.get(url, params=params, timeout=timeout or self.timeout)
+                    status, content = response.status_code, response.content
+                except Exception as e:
+                    status, content, error = None, None, e
+
+            if status == 200:
+                if limiter is not None:
+                    limiter.record_success()
+                return content
+
+            retryable = status is None or status == 429 or status >= 500
+            if status == 429 and limiter is not None:
+                limiter.record_rate_limited()
+            elif limiter is not None:
+                limiter.record_failure()
+            if not retryable or attempt >= self.max_retries:
+                self.errors += 1
+                raise FetchError(url, status, str(error) if status is None else '')
+            attempt += 1
+            if status != 429 or limiter is None:
+                # 429はリミッターの一時停止で待つため、それ以外のみ指数的に待つ
+                await asyncio.sleep(0.5 * (2 ** attempt))
+
+    async def get_cached(self, namespace: str, key: str, url: str, params: Optional[Dict[str, Any]] = None,
+                         ttl: Optional[float] = None, limiter: Optional[AdaptiveRateLimiter] = None,
+                         should_cache: Optional[Callable[[bytes], bool]] = None,
+                         timeout: Optional[float] = None) -> bytes:
+        """
+        レスポンスキャッシュ経由でGETリクエストの本文を取得
+        Args:
+            namespace: キャッシュの名前空間
+            key: キャッシュのキー（APIキーなどを含めない）
+            url: URL
+            params: クエリパラメータ
+            ttl: 有効期間（秒）。Noneの場合は期限なし
+            limiter: 送信間隔を制御するレートリミッター
+            should_cache: 本文を保存するか判定する関数
+            timeout: タイムアウト秒数
+        Returns:
+            レスポンス本文
+        Raises:
+            FetchError: 取得に失敗した場合
+        """
+        cache = get_response_cache()
+        cached = cache.get(namespace, key)
+        if cached is not None:
+            self.cache_hits += 1
+            return cached
+
+        content = await self.get(url, params=params, limiter=limiter, timeout=timeout)
+        if should_cache is None or should_cache(content):
+            cache.set(namespace, key, content, ttl)
+        return content
+
+    async def run_cpu(self, func: Callable[..., Any], *args) -> Any:
+        """
+        CPU処理をエグゼキューターで実行（プロセスプール設定時は関数・引数がpickle可能であること）
+        Args:
+            func: 関数
+            *args: 引数
+        Returns:
+            関数の戻り値
+        """
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def run_blocking(self, host: str, func: Callable[..., Any], *args) -> Any:
+        """
+        ブロッキングするネットワーク処理（yfinanceの関数など）をスレッドで実行
+        そのホストの同時接続数の枠を使う
+
+        Args:
+            host: 接続先のホスト名
+            func: 関数
+            *args: 引数
+        Returns:
+            関数の戻り値
+        """
+        async with self.host_slot(host):
+            return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        統計を取得
+        Returns:
+            {'requests', 'cache_hits', 'errors'}
+        """
+        return {'requests': self.requests, 'cache_hits': self.cache_hits, 'errors': self.errors}
+
+
+def run_sync(coro: Coroutine) -> Any:
+    """
+    コルーチンを同期的に実行（Streamlitのスクリプトスレッドなど、同期コードから呼ぶ入口）
+    呼び出し元でイベントループが動いている場合は別スレッドの新しいループで実行する
+
+    Args:
+        coro: コルーチン
+    Returns:
+        コルーチンの戻り値
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+
+    result: Dict[str, Tuple[bool, Any]] = {}
+
+    def runner():
+        try:
+            result['value'] = (True, asyncio.run(coro))
+        except BaseException as e:
+            result['value'] = (False, e)
+
+    thread = threading.Thread(target=runner)
+    thread.start()
+    thread.join()
+    ok, value = result['value']
+    if not ok:
+        raise value
+    return value
@@ -0,0 +1,252 @@
+"""
+MySQLコネクションプール
+接続の再利用・ヘルスチェック・スレッド単位のチェックアウトを管理
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, Tuple
+
+import mysql.connector
+from mysql.connector import Error
+from mysql.connector.errors import PoolError
+
+
+class ConnectionPool:
+    """スレッドセーフなMySQLコネクションプール"""
+
+    def __init__(self, connect_kwargs: Dict[str, Any], pool_size: int = 8,
+                 timeout: float = 30.0, health_check_interval: float = 60.0):
+        """
+        初期化
+        Args:
+            connect_kwargs: mysql.connector.connect() に渡す接続パラメータ
+            pool_size: 最大接続数
+            timeout: 空き接続を待つ最大秒数
+            health_check_interval: この秒数以上アイドルだった接続はpingで生存確認する
+        """
+        self.connect_kwargs = dict(connect_kwargs)
+        self.pool_size = max(1, pool_size)
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+
+        self._cond = threading.Condition()
+        self._idle = deque()  # (connection, 最終利用時刻) をLIFOで保持
+        self._created = 0
+        self._local = threading.local()
+
+        # 統計カウンタ
+        self._hits = 0
+        self._misses = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._thread_hits = 0
+        self._health_checks = 0
+        self._discarded = 0
+
+    def _connect(self):
+        """新しい物理接続を作成"""
+        return mysql.connector.connect(**self.connect_kwargs)
+
+    def acquire(self):
+        """
+        接続をチェックアウト
+        現在のスレッドに接続がバインドされている場合はそれを返す
+        Returns:
+            MySQL接続
+        Raises:
+            PoolError: timeout秒以内に空き接続が得られなかった場合
+            Error: 接続作成に失敗した場合
+        """
+        bound = getattr(self._local, 'connection', None)
+        if bound is not None:
+            with self._cond:
+                self._thread_hits += 1
+            return bound
+
+        connection = None
+        last_used = None
+        with self._cond:
+            deadline = time.monotonic() + self.timeout
+            waited = False
+            while True:
+                if self._idle:
+                    connection, last_used = self._idle.pop()
+                    self._hits += 1
+                    break
+                if self._created < self.pool_size:
+                    self._created += 1
+                    self._misses += 1
+                    break
+                if not waited:
+                    self._waits += 1
+                    waited = True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._timeouts += 1
+                    raise PoolError(f"コネクションプールが枯渇しました（{self.pool_size}接続、{self.timeout}秒待機）")
+                self._cond.wait(remaining)
+
+        if connection is None:
+            return self._create_reserved()
+
+        if time.monotonic() - last_used >= self.health_check_interval:
+            with self._cond:
+                self._health_checks += 1
+            try:
+                connection.ping(reconnect=False)
+            except Error:
+                self._close_quietly(connection)
+                with self._cond:
+                    self._discarded += 1
+                return self._create_reserved()
+
+        return connection
+
+    def _create_reserved(self):
+        """予約済みの枠で物理接続を作成（失敗時は枠を返却）"""
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, connection, discard: bool = False):
+        """
+        接続をプールへ返却
+        Args:
+            connection: acquire()で取得した接続
+            discard: Trueの場合は再利用せずに破棄する
+        """
+        if connection is None:
+            return
+        if getattr(self._local, 'connection', None) is connection:
+            if not discard:
+                # スレッドにバインド中の接続はセッション終了時に返却する
+                return
+            # 壊れた接続はバインドを解除して破棄（以降は新しい接続を取得）
+            self._local.connection = None
+
+        if not discard:
+            try:
+                # 未完了のトランザクション（SELECTのスナップショット含む）を破棄
+                if getattr(connection, 'in_transaction', True):
+                    connection.rollback()
+            except Error:
+                discard = True
+
+        with self._cond:
+            if discard:
+                self._created -= 1
+                self._discarded += 1
+            else:
+                self._idle.append((connection, time.monotonic()))
+            self._cond.notify()
+
+        if discard:
+            self._close_quietly(connection)
+
+    @contextmanager
+    def thread_connection(self):
+        """
+        現在のスレッドに1本の接続をバインドするコンテキスト
+        ブロック内のacquire()は全て同じ接続を返す（ネスト可）
+        """
+        if getattr(self._local, 'connection', None) is not None:
+            yield self._local.connection
+            return
+
+        connection = self.acquire()
+        self._local.connection = connection
+        try:
+            yield connection
+        finally:
+            if self._local.connection is connection:
+                self._local.connection = None
+                self.release(connection)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        プール統計を取得
+        Returns:
+            ヒット数・待機数などの統計辞書
+        """
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                'pool_size': self.pool_size,
+                'created': self._created,
+                'idle': idle,
+                'in_use': self._created - idle,
+                'hits': self._hits,
+                'misses': self._misses,
+                'thread_hits': self._thread_hits,
+                'waits': self._waits,
+                'timeouts': self._timeouts,
+                'health_checks': self._health_checks,
+                'discarded': self._discarded,
+            }
+
+    def close_all(self):
+        """アイドル中の接続を全て閉じる"""
+        with self._cond:
+            idle = list(self._idle)
+            self._idle.clear()
+            self._created -= len(idle)
+            self._cond.notify_all()
+        for connection, _ in idle:
+            self._close_quietly(connection)
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+# プロセス内で共有するプール（接続先ごと）
+_pools: Dict[Tuple, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(connect_kwargs: Dict[str, Any], pool_size: int = 8, timeout: float = 30.0,
+             health_check_interval: float = 60.0) -> ConnectionPool:
+    """
+    接続先ごとの共有プールを取得（なければ作成）
+    DatabaseManagerを複数生成しても同じプールを使う
+    Args:
+        connect_kwargs: 接続パラメータ
+        pool_size: 最大接続数
+        timeout: 空き接続を待つ最大秒数
+        health_check_interval: ヘルスチェック間隔（秒）
+    Returns:
+        ConnectionPool
+    """
+    key = tuple(sorted(connect_kwargs.items()))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = ConnectionPool(connect_kwargs, pool_size, timeout, health_check_interval)
+            _pools[key] = pool
+        return pool
+
+
+def get_all_pool_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    全プールの統計を取得
+    Returns:
+        {"host:port/database": 統計辞書}
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+    result = {}
+    for pool in pools:
+        kwargs = pool.connect_kwargs
+        name = f"{kwargs.get('host')}:{kwargs.get('port')}/{kwargs.get('database')}"
+        result[name] = pool.stats()
+    return result
@@ -6,8 +6,10 @@ MySQL接続とクエリ実行を管理
 import mysql.connector
 from mysql.connector import Error
 import streamlit as st
+from contextlib import contextmanager
 from typing import List, Dict, Any, Optional, Tuple
 from config import DB_CONFIG
+from repository.connection_pool import get_pool
 
 
 class DatabaseManager:
@@ -20,26 +22,79 @@ class DatabaseManager:
             config: DatabaseConfigインスタンス（デフォルトはDB_CONFIG）
         """
         self.config = config or DB_CONFIG
+        self._pool = None
+        if self.config.pool_enabled:
+            self._pool = get_pool(
+                self._connect_kwargs(),
+                pool_size=self.config.pool_size,
+                timeout=self.config.pool_timeout,
+                health_check_interval=self.config.pool_health_check_interval
+            )
+
+    def _connect_kwargs(self) -> Dict[str, Any]:
+        """mysql.connector.connect() 用の接続パラメータ"""
+        return {
+            'host': self.config.host,
+            'port': self.config.port,
+            'user': self.config.user,
+            'password': self.config.password,
+            'database': self.config.database,
+            'charset': self.config.charset,
+            'collation': self.config.collation,
+            'autocommit': False
+        }
 
     def get_connection(self):
-        """データベース接続を取得"""
+        """
+        データベース接続を取得（プール外の専用接続、呼び出し側でclose()する）
+        """
         try:
-            connection = mysql.connector.connect(
-                host=self.config.host,
-                port=self.config.port,
-                user=self.config.user,
-                password=self.config.password,
-                database=self.config.database,
-                charset=self.config.charset,
-                collation=self.config.collation,
-                autocommit=False
-            )
+            connection = mysql.connector.connect(**self._connect_kwargs())
             return connection
         except Error as e:
             st.error(f"❌ データベース接続エラー: {e}")
             st.info("💡 環境変数を確認してください: MYSQL_HOST, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DATABASE")
             return None
 
+    def _acquire_connection(self):
+        """クエリ実行用の接続を取得（プール有効時はプールから）"""
+        if self._pool is None:
+            return self.get_connection()
+        try:
+            return self._pool.acquire()
+        except Error as e:
+            st.error(f"❌ データベース接続エラー: {e}")
+            st.info("💡 環境変数を確認してください: MYSQL_HOST, MYSQL_USER, MYSQL_PASSWORD, MYSQL_DATABASE")
+            return None
+
+    def _release_connection(self, connection, discard: bool = False):
+        """_acquire_connection() で取得した接続を返却"""
+        if self._pool is None:
+            connection.close()
+        else:
+            self._pool.release(connection, discard=discard)
+
+    @contextmanager
+    def session(self):
+        """
+        現在のスレッドに接続を1本固定するコンテキスト
+        ブロック内のexecute_query/execute_manyは同じ接続を使う
+        （ワーカースレッド単位のチェックアウトやセッション変数の利用時に使用）
+        """
+        if self._pool is None:
+            yield
+            return
+        with self._pool.thread_connection():
+            yield
+
+    def get_pool_stats(self) -> Optional[Dict[str, Any]]:
+        """
+        コネクションプールの統計を取得
+        Returns:
+            統計辞書（プール無効時はNone）
+        """
+        return self._pool.stats() if self._pool else None
+
     def test_connection(self) -> Tuple[bool, str]:
         """
         接続テスト
@@ -94,7 +149,7 @@ class DatabaseManager:
         Returns:
             結果（辞書のリスト）またはNone
         """
-        connection = self.get_connection()
+        connection = self._acquire_connection()
         if not connection:
             return None
 
@@ -109,14 +164,39 @@ class DatabaseManager:
                 result = cursor.rowcount
 
             cursor.close()
-            connection.close()
+            self._release_connection(connection)
             return result
 
         except Error as e:
             st.error(f"❌ クエリ実行エラー: {e}")
-            if connection:
-                connection.rollback()
-                connection.close()
+            self._rollback_and_release(connection)
+            return None
+
+    def execute_insert(self, query: str, params: tuple = None) -> Optional[int]:
+        """
+        INSERTを実行して自動採番されたIDを取得
+        Args:
+            query: SQL文
+            params: パラメータ
+        Returns:
+            挿入した行のID（失敗時はNone）
+        """
+        connection = self._acquire_connection()
+        if not connection:
+            return None
+
+        try:
+            cursor = connection.cursor()
+            cursor.execute(query, params or ())
+            connection.commit()
+            last_id = cursor.lastrowid
+            cursor.close()
+            self._release_connection(connection)
+            return last_id
+
+        except Error as e:
+            st.error(f"❌ クエリ実行エラー: {e}")
+            self._rollback_and_release(connection)
             return None
 
     def execute_many(self, query: str, data_list: List[tuple]) -> int:
@@ -126,14 +206,14 @@ class DatabaseManager:
             query: SQL文（プレースホルダ付き）
             data_list: データリスト
         Returns:
-            影響を受けた行数
+            影響を受けた行数（ON DUPLICATE KEY UPDATE で変更がなければ0）。接続エラー・SQLエラー時はNone
         """
         if not data_list or len(data_list) == 0:
             return 0
 
-        connection = self.get_connection()
+        connection = self._acquire_connection()
         if not connection:
-            return 0
+            return None
 
         try:
             cursor = connection.cursor()
@@ -141,17 +221,24 @@ class DatabaseManager:
             connection.commit()
             affected_rows = cursor.rowcount
             cursor.close()
-            connection.close()
+            self._release_connection(connection)
             return affected_rows
 
         except Error as e:
             st.error(f"❌ 一括挿入エラー: {e}")
             st.error(f"クエリ: {query[:100]}...")
             st.error(f"データサンプル: {data_list[0] if data_list else 'なし'}")
-            if connection:
-                connection.rollback()
-                connection.close()
-            return 0
+            self._rollback_and_release(connection)
+            return None
+
+    def _rollback_and_release(self, connection):
+        """エラー時にロールバックして接続を返却（切断済みなら破棄）"""
+        try:
+            connection.rollback()
+        except Error:
+            self._release_connection(connection, discard=True)
+            return
+        self._release_connection(connection)
 
     def get_table_stats(self, table_name: str) -> Optional[Dict[str, Any]]:
         """
@@ -205,6 +292,84 @@ class DatabaseManager:
             return [row['ticker'] for row in result]
         return []
 
+    # dividend_aristocrats_metrics から取得する列
+    ARISTOCRAT_COLUMNS = """
+                ticker,
+                company_name,
+                current_dividend_yield,
+                after_tax_yield,
+                consecutive_increase_years,
+                dividend_cagr_5y,
+                dividend_cagr_10y,
+                payout_ratio,
+                payout_ratio_status,
+                fcf_payout_ratio,
+                fcf_payout_status,
+                aristocrat_status,
+                data_quality,
+                last_updated,
+                calculation_error"""
+
+    # これより多い銘柄はIN句ではなく一時テーブルに入れて絞り込む
+    TICKER_IN_LIMIT = 500
+
+    def _fetch_for_tickers(self, queries: List[Tuple[str, tuple]],
+                           tickers: Optional[List[str]]) -> Optional[List[List[Dict[str, Any]]]]:
+        """
+        銘柄コードで絞り込むSELECTを1本の接続でまとめて実行
+        各クエリの {ticker_filter} を、少数の銘柄ならIN句、多数なら一時テーブルを参照する条件に置き換える
+
+        Args:
+            queries: (SQL, パラメータ) のリスト。{ticker_filter} はWHERE句の最後の条件の位置に置く
+            tickers: 銘柄コードのリスト（Noneの場合は絞り込まない）
+
+        Returns:
+            クエリごとの結果（辞書のリスト）のリスト。失敗時はNone
+        """
+        if tickers is not None and len(tickers) == 0:
+            return [[] for _ in queries]
+
+        connection = self._acquire_connection()
+        if not connection:
+            return None
+
+        use_temp_table = tickers is not None and len(tickers) > self.TICKER_IN_LIMIT
+        try:
+            cursor = connection.cursor(dictionary=True)
+            if tickers is None:
+                condition, ticker_params = "", ()
+            elif use_temp_table:
+                # 銘柄コードは複数行INSERT（executemany）1回で一時テーブルに入れる
+                cursor.execute("DROP TEMPORARY TABLE IF EXISTS tmp_filter_tickers")
+                cursor.execute(
+                    "CREATE TEMPORARY TABLE tmp_filter_tickers (ticker VARCHAR(10) PRIMARY KEY) ENGINE=MEMORY"
+                )
+                cursor.executemany(
+                    "INSERT IGNORE INTO tmp_filter_tickers (ticker) VALUES (%s)",
+                    [(ticker,) for ticker in tickers]
+                )
+                condition, ticker_params = "AND ticker IN (SELECT ticker FROM tmp_filter_tickers)", ()
+            else:
+                placeholders = ','.join(['%s'] * len(tickers))
+                condition, ticker_params = f"AND ticker IN ({placeholders})", tuple(tickers)
+
+            results = []
+            for query, params in queries:
+                cursor.execute(query.format(ticker_filter=condition), tuple(params) + ticker_params)
+                results.append(cursor.fetchall())
+
+            if use_temp_table:
+                cursor.execute("DROP TEMPORARY TABLE IF EXISTS tmp_filter_tickers")
+            connection.commit()
+            cursor.close()
+            self._release_connection(connection)
+            return results
+
+        except Error as e:
+            st.error(f"❌ クエリ実行エラー: {e}")
+            self._rollback_and_release(connection)
+            return None
+
     def get_dividend_aristocrats_metrics(
         self,
         tickers: Optional[List[str]] = None,
@@ -222,71 +387,73 @@ class DatabaseManager:
         Returns:
             指標データのリスト
         """
-        # 大量の銘柄リストの場合は分割処理（MySQLのIN句の制限対策）
-        if tickers and len(tickers) > 1000:
-            all_results = []
-            batch_size = 500
-            for i in range(0, len(tickers), batch_size):
-                batch = tickers[i:i+batch_size]
-                batch_results = self.get_dividend_aristocrats_metrics(
-                    tickers=batch,
-                    min_consecutive_years=min_consecutive_years,
-                    max_cache_age_hours=max_cache_age_hours
-                )
-                all_results.extend(batch_results)
-            return all_results
-
-        if tickers:
-            placeholders = ','.join(['%s'] * len(tickers))
-            ticker_condition = f"AND ticker IN ({placeholders})"
-            params = (min_consecutive_years,) + tuple(tickers)
-        else:
-            ticker_condition = ""
-            params = (min_consecutive_years,)
-
         query = f"""
-            SELECT
-                ticker,
-                company_name,
-                current_dividend_yield,
-                after_tax_yield,
-                consecutive_increase_years,
-                dividend_cagr_5y,
-                dividend_cagr_10y,
-                payout_ratio,
-                payout_ratio_status,
-                fcf_payout_ratio,
-                fcf_payout_status,
-                aristocrat_status,
-                data_quality,
-                last_updated,
-                calculation_error
+            SELECT {self.ARISTOCRAT_COLUMNS}
             FROM dividend_aristocrats_metrics
             WHERE consecutive_increase_years >= %s
-                {ticker_condition}
-                AND last_updated >= DATE_SUB(NOW(), INTERVAL {max_cache_age_hours} HOUR)
+                AND last_updated >= DATE_SUB(NOW(), INTERVAL %s HOUR)
+                {{ticker_filter}}
             ORDER BY consecutive_increase_years DESC, dividend_cagr_5y DESC
         """
+        results = self._fetch_for_tickers(
+            [(query, (min_consecutive_years, max_cache_age_hours))], tickers or None
+        )
+        return results[0] if results else []
 
-        result = self.execute_query(query, params)
-        return result if result else []
-
-    def upsert_dividend_aristocrat_metrics(
+    def screen_dividend_aristocrats_metrics(
         self,
-        ticker: str,
-        metrics: Dict[str, Any]
-    ) -> bool:
+        tickers: Optional[List[str]] = None,
+        min_consecutive_years: int = 0,
+        min_cagr: Optional[float] = None,
+        max_payout_ratio: Optional[float] = None,
+        max_cache_age_hours: int = 24
+    ) -> Tuple[List[Dict[str, Any]], set]:
         """
-        配当貴族指標をDBに保存（UPSERT）
-        
+        配当貴族の条件での絞り込みと並べ替えをDB側で行い、キャッシュ済みの銘柄も1本の接続で取得
+
         Args:
-            ticker: 銘柄コード
-            metrics: 指標データ
-        
+            tickers: 銘柄コードリスト（Noneの場合は全件）
+            min_consecutive_years: 最低連続増配年数（idx_consecutive_years）
+            min_cagr: 最低配当CAGR (%)（Noneの場合は条件なし。指定時はCAGR未計算の銘柄を除く）
+            max_payout_ratio: 最大配当性向 (%)（配当性向が未計算の銘柄は除外しない）
+            max_cache_age_hours: キャッシュの最大有効期間（時間）
+
         Returns:
-            成功フラグ
+            (条件を満たす指標データのリスト（連続増配年数・CAGRの降順）, 有効期間内のキャッシュがある銘柄コードのセット)
         """
-        query = """
+        conditions = ["consecutive_increase_years >= %s"]
+        params = [min_consecutive_years]
+        if min_cagr is not None:
+            conditions.append("dividend_cagr_5y >= %s")
+            params.append(min_cagr)
+        if max_payout_ratio is not None:
+            conditions.append("(payout_ratio IS NULL OR payout_ratio <= %s)")
+            params.append(max_payout_ratio)
+        conditions.append("last_updated >= DATE_SUB(NOW(), INTERVAL %s HOUR)")
+        params.append(max_cache_age_hours)
+
+        screen_query = f"""
+            SELECT {self.ARISTOCRAT_COLUMNS}
+            FROM dividend_aristocrats_metrics
+            WHERE {' AND '.join(conditions)}
+                {{ticker_filter}}
+            ORDER BY consecutive_increase_years DESC, dividend_cagr_5y DESC
+        """
+        cached_query = """
+            SELECT ticker
+            FROM dividend_aristocrats_metrics
+            WHERE last_updated >= DATE_SUB(NOW(), INTERVAL %s HOUR)
+                {ticker_filter}
+        """
+        results = self._fetch_for_tickers(
+            [(screen_query, tuple(params)), (cached_query, (max_cache_age_hours,))], tickers
+        )
+        if results is None:
+            return [], set()
+        screened, cached = results
+        return screened, {row['ticker'] for row in cached}
+
+    DIVIDEND_ARISTOCRAT_UPSERT_QUERY = """
             INSERT INTO dividend_aristocrats_metrics (
                 ticker,
                 company_name,
@@ -321,27 +488,127 @@ class DatabaseManager:
                 calculation_error = VALUES(calculation_error),
                 last_updated = CURRENT_TIMESTAMP
         """
-        
-        params = (
+
+    @staticmethod
+    def _aristocrat_metrics_params(ticker: str, metrics: Dict[str, Any]) -> tuple:
+        """配当貴族指標（分析結果の日本語キー、またはDBの列名キー）をUPSERT用のタプルに変換"""
+        def pick(japanese_key: str, column: str, default: Any = None) -> Any:
+            # 0や0.0も有効な値なので、真偽値ではなくキーの有無でどちらのキーを使うか決める
+            value = metrics.get(japanese_key if japanese_key in metrics else column)
+            return default if value is None else value
+
+        return (
             ticker,
-            metrics.get('銘柄名') or metrics.get('company_name'),
-            metrics.get('現在配当利回り') or metrics.get('current_dividend_yield'),
-            metrics.get('税引後利回り') or metrics.get('after_tax_yield'),
-            metrics.get('連続増配年数', 0) or metrics.get('consecutive_increase_years', 0),
-            metrics.get('配当CAGR') or metrics.get('dividend_cagr_5y'),
+            pick('銘柄名', 'company_name'),
+            pick('現在配当利回り', 'current_dividend_yield'),
+            pick('税引後利回り', 'after_tax_yield'),
+            pick('連続増配年数', 'consecutive_increase_years', 0),
+            pick('配当CAGR', 'dividend_cagr_5y'),
             metrics.get('dividend_cagr_10y'),
-            metrics.get('配当性向') or metrics.get('payout_ratio'),
-            metrics.get('配当性向評価', '') or metrics.get('payout_ratio_status', ''),
-            metrics.get('FCF配当性向') or metrics.get('fcf_payout_ratio'),
-            metrics.get('FCF配当性向評価', '') or metrics.get('fcf_payout_status', ''),
-            metrics.get('ステータス', '') or metrics.get('aristocrat_status', ''),
+            pick('配当性向', 'payout_ratio'),
+            pick('配当性向評価', 'payout_ratio_status', ''),
+            pick('FCF配当性向', 'fcf_payout_ratio'),
+            pick('FCF配当性向評価', 'fcf_payout_status', ''),
+            pick('ステータス', 'aristocrat_status', ''),
             metrics.get('data_quality', 'complete'),
-            metrics.get('エラー') or metrics.get('calculation_error')
+            pick('エラー', 'calculation_error')
         )
+
+    def upsert_dividend_aristocrat_metrics(
+        self,
+        ticker: str,
+        metrics: Dict[str, Any]
+    ) -> bool:
+        """
+        配当貴族指標をDBに保存（UPSERT）
+        
+        Args:
+            ticker: 銘柄コード
+            metrics: 指標データ
         
-        result = self.execute_query(query, params, fetch=False)
+        Returns:
+            成功フラグ
+        """
+        params = self._aristocrat_metrics_params(ticker, metrics)
+        result = self.execute_query(self.DIVIDEND_ARISTOCRAT_UPSERT_QUERY, params, fetch=False)
         return result is not None and result > 0
 
+    def upsert_dividend_aristocrat_metrics_many(
+        self,
+        items: List[Tuple[str, Dict[str, Any]]],
+        batch_size: int = 500
+    ) -> int:
+        """
+        複数銘柄の配当貴族指標をまとめて保存（batch_size件ごとに複数行のINSERT ... ON DUPLICATE KEY UPDATE 1回）
+
+        Args:
+            items: (銘柄コード, 指標データ) のリスト
+            batch_size: 1回の文で保存する銘柄数
+
+        Returns:
+            影響を受けた行数の合計（保存に失敗したバッチがある場合はNone）
+        """
+        total = 0
+        for start in range(0, len(items), batch_size):
+            rows = [self._aristocrat_metrics_params(ticker, metrics)
+                    for ticker, metrics in items[start:start + batch_size]]
+            affected_rows = self.execute_many(self.DIVIDEND_ARISTOCRAT_UPSERT_QUERY, rows)
+            if affected_rows is None:
+                return None
+            total += affected_rows
+        return total
+
+    def get_yearly_dividends(self, tickers: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        yearly_dividendsテーブルの年次配当を縦持ちで取得（全銘柄の一括計算用）
+
+        Args:
+            tickers: 銘柄コードリスト（Noneの場合は全件）
+
+        Returns:
+            {'ticker', 'year', 'dividend', 'payments'} のリスト（銘柄・年順）
+        """
+        query = """
+            SELECT ticker, year, total AS dividend, payments
+            FROM yearly_dividends
+            WHERE 1 = 1
+                {ticker_filter}
+            ORDER BY ticker, year
+        """
+        results = self._fetch_for_tickers([(query, ())], tickers)
+        return results[0] if results else []
+
+    def update_dividend_growth_metrics(self, rows: List[tuple], batch_size: int = 500) -> int:
+        """
+        キャッシュ済み銘柄の配当成長指標（連続増配年数・CAGR・ステータス）だけを一括更新
+        yfinanceから取得した列と最終更新日時（キャッシュの有効期間の判定に使う）は変更しない
+
+        Args:
+            rows: (ticker, 連続増配年数, CAGR 5年, CAGR 10年, ステータス) のリスト（キャッシュにある銘柄のみ）
+            batch_size: 1回の文で更新する銘柄数
+
+        Returns:
+            影響を受けた行数の合計（更新に失敗したバッチがある場合はNone）
+        """
+        query = """
+            INSERT INTO dividend_aristocrats_metrics (
+                ticker, consecutive_increase_years, dividend_cagr_5y, dividend_cagr_10y, aristocrat_status
+            ) VALUES (%s, %s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                consecutive_increase_years = VALUES(consecutive_increase_years),
+                dividend_cagr_5y = VALUES(dividend_cagr_5y),
+                dividend_cagr_10y = VALUES(dividend_cagr_10y),
+                aristocrat_status = VALUES(aristocrat_status),
+                last_updated = last_updated
+        """
+        total = 0
+        for start in range(0, len(rows), batch_size):
+            affected_rows = self.execute_many(query, rows[start:start + batch_size])
+            if affected_rows is None:
+                return None
+            total += affected_rows
+        return total
+
     def get_cached_metrics_count(self) -> Dict[str, Any]:
         """
         キャッシュ統計を取得
@@ -0,0 +1,225 @@
+"""
+EDINET書類一覧インデックス
+日付ごとの書類一覧（documents.json）を edinet_documents に保存し、
+企業ごとの書類を書類一覧APIを日付ごとに呼ばずにインデックスから検索する
+"""
+
+import re
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+
+class EDINETFilingIndex:
+    """
+    EDINETの書類一覧をDBに保存・検索するクラス
+
+    取り込み済みの日付は edinet_index_dates に記録し、次回以降は未取得の日付だけを取得する。
+    書類一覧は当日中に追加されうるため、翌日以降に取り込んだ日付だけを取得済みとして扱う。
+    """
+
+    # 1回の並列取得にまとめる日数
+    CRAWL_CHUNK_DAYS = 30
+
+    DOCUMENT_UPSERT_QUERY = """
+        INSERT INTO edinet_documents (
+            doc_id, filing_date, sec_code, edinet_code, doc_type_code, period_end, filer_name
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            filing_date = VALUES(filing_date),
+            sec_code = VALUES(sec_code),
+            edinet_code = VALUES(edinet_code),
+            doc_type_code = VALUES(doc_type_code),
+            period_end = VALUES(period_end),
+            filer_name = VALUES(filer_name)
+        """
+
+    DATE_UPSERT_QUERY = """
+        INSERT INTO edinet_index_dates (filing_date, document_count, indexed_at)
+        VALUES (%s, %s, NOW())
+        ON DUPLICATE KEY UPDATE
+            document_count = VALUES(document_count),
+            indexed_at = NOW()
+        """
+
+    def __init__(self, db=None):
+        """
+        初期化
+        Args:
+            db: repository.database_manager.DatabaseManager（Noneの場合は新規作成）
+        """
+        if db is None:
+            from repository.database_manager import DatabaseManager
+            db = DatabaseManager()
+        self.db = db
+
+    @staticmethod
+    def date_range(start_date: str, end_date: str) -> List[str]:
+        """
+        期間内の日付を新しい順に列挙
+        Args:
+            start_date: 開始日（YYYY-MM-DD形式）
+            end_date: 終了日（YYYY-MM-DD形式）
+        Returns:
+            日付（YYYY-MM-DD形式）のリスト（終了日から開始日へ）
+        """
+        start = datetime.strptime(start_date, '%Y-%m-%d')
+        current = datetime.strptime(end_date, '%Y-%m-%d')
+        dates = []
+        while current >= start:
+            dates.append(current.strftime('%Y-%m-%d'))
+            current -= timedelta(days=1)
+        return dates
+
+    @staticmethod
+    def documents_to_rows(date: str, documents: Dict) -> List[tuple]:
+        """
+        書類一覧の応答を edinet_documents の行に変換
+        Args:
+            date: 書類一覧の日付（YYYY-MM-DD形式）
+            documents: get_documents_list() の戻り値
+        Returns:
+            (doc_id, filing_date, sec_code, edinet_code, doc_type_code, period_end, filer_name) のリスト
+        """
+        rows = []
+        for doc in documents.get('results', []):
+            doc_id = doc.get('docID')
+            if not doc_id:
+                continue
+            rows.append((
+                doc_id,
+                date,
+                (doc.get('secCode') or '').replace(' ', '') or None,
+                doc.get('edinetCode') or None,
+                doc.get('docTypeCode') or None,
+                doc.get('periodEnd') or None,
+                (doc.get('filerName') or '')[:255] or None,
+            ))
+        return rows
+
+    def missing_dates(self, dates: List[str]) -> Optional[List[str]]:
+        """
+        まだ取り込んでいない日付を抽出
+        Args:
+            dates: 日付（YYYY-MM-DD形式）のリスト
+        Returns:
+            未取得の日付のリスト（dates の順序を保つ。DBエラー時はNone）
+        """
+        if not dates:
+            return []
+        rows = self.db.execute_query("""
+            SELECT filing_date
+            FROM edinet_index_dates
+            WHERE filing_date BETWEEN %s AND %s
+              AND indexed_at >= DATE_ADD(filing_date, INTERVAL 1 DAY)
+        """, (min(dates), max(dates)))
+        if rows is None:
+            return None
+        indexed = {str(row['filing_date']) for row in rows}
+        return [date for date in dates if date not in indexed]
+
+    def crawl(self, repo, dates: List[str],
+              on_progress: Optional[Callable[[int, int], None]] = None) -> Dict[str, int]:
+        """
+        指定した日付の書類一覧を並列に取得して保存
+        Args:
+            repo: EDINETRepository
+            dates: 日付（YYYY-MM-DD形式）のリスト
+            on_progress: 進捗通知 (処理済み日数, 全日数)
+        Returns:
+            {'dates': 取り込んだ日数, 'documents': 保存した書類数, 'failed': 取得・保存に失敗した日数}
+        """
+        stats = {'dates': 0, 'documents': 0, 'failed': 0}
+        for start in range(0, len(dates), self.CRAWL_CHUNK_DAYS):
+            chunk = dates[start:start + self.CRAWL_CHUNK_DAYS]
+            documents_lists = repo.get_documents_lists(chunk)
+
+            document_rows = []
+            date_rows = []
+            for date in chunk:
+                documents = documents_lists.get(date)
+                if documents is None:
+                    # 取得に失敗した日付は記録せず、次回に取得し直す
+                    stats['failed'] += 1
+                    continue
+                rows = self.documents_to_rows(date, documents)
+                document_rows.extend(rows)
+                date_rows.append((date, len(rows)))
+
+            # 書類の保存に成功した場合だけ日付を取得済みにする（失敗した日付は次回に取得し直す）
+            if (self.db.execute_many(self.DOCUMENT_UPSERT_QUERY, document_rows) is None
+                    or self.db.execute_many(self.DATE_UPSERT_QUERY, date_rows) is None):
+                stats['failed'] += len(date_rows)
+            else:
+                stats['dates'] += len(date_rows)
+                stats['documents'] += len(document_rows)
+
+            if on_progress is not None:
+                on_progress(min(start + len(chunk), len(dates)), len(dates))
+        return stats
+
+    def sync(self, repo, start_date: str, end_date: str,
+             on_progress: Optional[Callable[[int, int], None]] = None) -> Optional[Dict[str, int]]:
+        """
+        期間内の未取得の日付だけを取得して保存（毎日の差分更新にも使う）
+        Args:
+            repo: EDINETRepository
+            start_date: 開始日（YYYY-MM-DD形式）
+            end_date: 終了日（YYYY-MM-DD形式）
+            on_progress: 進捗通知 (処理済み日数, 全日数)
+        Returns:
+            crawl() の戻り値（DBエラー時はNone）
+        """
+        missing = self.missing_dates(self.date_range(start_date, end_date))
+        if missing is None:
+            return None
+        return self.crawl(repo, missing, on_progress=on_progress)
+
+    def find_documents(self, company_code: str, start_date: str, end_date: str,
+                       doc_types: Optional[List[str]] = None) -> Optional[List[Dict]]:
+        """
+        企業の書類を期間で検索
+        Args:
+            company_code: 証券コード（4桁・5桁）またはEDINETコード（E + 5桁）
+            start_date: 開始日（YYYY-MM-DD形式）
+            end_date: 終了日（YYYY-MM-DD形式）
+            doc_types: 書類種類コードのリスト（Noneの場合はすべて）
+        Returns:
+            書類一覧APIの results と同じキーの辞書と 'filingDate' のリスト（提出日の新しい順。DBエラー時はNone）
+        """
+        company_code = company_code.replace('.T', '').replace(' ', '')
+        if re.fullmatch(r'E\d{5}', company_code):
+            condition, params = "edinet_code = %s", [company_code]
+        else:
+            # secCode は証券コード4桁 + チェック用の1桁
+            condition, params = "sec_code LIKE %s", [company_code + '%']
+        params.extend([start_date, end_date])
+
+        doc_type_filter = ""
+        if doc_types is not None:
+            if not doc_types:
+                return []
+            doc_type_filter = f"AND doc_type_code IN ({', '.join(['%s'] * len(doc_types))})"
+            params.extend(doc_types)
+
+        rows = self.db.execute_query(f"""
+            SELECT doc_id, filing_date, sec_code, edinet_code, doc_type_code, period_end, filer_name
+            FROM edinet_documents
+            WHERE {condition}
+              AND filing_date BETWEEN %s AND %s
+              {doc_type_filter}
+            ORDER BY filing_date DESC, doc_id
+        """, tuple(params))
+        if rows is None:
+            return None
+        return [
+            {
+                'docID': row['doc_id'],
+                'filingDate': str(row['filing_date']),
+                'secCode': row['sec_code'],
+                'edinetCode': row['edinet_code'],
+                'docTypeCode': row['doc_type_code'],
+                'periodEnd': str(row['period_end']) if row['period_end'] is not None else None,
+                'filerName': row['filer_name'],
+            }
+            for row in rows
+        ]
@@ -3,29 +3,52 @@ EDINET API リポジトリ
 金融庁のEDINET APIから財務データを取得
 """
 
+import asyncio
 import requests
 import pandas as pd
 import zipfile
 import io
 import xml.etree.ElementTree as ET
 from datetime import datetime, timedelta
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Tuple
 import re
+import json
+from config import CACHE_CONFIG
+from repository.async_fetcher import AsyncFetcher, FetchError, run_sync
+from repository.response_cache import get_response_cache
 
 
 class EDINETRepository:
     """EDINET APIを使用したデータ取得"""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, filing_index=None):
         """
         初期化
         
         Args:
             api_key: EDINET APIキー
+            filing_index: EDINETFilingIndex（指定時は企業の書類をDBの書類一覧インデックスから検索）
         """
         self.api_key = api_key
         self.base_url = "https://api.edinet-fsa.go.jp/api/v2"
+        self.filing_index = filing_index
     
+    def _documents_list_ttl(self, date: str) -> Optional[float]:
+        """書類一覧のキャッシュ有効期間（過去日の書類一覧は変わらないため期限なし、当日分は短期間のみ）"""
+        is_past = date < datetime.now().strftime('%Y-%m-%d')
+        return CACHE_CONFIG.edinet_list_past_ttl if is_past else CACHE_CONFIG.edinet_list_today_ttl
+
+    @staticmethod
+    def _parse_documents_list(content: bytes) -> Optional[Dict]:
+        """書類一覧の応答を辞書に変換（APIのステータスが200以外の場合はNone）"""
+        try:
+            result = json.loads(content)
+        except ValueError:
+            return None
+        if result.get('metadata', {}).get('status') == '200':
+            return result
+        return None
+
     def get_documents_list(self, date: str, doc_type: int = 2) -> Optional[Dict]:
         """
         書類一覧を取得
@@ -44,14 +67,21 @@ class EDINETRepository:
             'Subscription-Key': self.api_key
         }
 
+        # キャッシュキーにAPIキーは含めない
+        cache = get_response_cache()
+        cache_key = f"{date}:{doc_type}"
+        cached = cache.get('edinet.documents_list', cache_key)
+        if cached is not None:
+            return json.loads(cached)
+
         try:
             response = requests.get(url, params=params, timeout=30)
             if response.status_code == 200:
-                result = response.json()
-                if result.get('metadata', {}).get('status') == '200':
-                    return result
-                else:
-                    return None
+                result = self._parse_documents_list(response.content)
+                if result is not None:
+                    cache.set('edinet.documents_list', cache_key, response.content,
+                              self._documents_list_ttl(date))
+                return result
             else:
                 return None
         except Exception:
@@ -74,16 +104,118 @@ class EDINETRepository:
             'Subscription-Key': self.api_key
         }
 
+        cache = get_response_cache()
+        cache_key = f"{doc_id}:{doc_type}"
+        cached = cache.get('edinet.document', cache_key)
+        if cached is not None:
+            return cached
+
         try:
             response = requests.get(url, params=params, timeout=60)
             if response.status_code == 200:
+                cache.set('edinet.document', cache_key, response.content, CACHE_CONFIG.edinet_document_ttl)
                 return response.content
             else:
                 return None
         except Exception:
             return None
-    
-    def extract_xbrl_data(self, zip_content: bytes) -> Optional[bytes]:
+
+    async def get_documents_list_async(self, fetcher: AsyncFetcher, date: str,
+                                       doc_type: int = 2) -> Optional[Dict]:
+        """
+        書類一覧を取得（asyncio版。キャッシュは get_documents_list と共有）
+
+        Args:
+            fetcher: 開いているAsyncFetcher
+            date: 日付（YYYY-MM-DD形式）
+            doc_type: 1=メタデータのみ, 2=提出書類一覧及びメタデータ
+
+        Returns:
+            書類一覧の辞書、またはNone
+        """
+        params = {'date': date, 'type': doc_type, 'Subscription-Key': self.api_key}
+        try:
+            content = await fetcher.get_cached(
+                'edinet.documents_list', f"{date}:{doc_type}", f"{self.base_url}/documents.json",
+                params=params, ttl=self._documents_list_ttl(date),
+                should_cache=lambda body: self._parse_documents_list(body) is not None
+            )
+        except FetchError:
+            return None
+        return self._parse_documents_list(content)
+
+    async def get_document_async(self, fetcher: AsyncFetcher, doc_id: str,
+                                 doc_type: int = 1) -> Optional[bytes]:
+        """
+        書類を取得（asyncio版。キャッシュは get_document と共有）
+
+        Args:
+            fetcher: 開いているAsyncFetcher
+            doc_id: 書類ID
+            doc_type: 1=提出本文書及び監査報告書(XBRL含む), 5=CSV形式
+
+        Returns:
+            書類コンテンツ（bytes）、またはNone
+        """
+        params = {'type': doc_type, 'Subscription-Key': self.api_key}
+        try:
+            return await fetcher.get_cached(
+                'edinet.document', f"{doc_id}:{doc_type}", f"{self.base_url}/documents/{doc_id}",
+                params=params, ttl=CACHE_CONFIG.edinet_document_ttl, timeout=60
+            )
+        except FetchError:
+            return None
+
+    def get_documents_lists(self, dates: List[str], doc_type: int = 2) -> Dict[str, Optional[Dict]]:
+        """
+        複数日の書類一覧を並列に取得
+
+        Args:
+            dates: 日付（YYYY-MM-DD形式）のリスト
+            doc_type: 1=メタデータのみ, 2=提出書類一覧及びメタデータ
+
+        Returns:
+            {日付: 書類一覧の辞書またはNone}
+        """
+        async def fetch_all():
+            async with AsyncFetcher() as fetcher:
+                results = await asyncio.gather(
+                    *(self.get_documents_list_async(fetcher, date, doc_type) for date in dates)
+                )
+            return dict(zip(dates, results))
+
+        return run_sync(fetch_all())
+
+    def get_parsed_documents(self, doc_ids: List[str],
+                             doc_type: int = 1) -> Dict[str, Tuple[Optional[int], Optional[int], Optional[Dict]]]:
+        """
+        複数の書類を並列にダウンロードし、完了したものから順にXBRLの抽出・解析をエグゼキューターで実行
+
+        Args:
+            doc_ids: 書類IDのリスト
+            doc_type: 1=提出本文書及び監査報告書(XBRL含む)
+
+        Returns:
+            {書類ID: (書類のバイト数, XBRLのバイト数, 解析結果)}（取得・抽出できなかった項目はNone）
+        """
+        async def fetch_and_parse(fetcher, doc_id):
+            content = await self.get_document_async(fetcher, doc_id, doc_type)
+            if not content:
+                return None, None, None
+            xbrl_size, parsed = await fetcher.run_cpu(parse_document_content, content)
+            return len(content), xbrl_size, parsed
+
+        async def fetch_all():
+            async with AsyncFetcher() as fetcher:
+                results = await asyncio.gather(*(fetch_and_parse(fetcher, doc_id) for doc_id in doc_ids))
+            return dict(zip(doc_ids, results))
+
+        if not doc_ids:
+            return {}
+        return run_sync(fetch_all())
+
+    @staticmethod
+    def extract_xbrl_data(zip_content: bytes) -> Optional[bytes]:
         """
         ZIPファイルからXBRLデータを抽出
 
@@ -142,7 +274,8 @@ class EDINETRepository:
             print(f"XBRL抽出エラー: {e}")
             return None
 
-    def parse_xbrl_to_dataframe(self, xbrl_content: bytes) -> Optional[Dict[str, pd.DataFrame]]:
+    @staticmethod
+    def parse_xbrl_to_dataframe(xbrl_content: bytes) -> Optional[Dict[str, pd.DataFrame]]:
         """
         XBRLデータをパースして財務データをDataFrameに変換
 
@@ -289,6 +422,30 @@ class EDINETRepository:
         except Exception:
             return None
     
+    def _documents_lists_from_index(self, company_code: str, dates: List[str],
+                                    doc_types: Optional[List[str]]) -> Optional[Dict[str, Dict]]:
+        """
+        書類一覧インデックスを差分更新し、企業の書類を日付ごとの書類一覧の形で取得
+
+        Args:
+            company_code: 企業コード（証券コードまたはEDINETコード）
+            dates: 日付（YYYY-MM-DD形式）のリスト（新しい順）
+            doc_types: 書類種類コードのリスト（Noneの場合はすべて）
+
+        Returns:
+            {日付: {'results': [書類]}}（企業の書類がある日付のみ）、またはNone（DBを使えない場合）
+        """
+        if self.filing_index.sync(self, dates[-1], dates[0]) is None:
+            return None
+        documents = self.filing_index.find_documents(company_code, dates[-1], dates[0], doc_types)
+        if documents is None:
+            return None
+
+        documents_lists = {}
+        for doc in documents:
+            documents_lists.setdefault(doc['filingDate'], {'results': []})['results'].append(doc)
+        return documents_lists
+
     def get_financial_statements(self, company_code: str, years: int = 5,
                                  doc_types: List[str] = None) -> Dict[str, Dict[str, pd.DataFrame]]:
         """
@@ -322,14 +479,27 @@ class EDINETRepository:
         dates_with_docs = 0
         matching_docs_count = 0
         sample_sec_codes = []  # サンプル証券コードを収集
+        matched_docs = []  # 期間内にマッチした書類（新しい日付順）
 
         # 毎日チェック（書類提出日を確実にカバー）
+        # インデックスがあれば未取得の日付だけを取り込んで検索し、なければ対象期間の書類一覧をまとめて並列に取得しておく
+        dates = []
+        current_date = end_date
+        while current_date >= start_date:
+            dates.append(current_date.strftime('%Y-%m-%d'))
+            current_date -= timedelta(days=1)
+        documents_lists = None
+        if self.filing_index is not None:
+            documents_lists = self._documents_lists_from_index(company_code, dates, doc_types)
+        if documents_lists is None:
+            documents_lists = self.get_documents_lists(dates)
+
         current_date = end_date
         while current_date >= start_date:
             date_str = current_date.strftime('%Y-%m-%d')
             total_checked_dates += 1
 
-            documents = self.get_documents_list(date_str)
+            documents = documents_lists.get(date_str)
             if not documents:
                 current_date -= timedelta(days=1)
                 continue
@@ -363,40 +533,36 @@ class EDINETRepository:
                     else:
                         print(f"    ✗ 書類種類不一致: doc_type='{doc_type}' not in {doc_types}")
 
-            # 各書類のデータを取得
-            for doc in company_docs:
-                doc_id = doc.get('docID')
-                doc_type_code = doc.get('docTypeCode')
-                filer_name_for_dl = doc.get('filerName', '')
-
-                print(f"      → 書類ダウンロード試行: {doc_id} | 種類: {doc_type_code}")
-                doc_content = self.get_document(doc_id, doc_type=1)  # XBRL形式に変更
-
-                if doc_content:
-                    print(f"        ✓ ダウンロード成功 ({len(doc_content)} bytes)")
-
-                    # XBRLデータを抽出
-                    xbrl_content = self.extract_xbrl_data(doc_content)
-                    if xbrl_content:
-                        print(f"        ✓ XBRL抽出成功 ({len(xbrl_content)} bytes)")
-
-                        # XBRLをパースしてDataFrameに変換
-                        parsed_data = self.parse_xbrl_to_dataframe(xbrl_content)
-                        if parsed_data:
-                            period = doc.get('periodEnd', 'Unknown')
-                            financial_data[period] = parsed_data
-                            print(f"        ✓ XBRL解析成功: {len(parsed_data)} カテゴリ")
-                            for category, df in parsed_data.items():
-                                print(f"          - {category}: {len(df)} 項目")
-                        else:
-                            print(f"        ✗ XBRL解析失敗: 財務データを抽出できませんでした")
-                    else:
-                        print(f"        ✗ XBRL抽出失敗: ZIPにXBRLファイルなし")
-                else:
-                    print(f"        ✗ ダウンロード失敗またはデータなし")
+            # 書類はまとめて並列にダウンロードするため、ここでは集めておく
+            matched_docs.extend(company_docs)
 
             current_date -= timedelta(days=1)
 
+        # マッチした書類を並列にダウンロードし、XBRLの抽出・解析はエグゼキューターで行う
+        parsed_documents = self.get_parsed_documents([doc.get('docID') for doc in matched_docs])
+        for doc in matched_docs:
+            doc_id = doc.get('docID')
+            print(f"      → 書類ダウンロード: {doc_id} | 種類: {doc.get('docTypeCode')}")
+            doc_size, xbrl_size, parsed_data = parsed_documents.get(doc_id, (None, None, None))
+
+            if doc_size is None:
+                print(f"        ✗ ダウンロード失敗またはデータなし")
+                continue
+            print(f"        ✓ ダウンロード成功 ({doc_size} bytes)")
+            if xbrl_size is None:
+                print(f"        ✗ XBRL抽出失敗: ZIPにXBRLファイルなし")
+                continue
+            print(f"        ✓ XBRL抽出成功 ({xbrl_size} bytes)")
+            if not parsed_data:
+                print(f"        ✗ XBRL解析失敗: 財務データを抽出できませんでした")
+                continue
+
+            period = doc.get('periodEnd', 'Unknown')
+            financial_data[period] = parsed_data
+            print(f"        ✓ XBRL解析成功: {len(parsed_data)} カテゴリ")
+            for category, df in parsed_data.items():
+                print(f"          - {category}: {len(df)} 項目")
+
         # デバッグ情報を含めて返す（一時的）
         print(f"\n===== デバッグ情報 =====")
         print(f"検索対象企業コード: '{company_code}'")
@@ -410,3 +576,19 @@ class EDINETRepository:
         print(f"====================\n")
 
         return financial_data
+
+
+def parse_document_content(zip_content: bytes) -> Tuple[Optional[int], Optional[Dict[str, pd.DataFrame]]]:
+    """
+    書類のZIPからXBRLを抽出して解析（AsyncFetcher.run_cpu でプロセスプールにも渡せるようモジュールレベルの関数とする）
+
+    Args:
+        zip_content: ZIPファイルのバイナリデータ
+
+    Returns:
+        (XBRLのバイト数, 解析結果)（XBRLがない場合は (None, None)）
+    """
+    xbrl_content = EDINETRepository.extract_xbrl_data(zip_content)
+    if not xbrl_content:
+        return None, None
+    return len(xbrl_content), EDINETRepository.parse_xbrl_to_dataframe(xbrl_content)
@@ -0,0 +1,274 @@
+"""
+適応型レートリミッター
+トークンバケットで呼び出し間隔を制御し、成功時はレートを徐々に上げ、
+レート制限（429）時は大きく下げて一時停止する（AIMD）
+"""
+
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from config import RATE_LIMIT_CONFIG
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """
+    レート制限エラーかどうかを判定
+    Args:
+        error: 例外
+    Returns:
+        yfinanceのYFRateLimitError、またはHTTP 429を示すエラーの場合True
+    """
+    if type(error).__name__ == 'YFRateLimitError':
+        return True
+    message = str(error)
+    return "Too Many Requests" in message or "Rate limited" in message or "429" in message
+
+
+class AdaptiveRateLimiter:
+    """スレッドセーフな適応型トークンバケット"""
+
+    def __init__(self, rate: float, min_rate: float, max_rate: float, burst: float = 1.0,
+                 increase_step: float = 0.1, success_window: int = 20,
+                 decrease_factor: float = 0.5, cooldown: float = 30.0, max_cooldown: float = 300.0):
+        """
+        初期化
+        Args:
+            rate: 初期レート（回/秒）
+            min_rate: 最小レート（回/秒）
+            max_rate: 最大レート（回/秒）
+            burst: バケット容量（連続して即時に許可する回数）
+            increase_step: success_window回連続で成功するごとに加算するレート
+            success_window: レートを上げるまでに必要な連続成功回数
+            decrease_factor: レート制限時にレートに掛ける係数
+            cooldown: レート制限時に全呼び出しを停止する秒数（連続時は倍々に延長）
+            max_cooldown: 停止秒数の上限
+        """
+        self.min_rate = min_rate
+        self.max_rate = max(min_rate, max_rate)
+        self._configured_min_rate = min_rate
+        self.rate = min(max(rate, self.min_rate), self.max_rate)
+        self.burst = max(1.0, burst)
+        self.increase_step = increase_step
+        self.success_window = max(1, success_window)
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+
+        self._lock = threading.Lock()
+        self._tokens = self.burst
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._streak = 0  # レート引き上げまでの連続成功数
+        self._consecutive_limited = 0
+
+        # 統計カウンタ
+        self._requests = 0
+        self._successes = 0
+        self._failures = 0
+        self._rate_limited = 0
+        self._retries = 0
+        self._wait_seconds = 0.0
+        self._peak_rate = self.rate
+
+    def _refill(self, now: float):
+        """経過時間分のトークンを補充（ロック取得済みで呼ぶ）"""
+        self._tokens = min(self.burst, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def _try_acquire(self, waited: float) -> float:
+        """
+        トークンを1つ取得を試みる
+        Args:
+            waited: それまでに待機した秒数（取得できた場合に統計へ加算）
+        Returns:
+            取得できた場合は0、できない場合は次に試すまでの待機秒数
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                self._requests += 1
+                self._wait_seconds += waited
+                return 0.0
+            return (1.0 - self._tokens) / self.rate
+
+    def acquire(self) -> float:
+        """
+        1回分の呼び出し枠を取得（空くまで待機）
+        Returns:
+            待機した秒数
+        """
+        waited = 0.0
+        while True:
+            delay = self._try_acquire(waited)
+            if delay <= 0:
+                return waited
+            time.sleep(delay)
+            waited += delay
+
+    async def acquire_async(self) -> float:
+        """
+        1回分の呼び出し枠を取得（asyncio版。待機中もイベントループを止めない）
+        Returns:
+            待機した秒数
+        """
+        waited = 0.0
+        while True:
+            delay = self._try_acquire(waited)
+            if delay <= 0:
+                return waited
+            await asyncio.sleep(delay)
+            waited += delay
+
+    def record_success(self):
+        """呼び出し成功を記録（success_window回ごとにレートを加算）"""
+        with self._lock:
+            self._successes += 1
+            self._consecutive_limited = 0
+            self._streak += 1
+            if self._streak >= self.success_window:
+                self._streak = 0
+                self.rate = min(self.max_rate, self.rate + self.increase_step)
+                self._peak_rate = max(self._peak_rate, self.rate)
+
+    def record_failure(self):
+        """レート制限以外の失敗を記録（レートは変更しない）"""
+        with self._lock:
+            self._failures += 1
+
+    def record_rate_limited(self):
+        """レート制限を記録（レートを下げ、全呼び出しを一時停止）"""
+        with self._lock:
+            self._rate_limited += 1
+            self._streak = 0
+            self.rate = max(self.min_rate, self.rate * self.decrease_factor)
+            pause = min(self.max_cooldown, self.cooldown * (2 ** self._consecutive_limited))
+            self._consecutive_limited += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+            self._tokens = 0.0
+
+    def set_rate(self, rate: float):
+        """
+        現在のレートを変更（範囲外の値は最小・最大レートに丸める）
+        Args:
+            rate: レート（回/秒）
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = min(max(rate, self.min_rate), self.max_rate)
+
+    def set_max_rate(self, max_rate: float):
+        """
+        最大レートを変更（複数ワーカーで全体のレート予算を分け合う場合など）
+        現在のレートと最小レートも新しい最大レート以下に丸める
+
+        Args:
+            max_rate: 最大レート（回/秒）
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self.max_rate = max_rate
+            self.min_rate = min(self._configured_min_rate, max_rate)
+            self.rate = min(max(self.rate, self.min_rate), self.max_rate)
+
+    def call(self, func: Callable[..., Any], *args, max_retries: int = 3, **kwargs) -> Any:
+        """
+        レート制御下で関数を呼び出す（レート制限時は停止後に再試行）
+        Args:
+            func: 呼び出す関数
+            *args: 関数の引数
+            max_retries: レート制限時の最大再試行回数
+            **kwargs: 関数のキーワード引数
+        Returns:
+            関数の戻り値
+        Raises:
+            Exception: 関数が送出した例外（レート制限は再試行し尽くした場合のみ）
+        """
+        attempt = 0
+        while True:
+            self.acquire()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if not is_rate_limit_error(e):
+                    self.record_failure()
+                    raise
+                self.record_rate_limited()
+                if attempt >= max_retries:
+                    raise
+                attempt += 1
+                with self._lock:
+                    self._retries += 1
+                continue
+            self.record_success()
+            return result
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        統計を取得
+        Returns:
+            現在のレート・リクエスト数・レート制限回数などの統計辞書
+        """
+        with self._lock:
+            now = time.monotonic()
+            return {
+                'rate': self.rate,
+                'min_rate': self.min_rate,
+                'max_rate': self.max_rate,
+                'peak_rate': self._peak_rate,
+                'requests': self._requests,
+                'successes': self._successes,
+                'failures': self._failures,
+                'rate_limited': self._rate_limited,
+                'retries': self._retries,
+                'wait_seconds': self._wait_seconds,
+                'paused_seconds': max(0.0, self._paused_until - now),
+            }
+
+
+# プロセス内で共有するリミッター（呼び出し先ごと）
+_limiters: Dict[str, AdaptiveRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(name: str = 'yfinance') -> AdaptiveRateLimiter:
+    """
+    呼び出し先ごとの共有リミッターを取得（なければRATE_LIMIT_CONFIGで作成）
+    Args:
+        name: 呼び出し先の名前
+    Returns:
+        AdaptiveRateLimiter
+    """
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            config = RATE_LIMIT_CONFIG
+            limiter = AdaptiveRateLimiter(
+                rate=config.yfinance_rate,
+                min_rate=config.yfinance_min_rate,
+                max_rate=config.yfinance_max_rate,
+                burst=config.yfinance_burst,
+                increase_step=config.increase_step,
+                success_window=config.success_window,
+                decrease_factor=config.decrease_factor,
+                cooldown=config.cooldown,
+                max_cooldown=config.max_cooldown,
+            )
+            _limiters[name] = limiter
+        return limiter
+
+
+def get_all_rate_limiter_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    全リミッターの統計を取得
+    Returns:
+        {呼び出し先の名前: 統計辞書}
+    """
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {name: limiter.stats() for name, limiter in limiters.items()}
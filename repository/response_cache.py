@@ -0,0 +1,274 @@
+"""
+ディスク永続のレスポンスキャッシュ
+yfinance・JPX・EDINETの取得結果をSQLiteに保存し、実行やセッションをまたいで再利用する
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import requests
+
+from config import CACHE_CONFIG
+
+
+class ResponseCache:
+    """エンドポイント（名前空間）ごとのTTLとサイズ上限付きLRUを持つキャッシュ"""
+
+    def __init__(self, path: str, max_bytes: int):
+        """
+        初期化
+        Args:
+            path: SQLiteファイルのパス
+            max_bytes: キャッシュ全体の最大サイズ（超えた分は最終アクセスが古い順に削除）
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")  # 別プロセス（更新ワーカー等）と共有
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON entries (last_access)")
+        self._conn.commit()
+
+        # 統計カウンタ（プロセス内）: {namespace: {'hits': n, 'misses': n, 'expired': n}}
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._evictions = 0
+
+    def _count(self, namespace: str, name: str):
+        counters = self._counters.setdefault(namespace, {'hits': 0, 'misses': 0, 'expired': 0})
+        counters[name] += 1
+
+    def get(self, namespace: str, key: str) -> Optional[bytes]:
+        """
+        キャッシュから取得
+        Args:
+            namespace: 名前空間（エンドポイント種別）
+            key: キー
+        Returns:
+            保存されたバイト列（なし・期限切れの場合はNone）
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM entries WHERE namespace = ? AND key = ?",
+                (namespace, key)
+            ).fetchone()
+            if row is None:
+                self._count(namespace, 'misses')
+                return None
+
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+                self._conn.commit()
+                self._count(namespace, 'expired')
+                self._count(namespace, 'misses')
+                return None
+
+            self._conn.execute(
+                "UPDATE entries SET last_access = ? WHERE namespace = ? AND key = ?",
+                (now, namespace, key)
+            )
+            self._conn.commit()
+            self._count(namespace, 'hits')
+            return value
+
+    def set(self, namespace: str, key: str, value: bytes, ttl: Optional[float] = None):
+        """
+        キャッシュに保存
+        Args:
+            namespace: 名前空間
+            key: キー
+            value: 保存するバイト列
+            ttl: 有効期間（秒）。Noneの場合は期限なし
+        """
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        with self._lock:
+            self._conn.execute("""
+                INSERT OR REPLACE INTO entries (namespace, key, value, size, created_at, expires_at, last_access)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, (namespace, key, sqlite3.Binary(value), len(value), now, expires_at, now))
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """サイズ上限を超えた分を最終アクセスが古い順に削除（ロック取得済みで呼ぶ）"""
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # 期限切れを先に削除
+        self._conn.execute("DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+        cursor = self._conn.execute("SELECT namespace, key, size FROM entries ORDER BY last_access")
+        victims = []
+        for namespace, key, size in cursor:
+            if total <= self.max_bytes:
+                break
+            victims.append((namespace, key))
+            total -= size
+        self._conn.executemany("DELETE FROM entries WHERE namespace = ? AND key = ?", victims)
+        self._evictions += len(victims)
+
+    def get_or_fetch(self, namespace: str, key: str, fetch: Callable[[], Any], ttl: Optional[float] = None,
+                     should_cache: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        キャッシュにあれば復元して返し、なければ取得して保存
+        Args:
+            namespace: 名前空間
+            key: キー
+            fetch: 値を取得する関数
+            ttl: 有効期間（秒）。Noneの場合は期限なし
+            should_cache: 値を保存するか判定する関数（空データやエラー応答を保存しない場合に指定）
+        Returns:
+            値（pickleで保存・復元する）
+        """
+        cached = self.get(namespace, key)
+        if cached is not None:
+            try:
+                return pickle.loads(cached)
+            except Exception:
+                pass  # 壊れたエントリは取り直して上書き
+
+        value = fetch()
+        if should_cache is None or should_cache(value):
+            self.set(namespace, key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ttl)
+        return value
+
+    def clear(self, namespace: Optional[str] = None):
+        """キャッシュを削除（namespace指定時はその名前空間のみ）"""
+        with self._lock:
+            if namespace is None:
+                self._conn.execute("DELETE FROM entries")
+            else:
+                self._conn.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        キャッシュ統計を取得
+        Returns:
+            件数・サイズ・名前空間ごとのヒット/ミス数
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT namespace, COUNT(*), COALESCE(SUM(size), 0) FROM entries GROUP BY namespace"
+            ).fetchall()
+            namespaces = {}
+            for namespace, count, size in rows:
+                namespaces[namespace] = {'entries': count, 'bytes': size}
+            for namespace, counters in self._counters.items():
+                namespaces.setdefault(namespace, {'entries': 0, 'bytes': 0}).update(counters)
+
+            hits = sum(c['hits'] for c in self._counters.values())
+            misses = sum(c['misses'] for c in self._counters.values())
+            return {
+                'path': self.path,
+                'entries': sum(n['entries'] for n in namespaces.values()),
+                'bytes': sum(n['bytes'] for n in namespaces.values()),
+                'max_bytes': self.max_bytes,
+                'hits': hits,
+                'misses': misses,
+                'hit_rate': hits / (hits + misses) if hits + misses else 0.0,
+                'evictions': self._evictions,
+                'namespaces': namespaces,
+            }
+
+
+class _NullCache:
+    """キャッシュ無効時に使う何もしないキャッシュ"""
+
+    def get(self, namespace, key):
+        return None
+
+    def set(self, namespace, key, value, ttl=None):
+        pass
+
+    def get_or_fetch(self, namespace, key, fetch, ttl=None, should_cache=None):
+        return fetch()
+
+    def clear(self, namespace=None):
+        pass
+
+    def stats(self):
+        return None
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """
+    プロセス内で共有するレスポンスキャッシュを取得
+    Returns:
+        ResponseCache（CACHE_CONFIG.enabled が False の場合は何もしないキャッシュ）
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            if CACHE_CONFIG.enabled:
+                try:
+                    _cache = ResponseCache(CACHE_CONFIG.path, CACHE_CONFIG.max_size_mb * 1024 * 1024)
+                except sqlite3.Error as e:
+                    print(f"[WARN] レスポンスキャッシュを開けません（キャッシュなしで続行）: {e}")
+                    _cache = _NullCache()
+            else:
+                _cache = _NullCache()
+        return _cache
+
+
+def cached_http_get(namespace: str, url: str, params: Optional[Dict[str, Any]] = None,
+                    ttl: Optional[float] = None, timeout: float = 30,
+                    key_params: Optional[Dict[str, Any]] = None) -> bytes:
+    """
+    HTTP GETの本文をキャッシュ付きで取得（200応答のみ保存）
+
+    Args:
+        namespace: 名前空間
+        url: URL
+        params: クエリパラメータ
+        ttl: 有効期間（秒）。Noneの場合は期限なし
+        timeout: タイムアウト（秒）
+        key_params: キーに使うパラメータ（APIキー等を含めない場合に指定。Noneの場合はparams）
+
+    Returns:
+        レスポンス本文
+
+    Raises:
+        requests.RequestException: 取得に失敗した場合（HTTPエラーを含む）
+    """
+    key_source = params if key_params is None else key_params
+    key = url if not key_source else f"{url}?{sorted(key_source.items())}"
+    cache = get_response_cache()
+
+    cached = cache.get(namespace, key)
+    if cached is not None:
+        return cached
+
+    response = requests.get(url, params=params, timeout=timeout)
+    response.raise_for_status()
+    cache.set(namespace, key, response.content, ttl)
+    return response.content
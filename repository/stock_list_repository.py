@@ -3,9 +3,10 @@
 """
 
 import pandas as pd
-import requests
 import io
 from typing import Dict, Optional
+from config import CACHE_CONFIG
+from repository.response_cache import cached_http_get
 
 
 class StockListRepository:
@@ -31,9 +32,8 @@ class StockListRepository:
 
             for url, engine in urls:
                 try:
-                    response = requests.get(url, timeout=30)
-                    response.raise_for_status()
-                    df = pd.read_excel(io.BytesIO(response.content), engine=engine)
+                    content = cached_http_get('jpx.listing', url, ttl=CACHE_CONFIG.jpx_listing_ttl)
+                    df = pd.read_excel(io.BytesIO(content), engine=engine)
                     break
                 except Exception as e:
                     last_error = e
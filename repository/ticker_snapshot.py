@@ -0,0 +1,256 @@
+"""
+1銘柄分のyfinanceデータのスナップショット
+info・配当・株価・財務諸表を必要になった時点で1回だけ取得し、以降は再利用する
+"""
+
+import threading
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from config import CACHE_CONFIG
+from repository.rate_limiter import get_rate_limiter
+from repository.response_cache import get_response_cache
+
+
+class TickerSnapshot:
+    """
+    yf.Ticker と同じ属性名（info, dividends, history(), financials, balance_sheet, cashflow）を持つ
+    遅延取得・キャッシュ付きのデータオブジェクト
+
+    yf.Ticker を受け取る既存の計算関数にそのまま渡せる。
+    history() は最も長い期間の取得結果を保持し、短い期間の要求はそこから切り出す。
+    """
+
+    # 遅延取得する属性（yf.Ticker の属性名）
+    FIELDS = ('info', 'dividends', 'financials', 'balance_sheet', 'cashflow')
+
+    # 属性ごとのレスポンスキャッシュの有効期間（CacheConfigの項目名）
+    CACHE_TTL_FIELDS = {
+        'info': 'yfinance_info_ttl',
+        'dividends': 'yfinance_history_ttl',
+        'financials': 'yfinance_financials_ttl',
+        'balance_sheet': 'yfinance_financials_ttl',
+        'cashflow': 'yfinance_financials_ttl',
+    }
+
+    def __init__(self, ticker: str, offline: bool = False, use_cache: bool = True):
+        """
+        初期化
+        Args:
+            ticker: 銘柄コード
+            offline: Trueの場合はネットワークに接続せず、与えられたデータのみを返す
+            use_cache: Trueの場合はディスクのレスポンスキャッシュを使う（実行をまたいで再利用）
+        """
+        self.ticker = ticker
+        self.offline = offline
+        self.use_cache = use_cache
+        self.fetch_count = 0  # yfinanceへの実際の取得回数
+
+        self._ticker_obj = None
+        self._values: Dict[str, Any] = {}
+        self._history: Optional[pd.DataFrame] = None
+        self._history_start: Optional[pd.Timestamp] = None  # Noneは全期間（max）
+        self._lock = threading.RLock()
+
+    @classmethod
+    def from_data(cls, ticker: str, info: Optional[Dict[str, Any]] = None,
+                  dividends: Optional[pd.Series] = None, history: Optional[pd.DataFrame] = None,
+                  financials: Optional[pd.DataFrame] = None, balance_sheet: Optional[pd.DataFrame] = None,
+                  cashflow: Optional[pd.DataFrame] = None, offline: bool = True,
+                  history_period: Optional[str] = None) -> 'TickerSnapshot':
+        """
+        取得済みのデータからスナップショットを作成（DBのデータやテスト用）
+
+        Args:
+            ticker: 銘柄コード
+            info〜cashflow: 取得済みのデータ（Noneの項目はoffline=Falseなら遅延取得）
+            offline: Trueの場合、未指定の項目は空データとして扱う
+            history_period: historyの取得期間（例: '5y'。Noneの場合は全期間として扱う）
+
+        Returns:
+            TickerSnapshot
+        """
+        snapshot = cls(ticker, offline=offline)
+        for name, value in (('info', info), ('dividends', dividends), ('financials', financials),
+                            ('balance_sheet', balance_sheet), ('cashflow', cashflow)):
+            if value is not None:
+                snapshot._values[name] = value
+        if history is not None:
+            snapshot._history = history
+            snapshot._history_start = cls._period_start(history_period) if history_period else None
+        return snapshot
+
+    def _yf_ticker(self):
+        if self._ticker_obj is None:
+            self._ticker_obj = yf.Ticker(self.ticker)
+        return self._ticker_obj
+
+    def _get(self, name: str):
+        """属性を取得（未取得ならyfinanceから1回だけ取得）"""
+        if name in self._values:
+            return self._values[name]
+        with self._lock:
+            if name not in self._values:
+                if self.offline:
+                    value = {} if name == 'info' else (pd.Series(dtype='float64') if name == 'dividends' else pd.DataFrame())
+                else:
+                    value = self._cached_fetch(
+                        f"yfinance.{name}", self.ticker,
+                        lambda: getattr(self._yf_ticker(), name),
+                        getattr(CACHE_CONFIG, self.CACHE_TTL_FIELDS[name])
+                    )
+                    if name == 'info' and value is None:
+                        value = {}
+                self._values[name] = value
+            return self._values[name]
+
+    def _fetch(self, fetch):
+        """yfinanceから取得（共有レートリミッター経由、レート制限時は待機して再試行）"""
+        self.fetch_count += 1
+        return get_rate_limiter().call(fetch)
+
+    def _cached_fetch(self, namespace: str, key: str, fetch, ttl):
+        """yfinanceから取得（レスポンスキャッシュ有効時はキャッシュ経由、空データは保存しない）"""
+        if not self.use_cache:
+            return self._fetch(fetch)
+        return get_response_cache().get_or_fetch(
+            namespace, key, lambda: self._fetch(fetch), ttl,
+            should_cache=lambda value: value is not None and len(value) > 0
+        )
+
+    @property
+    def info(self) -> Dict[str, Any]:
+        return self._get('info')
+
+    @property
+    def dividends(self) -> pd.Series:
+        return self._get('dividends')
+
+    @property
+    def financials(self) -> pd.DataFrame:
+        return self._get('financials')
+
+    @property
+    def balance_sheet(self) -> pd.DataFrame:
+        return self._get('balance_sheet')
+
+    @property
+    def cashflow(self) -> pd.DataFrame:
+        return self._get('cashflow')
+
+    # yfinance の別名
+    cash_flow = cashflow
+
+    @staticmethod
+    def _period_start(period: str) -> Optional[pd.Timestamp]:
+        """
+        yfinanceのperiod文字列を開始日に変換
+        Returns:
+            開始日（'max'の場合はNone）
+        Raises:
+            ValueError: 解釈できないperiodの場合
+        """
+        today = pd.Timestamp.now().normalize()
+        if period == 'max':
+            return None
+        if period == 'ytd':
+            return pd.Timestamp(today.year, 1, 1)
+        if period.endswith('mo'):
+            return today - pd.DateOffset(months=int(period[:-2]))
+        if period.endswith('y'):
+            return today - pd.DateOffset(years=int(period[:-1]))
+        if period.endswith('d'):
+            return today - pd.DateOffset(days=int(period[:-1]))
+        raise ValueError(f"未対応のperiod: {period}")
+
+    @staticmethod
+    def _naive(value) -> pd.Timestamp:
+        """日付をタイムゾーンなしのTimestampに変換"""
+        timestamp = pd.Timestamp(value)
+        return timestamp.tz_localize(None) if timestamp.tzinfo is not None else timestamp
+
+    @staticmethod
+    def _slice(hist: pd.DataFrame, start: Optional[pd.Timestamp], end: Optional[pd.Timestamp]) -> pd.DataFrame:
+        """保持している株価履歴から期間を切り出す（endは含まない）"""
+        if hist is None or len(hist) == 0:
+            return hist
+        tz = getattr(hist.index, 'tz', None)
+        mask = np.ones(len(hist), dtype=bool)
+        if start is not None:
+            start = start.tz_localize(tz) if tz is not None and start.tzinfo is None else start
+            mask &= hist.index >= start
+        if end is not None:
+            end = end.tz_localize(tz) if tz is not None and end.tzinfo is None else end
+            mask &= hist.index < end
+        return hist[mask]
+
+    def history(self, period: Optional[str] = None, start=None, end=None, **kwargs) -> pd.DataFrame:
+        """
+        株価履歴を取得（yf.Ticker.history と同じ引数）
+        保持している履歴で賄える場合は再取得せずに切り出す
+
+        Args:
+            period: 期間（例: '5y'）
+            start: 開始日
+            end: 終了日
+            **kwargs: その他のyfinance引数（指定時はキャッシュを使わない）
+
+        Returns:
+            株価DataFrame
+        """
+        if kwargs and not self.offline:
+            return self._fetch(lambda: self._yf_ticker().history(period=period, start=start, end=end, **kwargs))
+
+        try:
+            if start is not None:
+                request_start = self._naive(start)
+            else:
+                request_start = self._period_start(period or '1mo')
+        except ValueError:
+            if self.offline:
+                return self._history
+            return self._fetch(lambda: self._yf_ticker().history(period=period, start=start, end=end))
+        request_end = self._naive(end) if end is not None else None
+
+        with self._lock:
+            covered = self._history is not None and (
+                self.offline
+                or self._history_start is None
+                or (request_start is not None and request_start >= self._history_start)
+            )
+            if not covered:
+                if self.offline:
+                    return pd.DataFrame()
+                if start is not None:
+                    # 開始日指定（差分更新など）は常に最新を取得
+                    hist = self._fetch(lambda: self._yf_ticker().history(start=start))
+                else:
+                    period = period or '1mo'
+                    hist = self._cached_fetch(
+                        'yfinance.history', f"{self.ticker}:{period}",
+                        lambda: self._yf_ticker().history(period=period),
+                        CACHE_CONFIG.yfinance_history_ttl
+                    )
+                self._history = hist
+                self._history_start = request_start
+                if end is None:
+                    return hist
+            return self._slice(self._history, request_start, request_end)
+
+    def prefetch(self, *names: str, period: Optional[str] = None) -> 'TickerSnapshot':
+        """
+        指定した属性をまとめて取得（ワーカースレッドで先読みする場合など）
+        Args:
+            *names: FIELDS のいずれか
+            period: 指定時は株価履歴も取得
+        Returns:
+            self
+        """
+        for name in names:
+            self._get(name)
+        if period is not None:
+            self.history(period=period)
+        return self
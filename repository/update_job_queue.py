@@ -0,0 +1,296 @@
+"""
+更新ジョブキュー
+画面から登録された更新ジョブを update_jobs テーブルで管理し、別プロセスのワーカーが取り出して実行する
+"""
+
+import json
+import os
+import socket
+import uuid
+from typing import Any, Dict, List, Optional
+
+
+class UpdateJobQueue:
+    """MySQLの update_jobs テーブルを使ったジョブキュー"""
+
+    # 画面から登録できるジョブ種別
+    JOB_TYPES = {
+        'full': '全銘柄更新',
+        'incremental': '差分更新',
+        'resume': '未完了分を再開',
+        'retry_failed': '失敗分のみ再試行',
+    }
+
+    # 完了済みのステータス
+    FINISHED_STATUSES = ('success', 'partial', 'failed', 'cancelled')
+
+    def __init__(self, db):
+        """
+        初期化
+        Args:
+            db: DatabaseManager（database.db_config / repository.database_manager のどちらでも可）
+        """
+        self.db = db
+
+    @staticmethod
+    def worker_name() -> str:
+        """このプロセスのワーカー名（ホスト名:PID:トークン）を作成"""
+        return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def enqueue(self, job_type: str, params: Optional[Dict[str, Any]] = None) -> Optional[int]:
+        """
+        ジョブを登録
+        Args:
+            job_type: JOB_TYPES のいずれか
+            params: ジョブ引数（max_workers, incremental など）
+        Returns:
+            ジョブID（失敗時はNone）
+        Raises:
+            ValueError: 未対応のジョブ種別の場合
+        """
+        if job_type not in self.JOB_TYPES:
+            raise ValueError(f"未対応のジョブ種別: {job_type}")
+        return self.db.execute_insert("""
+            INSERT INTO update_jobs (job_type, params, status)
+            VALUES (%s, %s, 'queued')
+        """, (job_type, json.dumps(params or {}, ensure_ascii=False)))
+
+    def claim(self, worker: str, stale_seconds: int = 600) -> Optional[Dict[str, Any]]:
+        """
+        最も古い待機中ジョブを1件取り出して実行中にする
+        （UPDATE 1文で確保するため、複数ワーカーが同時に呼んでも同じジョブを取らない）
+        銘柄の登録前にワーカーが停止したジョブ（update_id未設定でハートビートが途絶えたもの）も取り直す
+
+        Args:
+            worker: worker_name() で作成したワーカー名
+            stale_seconds: ハートビートが途絶えたとみなす秒数
+        Returns:
+            ジョブ辞書（paramsは辞書に変換済み）。待機中のジョブがなければNone
+        """
+        claimed = self.db.execute_query("""
+            UPDATE update_jobs
+            SET status = 'running', worker = %s, started_at = NOW(), heartbeat_at = NOW()
+            WHERE cancel_requested = FALSE
+              AND (status = 'queued'
+                   OR (status = 'running' AND update_id IS NULL
+                       AND heartbeat_at < DATE_SUB(NOW(), INTERVAL %s SECOND)))
+            ORDER BY id
+            LIMIT 1
+        """, (worker, stale_seconds), fetch=False)
+        if not claimed:
+            return None
+
+        rows = self.db.execute_query("""
+            SELECT * FROM update_jobs
+            WHERE worker = %s AND status = 'running'
+            ORDER BY id DESC
+            LIMIT 1
+        """, (worker,))
+        if not rows:
+            return None
+        return self._decode(rows[0])
+
+    def find_joinable(self) -> Optional[Dict[str, Any]]:
+        """
+        他のワーカーが開始した実行中ジョブのうち、リースできる銘柄が残っているものを取得
+        Returns:
+            ジョブ辞書（なければNone）
+        """
+        rows = self.db.execute_query("""
+            SELECT j.* FROM update_jobs j
+            WHERE j.status = 'running' AND j.update_id IS NOT NULL AND j.cancel_requested = FALSE
+              AND EXISTS (
+                  SELECT 1 FROM update_progress p
+                  WHERE p.update_id = j.update_id AND p.status = 'pending'
+                    AND (p.lease_owner IS NULL OR p.lease_expires_at < NOW())
+              )
+            ORDER BY j.id
+            LIMIT 1
+        """)
+        return self._decode(rows[0]) if rows else None
+
+    def set_update_id(self, job_id: int, update_id: int, total: int):
+        """
+        ジョブに更新履歴IDを設定（以降は他のワーカーも参加できる）
+        Args:
+            job_id: ジョブID
+            update_id: 更新履歴ID
+            total: 対象銘柄数
+        """
+        self.db.execute_query("""
+            UPDATE update_jobs SET update_id = %s, total = %s, heartbeat_at = NOW() WHERE id = %s
+        """, (update_id, total, job_id), fetch=False)
+
+    @staticmethod
+    def _decode(job: Dict[str, Any]) -> Dict[str, Any]:
+        """params列をJSONから辞書に変換"""
+        try:
+            job['params'] = json.loads(job.get('params') or '{}')
+        except ValueError:
+            job['params'] = {}
+        return job
+
+    def sync_progress(self, job_id: int, update_id: int):
+        """
+        進捗を update_progress から集計して記録（heartbeat_at も更新）
+        複数のワーカーが分担していても、ジョブ全体の件数になる
+
+        Args:
+            job_id: ジョブID
+            update_id: 更新履歴ID
+        """
+        self.db.execute_query("""
+            UPDATE update_jobs j
+            INNER JOIN (
+                SELECT update_id, COUNT(*) AS total,
+                       SUM(status = 'success') AS success_count,
+                       SUM(status = 'failed') AS error_count
+                FROM update_progress
+                WHERE update_id = %s
+                GROUP BY update_id
+            ) p ON p.update_id = j.update_id
+            SET j.total = p.total,
+                j.processed = p.success_count + p.error_count,
+                j.success_count = p.success_count,
+                j.error_count = p.error_count,
+                j.heartbeat_at = NOW()
+            WHERE j.id = %s
+        """, (update_id, job_id), fetch=False)
+
+    def finish(self, job_id: int, status: str, message: Optional[str] = None) -> bool:
+        """
+        ジョブを完了として記録（実行中のジョブのみ。複数ワーカーのうち1つだけが成功する）
+        Args:
+            job_id: ジョブID
+            status: FINISHED_STATUSES のいずれか
+            message: 結果・エラーメッセージ
+        Returns:
+            このワーカーが完了を記録した場合True
+        """
+        updated = self.db.execute_query("""
+            UPDATE update_jobs
+            SET status = %s, message = %s, completed_at = NOW(), heartbeat_at = NOW()
+            WHERE id = %s AND status IN ('queued', 'running')
+        """, (status, message, job_id), fetch=False)
+        return bool(updated)
+
+    def request_cancel(self, job_id: int):
+        """
+        ジョブの中止を要求（待機中なら即中止、実行中ならワーカーが次の銘柄の完了時に停止）
+        Args:
+            job_id: ジョブID
+        """
+        self.db.execute_query("""
+            UPDATE update_jobs
+            SET status = IF(status = 'queued', 'cancelled', status),
+                completed_at = IF(status = 'cancelled', NOW(), completed_at),
+                cancel_requested = TRUE
+            WHERE id = %s AND status IN ('queued', 'running')
+        """, (job_id,), fetch=False)
+
+    def is_cancel_requested(self, job_id: int) -> bool:
+        """
+        中止が要求されているか
+        Args:
+            job_id: ジョブID
+        Returns:
+            中止要求がある場合True
+        """
+        rows = self.db.execute_query(
+            "SELECT cancel_requested FROM update_jobs WHERE id = %s", (job_id,)
+        )
+        return bool(rows and rows[0]['cancel_requested'])
+
+    def get_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        """
+        ジョブを取得
+        Args:
+            job_id: ジョブID
+        Returns:
+            ジョブ辞書（なければNone）
+        """
+        rows = self.db.execute_query("SELECT * FROM update_jobs WHERE id = %s", (job_id,))
+        return self._decode(rows[0]) if rows else None
+
+    def list_jobs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        最近のジョブを新しい順に取得
+        Args:
+            limit: 取得件数
+        Returns:
+            ジョブ辞書のリスト
+        """
+        rows = self.db.execute_query(
+            "SELECT * FROM update_jobs ORDER BY id DESC LIMIT %s", (limit,)
+        )
+        return [self._decode(row) for row in rows or []]
+
+    def has_active_jobs(self) -> bool:
+        """待機中・実行中のジョブがあるか"""
+        rows = self.db.execute_query(
+            "SELECT COUNT(*) AS count FROM update_jobs WHERE status IN ('queued', 'running')"
+        )
+        return bool(rows and rows[0]['count'])
+
+    def heartbeat_worker(self, worker: str, egress: str, job_id: Optional[int] = None,
+                         processed: int = 0, stale_seconds: int = 60) -> int:
+        """
+        ワーカーの生存を記録し、同じ送信元で稼働中のワーカー数を取得
+        Args:
+            worker: ワーカー名
+            egress: 送信元の識別名
+            job_id: 処理中のジョブID
+            processed: 起動後に処理した銘柄数
+            stale_seconds: この秒数ハートビートがないワーカーは停止したとみなす
+        Returns:
+            同じ送信元で稼働中のワーカー数（自分を含む、最低1）
+        """
+        host, pid = worker.split(':')[:2]
+        self.db.execute_query("""
+            INSERT INTO update_workers (worker, host, pid, egress, job_id, processed, heartbeat_at)
+            VALUES (%s, %s, %s, %s, %s, %s, NOW())
+            ON DUPLICATE KEY UPDATE
+                job_id = VALUES(job_id),
+                processed = VALUES(processed),
+                heartbeat_at = NOW()
+        """, (worker, host, int(pid), egress, job_id, processed), fetch=False)
+
+        rows = self.db.execute_query("""
+            SELECT COUNT(*) AS count FROM update_workers
+            WHERE egress = %s AND heartbeat_at >= DATE_SUB(NOW(), INTERVAL %s SECOND)
+        """, (egress, stale_seconds))
+        return max(1, int(rows[0]['count'])) if rows else 1
+
+    def set_worker_rate(self, worker: str, rate_share: float):
+        """
+        ワーカーに割り当てた最大レートを記録（画面表示用）
+        Args:
+            worker: ワーカー名
+            rate_share: 最大レート（回/秒）
+        """
+        self.db.execute_query(
+            "UPDATE update_workers SET rate_share = %s WHERE worker = %s", (rate_share, worker), fetch=False
+        )
+
+    def unregister_worker(self, worker: str):
+        """
+        ワーカーの登録を削除
+        Args:
+            worker: ワーカー名
+        """
+        self.db.execute_query("DELETE FROM update_workers WHERE worker = %s", (worker,), fetch=False)
+
+    def list_workers(self, stale_seconds: int = 60) -> List[Dict[str, Any]]:
+        """
+        稼働中のワーカーを取得
+        Args:
+            stale_seconds: この秒数ハートビートがないワーカーは除外
+        Returns:
+            ワーカー辞書のリスト
+        """
+        rows = self.db.execute_query("""
+            SELECT * FROM update_workers
+            WHERE heartbeat_at >= DATE_SUB(NOW(), INTERVAL %s SECOND)
+            ORDER BY egress, started_at
+        """, (stale_seconds,))
+        return rows or []
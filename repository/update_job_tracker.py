@@ -0,0 +1,288 @@
+"""
+更新ジョブの進捗管理
+update_history に1ジョブ1行、update_progress に銘柄ごとの進捗を記録し、
+中断・失敗したジョブを未完了の銘柄だけで再開できるようにする
+"""
+
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+
+class UpdateJobTracker:
+    """
+    銘柄単位の更新ジョブを記録・再開するクラス
+
+    database.db_config.DatabaseManager と repository.database_manager.DatabaseManager の
+    どちらでも使える（execute_query / execute_many / execute_insert のみを使用）
+    """
+
+    # 進捗行を一括登録する際の1回あたりの行数
+    INSERT_CHUNK_SIZE = 1000
+
+    def __init__(self, db, update_type: str):
+        """
+        初期化
+        Args:
+            db: DatabaseManager
+            update_type: update_history.update_type（例: 'full', 'dividend_aristocrats_cache'）
+        """
+        self.db = db
+        self.update_type = update_type
+        self.update_id: Optional[int] = None
+
+    def start(self, stock_list: Dict[str, str]) -> Optional[int]:
+        """
+        新しいジョブを開始し、全銘柄を pending として登録
+        Args:
+            stock_list: {ticker: name} の辞書
+        Returns:
+            更新履歴ID（記録に失敗した場合はNone。その場合も更新処理は続行できる）
+        """
+        update_id = self.db.execute_insert("""
+            INSERT INTO update_history (update_type, status, records_updated, started_at)
+            VALUES (%s, 'running', 0, %s)
+        """, (self.update_type, datetime.now()))
+        if not update_id:
+            return None
+
+        rows = [(update_id, ticker, name) for ticker, name in stock_list.items()]
+        for i in range(0, len(rows), self.INSERT_CHUNK_SIZE):
+            self.db.execute_many("""
+                INSERT IGNORE INTO update_progress (update_id, ticker, name)
+                VALUES (%s, %s, %s)
+            """, rows[i:i + self.INSERT_CHUNK_SIZE])
+
+        self.update_id = update_id
+        return update_id
+
+    def find_resumable(self, failed_only: bool = False) -> Optional[Dict]:
+        """
+        再開できる最新のジョブを検索
+        Args:
+            failed_only: Trueの場合は失敗した銘柄があるジョブのみ
+        Returns:
+            {'id', 'started_at', 'pending', 'failed', 'success'}（なければNone）
+        """
+        statuses = "('failed')" if failed_only else "('pending', 'failed')"
+        result = self.db.execute_query(f"""
+            SELECT h.id, h.started_at,
+                   SUM(p.status = 'pending') AS pending,
+                   SUM(p.status = 'failed') AS failed,
+                   SUM(p.status = 'success') AS success
+            FROM update_history h
+            INNER JOIN update_progress p ON p.update_id = h.id
+            WHERE h.update_type = %s
+              AND h.id = (
+                  SELECT MAX(h2.id) FROM update_history h2
+                  INNER JOIN update_progress p2 ON p2.update_id = h2.id
+                  WHERE h2.update_type = %s
+              )
+            GROUP BY h.id, h.started_at
+            HAVING SUM(p.status IN {statuses}) > 0
+        """, (self.update_type, self.update_type))
+        if not result:
+            return None
+
+        job = result[0]
+        return {
+            'id': job['id'],
+            'started_at': job['started_at'],
+            'pending': int(job['pending'] or 0),
+            'failed': int(job['failed'] or 0),
+            'success': int(job['success'] or 0),
+        }
+
+    def resume(self, update_id: Optional[int] = None, failed_only: bool = False) -> Optional[Tuple[int, Dict[str, str]]]:
+        """
+        中断・失敗したジョブを再開
+        Args:
+            update_id: 再開する更新履歴ID（Noneの場合は最新の再開可能なジョブ）
+            failed_only: Trueの場合は失敗した銘柄のみ、Falseの場合は未処理と失敗の銘柄
+        Returns:
+            (更新履歴ID, {ticker: name})（再開するジョブがない場合はNone）
+        """
+        if update_id is None:
+            job = self.find_resumable(failed_only=failed_only)
+            if job is None:
+                return None
+            update_id = job['id']
+
+        statuses = ('failed',) if failed_only else ('pending', 'failed')
+        placeholders = ', '.join(['%s'] * len(statuses))
+        rows = self.db.execute_query(f"""
+            SELECT ticker, name FROM update_progress
+            WHERE update_id = %s AND status IN ({placeholders})
+            ORDER BY ticker
+        """, (update_id, *statuses))
+        if not rows:
+            return None
+
+        # 対象の銘柄を未処理に戻す（複数ワーカーがリースで分担できるようにする）
+        self.db.execute_query(f"""
+            UPDATE update_progress
+            SET status = 'pending', lease_owner = NULL, lease_expires_at = NULL
+            WHERE update_id = %s AND status IN ({placeholders})
+        """, (update_id, *statuses), fetch=False)
+        self.db.execute_query("""
+            UPDATE update_history SET status = 'running', completed_at = NULL WHERE id = %s
+        """, (update_id,), fetch=False)
+
+        self.update_id = update_id
+        return update_id, {row['ticker']: row['name'] for row in rows}
+
+    def claim_shard(self, owner: str, size: int, lease_seconds: int) -> Dict[str, str]:
+        """
+        未処理の銘柄をまとめてリース（期限切れのリースは他のワーカーの分も取り直す）
+        UPDATE 1文で確保するため、複数のワーカー・ホストが同時に呼んでも重複しない
+
+        Args:
+            owner: ワーカー名
+            size: 1回にリースする銘柄数
+            lease_seconds: リースの有効秒数（ハートビートで延長する）
+        Returns:
+            {ticker: name}（リースできる銘柄がなければ空）
+        """
+        if self.update_id is None:
+            return {}
+        self.db.execute_query("""
+            UPDATE update_progress
+            SET lease_owner = %s, lease_expires_at = DATE_ADD(NOW(), INTERVAL %s SECOND)
+            WHERE update_id = %s AND status = 'pending'
+              AND (lease_owner IS NULL OR lease_expires_at < NOW())
+            ORDER BY ticker
+            LIMIT %s
+        """, (owner, lease_seconds, self.update_id, size), fetch=False)
+
+        rows = self.db.execute_query("""
+            SELECT ticker, name FROM update_progress
+            WHERE update_id = %s AND status = 'pending' AND lease_owner = %s
+            ORDER BY ticker
+        """, (self.update_id, owner))
+        return {row['ticker']: row['name'] for row in rows or []}
+
+    def renew_lease(self, owner: str, lease_seconds: int):
+        """
+        保持中のリースを延長（ハートビート）
+        Args:
+            owner: ワーカー名
+            lease_seconds: 延長後の有効秒数
+        """
+        if self.update_id is None:
+            return
+        self.db.execute_query("""
+            UPDATE update_progress
+            SET lease_expires_at = DATE_ADD(NOW(), INTERVAL %s SECOND)
+            WHERE update_id = %s AND status = 'pending' AND lease_owner = %s
+        """, (lease_seconds, self.update_id, owner), fetch=False)
+
+    def release_lease(self, owner: str):
+        """
+        保持中のリースを解放（中止時など。未処理の銘柄はすぐに他のワーカーが取れる）
+        Args:
+            owner: ワーカー名
+        """
+        if self.update_id is None:
+            return
+        self.db.execute_query("""
+            UPDATE update_progress
+            SET lease_owner = NULL, lease_expires_at = NULL
+            WHERE update_id = %s AND status = 'pending' AND lease_owner = %s
+        """, (self.update_id, owner), fetch=False)
+
+    def pending_count(self) -> Dict[str, int]:
+        """
+        未処理の銘柄数を取得
+        Returns:
+            {'claimable': リース可能な数, 'leased': 他のワーカーがリース中の数}
+        """
+        counts = {'claimable': 0, 'leased': 0}
+        if self.update_id is None:
+            return counts
+        rows = self.db.execute_query("""
+            SELECT SUM(lease_owner IS NULL OR lease_expires_at < NOW()) AS claimable,
+                   SUM(lease_owner IS NOT NULL AND lease_expires_at >= NOW()) AS leased
+            FROM update_progress
+            WHERE update_id = %s AND status = 'pending'
+        """, (self.update_id,))
+        if rows:
+            counts['claimable'] = int(rows[0]['claimable'] or 0)
+            counts['leased'] = int(rows[0]['leased'] or 0)
+        return counts
+
+    MARK_QUERY = """
+        UPDATE update_progress
+        SET status = %s, attempts = attempts + 1, error_message = %s,
+            lease_owner = NULL, lease_expires_at = NULL
+        WHERE update_id = %s AND ticker = %s
+    """
+
+    def mark(self, ticker: str, success: bool, error: Optional[str] = None):
+        """
+        銘柄の処理結果を記録
+        Args:
+            ticker: 銘柄コード
+            success: 成功したか
+            error: エラーメッセージ（失敗時）
+        """
+        if self.update_id is None:
+            return
+        self.db.execute_query(self.MARK_QUERY, self._mark_params(ticker, success, error), fetch=False)
+
+    def mark_many(self, results: List[Tuple[str, bool, Optional[str]]]):
+        """
+        複数銘柄の処理結果を1回で記録
+        Args:
+            results: [(ticker, 成功したか, エラーメッセージ)] のリスト
+        """
+        if self.update_id is None or not results:
+            return
+        self.db.execute_many(self.MARK_QUERY, [
+            self._mark_params(ticker, success, error) for ticker, success, error in results
+        ])
+
+    def _mark_params(self, ticker: str, success: bool, error: Optional[str]) -> tuple:
+        return ('success' if success else 'failed', None if success else (error or '')[:500],
+                self.update_id, ticker)
+
+    def summary(self) -> Dict[str, int]:
+        """
+        ジョブ全体の件数を取得
+        Returns:
+            {'pending': n, 'success': n, 'failed': n}
+        """
+        counts = {'pending': 0, 'success': 0, 'failed': 0}
+        if self.update_id is None:
+            return counts
+        rows = self.db.execute_query("""
+            SELECT status, COUNT(*) AS count FROM update_progress
+            WHERE update_id = %s GROUP BY status
+        """, (self.update_id,))
+        for row in rows or []:
+            counts[row['status']] = int(row['count'])
+        return counts
+
+    def finish(self) -> Dict[str, int]:
+        """
+        ジョブを完了として記録（再開分を含むジョブ全体の件数で集計）
+        Returns:
+            summary() と同じ件数辞書
+        """
+        counts = self.summary()
+        if self.update_id is None:
+            return counts
+
+        unfinished = counts['pending'] + counts['failed']
+        if unfinished == 0:
+            status = 'success'
+        elif counts['success'] > 0:
+            status = 'partial'
+        else:
+            status = 'failed'
+        error_message = f"{unfinished} 銘柄が未完了" if unfinished else None
+
+        self.db.execute_query("""
+            UPDATE update_history
+            SET status = %s, records_updated = %s, error_message = %s, completed_at = %s
+            WHERE id = %s
+        """, (status, counts['success'], error_message, datetime.now(), self.update_id), fetch=False)
+        return counts
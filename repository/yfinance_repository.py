@@ -2,14 +2,26 @@
 yfinanceからデータを取得するリポジトリ
 """
 
+import asyncio
+import json
 import yfinance as yf
+import numpy as np
 import pandas as pd
 from datetime import datetime
-from typing import Tuple, Optional, Dict, Any
+from typing import Tuple, Optional, Dict, Any, Sequence
+from urllib.parse import urlsplit
+from config import CACHE_CONFIG
+from repository.async_fetcher import AsyncFetcher, FetchError
+from repository.rate_limiter import get_rate_limiter
+from repository.response_cache import get_response_cache
+from repository.ticker_snapshot import TickerSnapshot
 
 
 class YFinanceRepository:
     """yfinanceを使用した株価データ取得"""
+
+    # yfinanceが株価・配当の取得に使うチャートAPI（非同期取得で直接呼ぶ）
+    CHART_URL = "https://query2.finance.yahoo.com/v8/finance/chart/{ticker}"
     
     @staticmethod
     def get_stock_data(ticker: str, start_date: datetime, end_date: datetime) -> Tuple:
@@ -25,8 +37,14 @@ class YFinanceRepository:
             (hist, info, financials, balance_sheet, cashflow, dividends)
         """
         try:
-            stock = yf.Ticker(ticker)
-            hist = stock.history(start=start_date, end=end_date)
+            # 各データはレスポンスキャッシュ経由で取得（実行をまたいで再利用）
+            stock = TickerSnapshot(ticker)
+            hist = get_response_cache().get_or_fetch(
+                'yfinance.history_range', f"{ticker}:{start_date:%Y-%m-%d}:{end_date:%Y-%m-%d}",
+                lambda: yf.Ticker(ticker).history(start=start_date, end=end_date),
+                CACHE_CONFIG.yfinance_history_ttl,
+                should_cache=lambda value: value is not None and len(value) > 0
+            )
 
             # 基本情報を取得
             info = stock.info
@@ -55,6 +73,20 @@ class YFinanceRepository:
         """
         return yf.Ticker(ticker)
     
+    @staticmethod
+    def get_ticker_snapshot(ticker: str) -> TickerSnapshot:
+        """
+        遅延取得・キャッシュ付きのTickerSnapshotを取得
+        （1銘柄の分析中に複数の計算で同じデータを共有する場合に使用）
+        
+        Args:
+            ticker: 銘柄コード
+            
+        Returns:
+            TickerSnapshot
+        """
+        return TickerSnapshot(ticker)
+    
     @staticmethod
     def get_stock_info(ticker: str) -> Optional[Dict[str, Any]]:
         """
@@ -67,8 +99,7 @@ class YFinanceRepository:
             info 辞書
         """
         try:
-            stock = yf.Ticker(ticker)
-            return stock.info
+            return TickerSnapshot(ticker).info
         except Exception:
             return None
     
@@ -85,8 +116,7 @@ class YFinanceRepository:
             株価DataFrame
         """
         try:
-            stock = yf.Ticker(ticker)
-            return stock.history(period=period)
+            return TickerSnapshot(ticker).history(period=period)
         except Exception:
             return None
     
@@ -102,7 +132,128 @@ class YFinanceRepository:
             配当Series
         """
         try:
-            stock = yf.Ticker(ticker)
-            return stock.dividends
+            return TickerSnapshot(ticker).dividends
         except Exception:
             return None
+
+    @staticmethod
+    def parse_chart(content: bytes) -> Tuple[pd.DataFrame, pd.Series]:
+        """
+        チャートAPIの応答を yf.Ticker の history()（配当・分割調整済み）と dividends と同じ形式に変換
+
+        Args:
+            content: チャートAPIのレスポンス本文
+
+        Returns:
+            (株価DataFrame, 配当Series)
+
+        Raises:
+            ValueError: 応答を解釈できない場合
+        """
+        result = (json.loads(content).get('chart') or {}).get('result') or []
+        if not result:
+            raise ValueError("チャートAPIの応答にデータがありません")
+        result = result[0]
+        tz = (result.get('meta') or {}).get('exchangeTimezoneName') or 'UTC'
+        events = result.get('events') or {}
+
+        def to_dates(seconds):
+            return pd.to_datetime(seconds, unit='s', utc=True).tz_convert(tz).normalize()
+
+        dividend_events = sorted((events.get('dividends') or {}).values(), key=lambda event: event['date'])
+        dividends = pd.Series(
+            [event['amount'] for event in dividend_events],
+            index=to_dates([event['date'] for event in dividend_events]),
+            name='Dividends', dtype='float64'
+        )
+
+        timestamps = result.get('timestamp') or []
+        index = to_dates(timestamps)
+        index.name = 'Date'
+        indicators = result.get('indicators') or {}
+        quote = (indicators.get('quote') or [{}])[0]
+        empty = [np.nan] * len(index)
+        hist = pd.DataFrame({
+            column.capitalize(): pd.to_numeric(pd.Series(quote.get(column) or empty), errors='coerce').to_numpy()
+            for column in ('open', 'high', 'low', 'close', 'volume')
+        }, index=index)
+
+        # yfinanceの既定（auto_adjust=True）と同じく、調整後終値の比率で始値・高値・安値も調整する
+        adjclose = (indicators.get('adjclose') or [{}])[0].get('adjclose')
+        if adjclose:
+            adjusted = pd.to_numeric(pd.Series(adjclose), errors='coerce').to_numpy()
+            ratio = adjusted / hist['Close'].to_numpy()
+            for column in ('Open', 'High', 'Low'):
+                hist[column] = hist[column] * ratio
+            hist['Close'] = adjusted
+        hist = hist.dropna(subset=['Open', 'High', 'Low', 'Close'], how='all')
+
+        splits = sorted((events.get('splits') or {}).values(), key=lambda event: event['date'])
+        split_ratio = pd.Series(
+            [event['numerator'] / event['denominator'] for event in splits],
+            index=to_dates([event['date'] for event in splits]), dtype='float64'
+        )
+        hist['Dividends'] = dividends.groupby(level=0).sum().reindex(hist.index, fill_value=0.0)
+        hist['Stock Splits'] = split_ratio.groupby(level=0).prod().reindex(hist.index, fill_value=0.0)
+        return hist, dividends
+
+    @classmethod
+    async def fetch_chart_async(cls, fetcher: AsyncFetcher, ticker: str, period: str = '5y',
+                                interval: str = '1d') -> Tuple[pd.DataFrame, pd.Series]:
+        """
+        チャートAPIから株価履歴と配当を取得（asyncio版。共有レートリミッター・レスポンスキャッシュ経由）
+
+        Args:
+            fetcher: 開いているAsyncFetcher
+            ticker: 銘柄コード
+            period: 期間（例: '5y', 'max'）
+            interval: 足の間隔（例: '1d', '3mo'）
+
+        Returns:
+            (株価DataFrame, 配当Series)
+
+        Raises:
+            FetchError: 取得に失敗した場合
+            ValueError: 応答を解釈できない場合
+        """
+        content = await fetcher.get_cached(
+            'yfinance.chart', f"{ticker}:{period}:{interval}", cls.CHART_URL.format(ticker=ticker),
+            params={'range': period, 'interval': interval, 'events': 'div,splits', 'includeAdjustedClose': 'true'},
+            ttl=CACHE_CONFIG.yfinance_history_ttl, limiter=get_rate_limiter(),
+            should_cache=lambda body: b'"timestamp"' in body
+        )
+        # JSONの変換はCPU処理のためエグゼキューターで行う
+        return await fetcher.run_cpu(cls.parse_chart, content)
+
+    @classmethod
+    async def get_snapshot_async(cls, fetcher: AsyncFetcher, ticker: str, period: str = '5y',
+                                 fields: Sequence[str] = ()) -> TickerSnapshot:
+        """
+        株価履歴・配当を取得済みのTickerSnapshotを作成（asyncio版）
+
+        Args:
+            fetcher: 開いているAsyncFetcher
+            ticker: 銘柄コード
+            period: 株価履歴の期間
+            fields: 先読みする属性（TickerSnapshot.FIELDS のいずれか。yfinanceの関数をスレッドで実行）
+
+        Returns:
+            TickerSnapshot（取得に失敗したデータはアクセス時に通常どおり取得する）
+        """
+        try:
+            # 配当は全期間が必要なため、四半期足の全期間チャートから取る（応答が小さい）
+            (hist, _), (_, dividends) = await asyncio.gather(
+                cls.fetch_chart_async(fetcher, ticker, period),
+                cls.fetch_chart_async(fetcher, ticker, 'max', '3mo')
+            )
+            snapshot = TickerSnapshot.from_data(ticker, history=hist, dividends=dividends,
+                                                offline=False, history_period=period)
+        except (FetchError, ValueError):
+            snapshot = TickerSnapshot(ticker)
+
+        if fields:
+            try:
+                await fetcher.run_blocking(urlsplit(cls.CHART_URL).hostname, snapshot.prefetch, *fields)
+            except Exception:
+                pass
+        return snapshot
@@ -0,0 +1,47 @@
+"""
+EDINET書類一覧インデックスのマイグレーションスクリプト
+edinet_documents・edinet_index_dates テーブルを作成する（書類一覧は scripts/update_edinet_index.py で取り込む）
+"""
+
+import sys
+import io
+from pathlib import Path
+
+# Windows環境での文字エンコーディング問題を回避
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from database.db_config import DatabaseManager
+from scripts.migrate_screening_snapshot import load_schema_statements
+
+
+def migrate_edinet_index():
+    """edinet_documents・edinet_index_dates テーブルを作成"""
+
+    db = DatabaseManager()
+
+    print("=" * 60)
+    print("EDINET書類一覧インデックス マイグレーション")
+    print("=" * 60)
+
+    statements = load_schema_statements(
+        'CREATE TABLE IF NOT EXISTS edinet_documents',
+        'CREATE TABLE IF NOT EXISTS edinet_index_dates'
+    )
+    for sql in statements:
+        print(f"実行中: {sql.splitlines()[0]}")
+        if db.execute_query(sql, fetch=False) is None:
+            print("[ERROR] マイグレーション失敗")
+            return
+
+    print("\n書類一覧の取り込み: python scripts/update_edinet_index.py --days 365")
+    print("\n[OK] マイグレーション完了")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    migrate_edinet_index()
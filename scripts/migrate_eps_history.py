@@ -0,0 +1,44 @@
+"""
+EPS履歴テーブルのマイグレーションスクリプト
+eps_history テーブルを作成する（行は次回以降の銘柄更新で年次損益計算書から保存される）
+"""
+
+import sys
+import io
+from pathlib import Path
+
+# Windows環境での文字エンコーディング問題を回避
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from database.db_config import DatabaseManager
+from scripts.migrate_screening_snapshot import load_schema_statements
+
+
+def migrate_eps_history():
+    """eps_history テーブルを作成"""
+
+    db = DatabaseManager()
+
+    print("=" * 60)
+    print("EPS履歴テーブル マイグレーション")
+    print("=" * 60)
+
+    for sql in load_schema_statements('CREATE TABLE IF NOT EXISTS eps_history'):
+        print(f"実行中: {sql.splitlines()[0]}")
+        if db.execute_query(sql, fetch=False) is None:
+            print("[ERROR] マイグレーション失敗")
+            return
+
+    print("\nEPS履歴は次回の銘柄更新（全件・差分とも）で保存されます")
+    print("保存後に python scripts/update_dividend_analysis.py を実行すると、PER分析を時点PERで再計算します")
+    print("\n[OK] マイグレーション完了")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    migrate_eps_history()
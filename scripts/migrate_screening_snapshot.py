@@ -0,0 +1,73 @@
+"""
+スクリーニング用スナップショットテーブルのマイグレーションスクリプト
+screening_snapshot テーブルを追加し、v_screening_data ビューを更新して初回構築する
+"""
+
+import sys
+import io
+import time
+from pathlib import Path
+
+# Windows環境での文字エンコーディング問題を回避
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from database.db_config import DatabaseManager
+
+
+def load_schema_statements(*prefixes):
+    """schema.sql から指定した文で始まるSQL文を抽出（DDLの二重管理を避ける）"""
+    schema = (project_root / 'database' / 'schema.sql').read_text(encoding='utf-8')
+    statements = []
+    for statement in schema.split(';'):
+        # 先頭のコメント行を除去
+        lines = [line for line in statement.strip().splitlines() if not line.strip().startswith('--')]
+        sql = '\n'.join(lines).strip()
+        if any(sql.startswith(prefix) for prefix in prefixes):
+            statements.append(sql)
+    return statements
+
+
+def migrate_screening_snapshot():
+    """screening_snapshot テーブルを作成して初回構築"""
+
+    db = DatabaseManager()
+
+    print("=" * 60)
+    print("スクリーニングスナップショット マイグレーション")
+    print("=" * 60)
+
+    statements = load_schema_statements(
+        'CREATE TABLE IF NOT EXISTS screening_snapshot',
+        'CREATE OR REPLACE VIEW v_screening_data'
+    )
+    for sql in statements:
+        print(f"実行中: {sql.splitlines()[0]}")
+        if db.execute_query(sql, fetch=False) is None:
+            print("[ERROR] マイグレーション失敗")
+            return
+
+    print("スナップショットを構築中...")
+    start = time.time()
+    rows = db.refresh_screening_snapshot()
+    if rows is None:
+        print("[ERROR] スナップショット構築失敗")
+        return
+    print(f"[OK] {rows} 行を構築（{time.time() - start:.2f}秒）")
+
+    # 参照速度の確認
+    start = time.time()
+    results = db.get_screening_data({'min_dividend_yield': 3.0})
+    elapsed_ms = (time.time() - start) * 1000
+    print(f"[OK] スクリーニング参照: {len(results or [])} 件 / {elapsed_ms:.1f} ms")
+
+    print("\n[OK] マイグレーション完了")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    migrate_screening_snapshot()
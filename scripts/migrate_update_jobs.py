@@ -0,0 +1,42 @@
+"""
+更新ジョブキューテーブルのマイグレーションスクリプト
+update_jobs テーブルを追加し、データ更新を別プロセスのワーカーで実行できるようにする
+"""
+
+import sys
+import io
+from pathlib import Path
+
+# Windows環境での文字エンコーディング問題を回避
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from database.db_config import DatabaseManager
+from scripts.migrate_screening_snapshot import load_schema_statements
+
+
+def migrate_update_jobs():
+    """update_jobs テーブルを作成"""
+
+    db = DatabaseManager()
+
+    print("=" * 60)
+    print("更新ジョブキューテーブル マイグレーション")
+    print("=" * 60)
+
+    for sql in load_schema_statements('CREATE TABLE IF NOT EXISTS update_jobs'):
+        print(f"実行中: {sql.splitlines()[0]}")
+        if db.execute_query(sql, fetch=False) is None:
+            print("[ERROR] マイグレーション失敗")
+            return
+
+    print("\n[OK] マイグレーション完了")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    migrate_update_jobs()
@@ -0,0 +1,70 @@
+"""
+複数ワーカーによる分散更新のマイグレーションスクリプト
+update_workers テーブルを追加し、update_progress にリース列を追加する
+"""
+
+import sys
+import io
+from pathlib import Path
+
+# Windows環境での文字エンコーディング問題を回避
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from database.db_config import DatabaseManager
+from scripts.migrate_screening_snapshot import load_schema_statements
+
+
+# update_progress に追加する列（schema.sql と同じ定義）
+LEASE_COLUMNS = [
+    ('lease_owner', "VARCHAR(100) COMMENT '処理中のワーカー（リース保持者）' AFTER error_message"),
+    ('lease_expires_at', "TIMESTAMP NULL COMMENT 'リース期限（過ぎたら他のワーカーが取り直す）' AFTER lease_owner"),
+]
+
+
+def migrate_update_workers():
+    """update_workers テーブルを作成し、update_progress にリース列を追加"""
+
+    db = DatabaseManager()
+
+    print("=" * 60)
+    print("分散更新ワーカー マイグレーション")
+    print("=" * 60)
+
+    for sql in load_schema_statements('CREATE TABLE IF NOT EXISTS update_workers'):
+        print(f"実行中: {sql.splitlines()[0]}")
+        if db.execute_query(sql, fetch=False) is None:
+            print("[ERROR] マイグレーション失敗")
+            return
+
+    existing = db.execute_query("""
+        SELECT COLUMN_NAME FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'update_progress'
+    """)
+    if existing is None:
+        print("[ERROR] update_progress の列を取得できません（先に migrate_update_progress.py を実行してください）")
+        return
+    existing_columns = {row['COLUMN_NAME'] for row in existing}
+
+    for column, definition in LEASE_COLUMNS:
+        if column in existing_columns:
+            print(f"[SKIP] update_progress.{column} は既に存在します")
+            continue
+        print(f"実行中: ALTER TABLE update_progress ADD COLUMN {column}")
+        if db.execute_query(f"ALTER TABLE update_progress ADD COLUMN {column} {definition}", fetch=False) is None:
+            print("[ERROR] マイグレーション失敗")
+            return
+
+    if 'lease_owner' not in existing_columns:
+        db.execute_query("ALTER TABLE update_progress ADD INDEX idx_lease_owner (lease_owner)", fetch=False)
+
+    print("\n[OK] マイグレーション完了")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    migrate_update_workers()
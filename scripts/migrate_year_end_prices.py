@@ -0,0 +1,67 @@
+"""
+年末終値テーブルのマイグレーションスクリプト
+year_end_prices テーブルを作成し、既存の stock_prices から銘柄・年ごとの最終取引日の終値を構築する
+"""
+
+import sys
+import io
+from pathlib import Path
+
+# Windows環境での文字エンコーディング問題を回避
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from database.db_config import DatabaseManager
+from scripts.migrate_screening_snapshot import load_schema_statements
+
+
+# 銘柄・年ごとのMAX(date)を1回集計し、その日の終値を結合する
+BACKFILL_QUERY = """
+    INSERT INTO year_end_prices (ticker, year, date, close)
+    SELECT p.ticker, YEAR(p.date), p.date, p.close
+    FROM stock_prices p
+    JOIN (
+        SELECT ticker, MAX(date) AS last_date
+        FROM stock_prices
+        GROUP BY ticker, YEAR(date)
+    ) last ON p.ticker = last.ticker AND p.date = last.last_date
+    ON DUPLICATE KEY UPDATE
+        date = VALUES(date),
+        close = VALUES(close)
+"""
+
+
+def migrate_year_end_prices():
+    """year_end_prices テーブルを作成して初回構築"""
+
+    db = DatabaseManager()
+
+    print("=" * 60)
+    print("年末終値テーブル マイグレーション")
+    print("=" * 60)
+
+    for sql in load_schema_statements('CREATE TABLE IF NOT EXISTS year_end_prices'):
+        print(f"実行中: {sql.splitlines()[0]}")
+        if db.execute_query(sql, fetch=False) is None:
+            print("[ERROR] マイグレーション失敗")
+            return
+
+    print("実行中: stock_prices から年末終値を構築")
+    if db.execute_query(BACKFILL_QUERY, fetch=False) is None:
+        print("[ERROR] 年末終値の構築に失敗")
+        return
+
+    result = db.execute_query("SELECT COUNT(*) AS count FROM year_end_prices")
+    if result:
+        print(f"年末終値: {result[0]['count']}行")
+
+    print("\n[OK] マイグレーション完了")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    migrate_year_end_prices()
@@ -0,0 +1,51 @@
+"""
+年次配当テーブルのマイグレーションスクリプト
+yearly_dividends テーブルを作成し、既存のdividendsから全銘柄・全期間を集計して保存する
+（以降は配当の保存時に、保存した権利落ち日の年だけが集計し直される）
+"""
+
+import sys
+import io
+from pathlib import Path
+
+# Windows環境での文字エンコーディング問題を回避
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from database.data_updater import StockDataUpdater
+from scripts.migrate_screening_snapshot import load_schema_statements
+
+
+def migrate_yearly_dividends():
+    """yearly_dividends テーブルを作成し、dividendsから集計して保存"""
+
+    updater = StockDataUpdater()
+    db = updater.db
+
+    print("=" * 60)
+    print("年次配当テーブル マイグレーション")
+    print("=" * 60)
+
+    for sql in load_schema_statements('CREATE TABLE IF NOT EXISTS yearly_dividends'):
+        print(f"実行中: {sql.splitlines()[0]}")
+        if db.execute_query(sql, fetch=False) is None:
+            print("[ERROR] マイグレーション失敗")
+            return
+
+    print("dividendsから年次配当を集計中...")
+    affected_rows = updater.refresh_yearly_dividends()
+    if affected_rows is None:
+        print("[ERROR] 年次配当の集計失敗")
+        return
+    print(f"  {affected_rows}行を保存")
+
+    print("\n[OK] マイグレーション完了")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    migrate_yearly_dividends()
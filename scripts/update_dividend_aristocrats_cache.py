@@ -17,10 +17,11 @@ project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 import yfinance as yf
-from datetime import datetime
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from repository.database_manager import DatabaseManager
 from services.dividend_aristocrats import DividendAristocrats
+from repository.rate_limiter import get_rate_limiter
+from repository.update_job_tracker import UpdateJobTracker
 import time
 
 
@@ -32,18 +33,19 @@ class DividendAristocratsCacheUpdater:
         
     def update_single_ticker(self, ticker: str) -> Dict:
         """
-        単一銘柄の配当指標を更新
+        単一銘柄の配当指標を計算（保存は _run() がまとめて行う）
         
         Args:
             ticker: 銘柄コード
             
         Returns:
-            更新結果の辞書
+            更新結果の辞書（'metrics' は保存する指標データ、保存しない場合はNone）
         """
         result = {
             'ticker': ticker,
             'status': 'success',
-            'error': None
+            'error': None,
+            'metrics': None
         }
         
         try:
@@ -54,63 +56,72 @@ class DividendAristocratsCacheUpdater:
                 result['status'] = 'error'
                 result['error'] = analysis['エラー']
                 return result
-                result['status'] = 'error'
-                result['error'] = 'データベース保存失敗'
+
+            analysis['data_quality'] = DividendAristocrats.assess_data_quality(analysis)
+            result['metrics'] = analysis
                 
         except Exception as e:
             result['status'] = 'error'
             result['error'] = str(e)
             
             # エラー情報もDBに保存
-            try:
-                error_metrics = {
-                    'company_name': ticker,
-                    'data_quality': 'incomplete',
-                    'calculation_error': str(e)[:500]
-                }
-                self.db_manager.upsert_dividend_aristocrat_metrics(ticker, error_metrics)
-            except:
-                pass
+            result['metrics'] = {
+                'company_name': ticker,
+                'data_quality': 'incomplete',
+                'calculation_error': str(e)[:500]
+            }
         
         return result
     
-    def _assess_data_quality(self, analysis: Dict) -> str:
-        """
-        データ品質を評価
-        
-        Args:
-            analysis: 分析結果
-            
-        Returns:
-            品質レベル（complete/partial/incomplete）
-        """
-        required_fields = ['現在配当利回り', '配当CAGR', '連続増配年数', '配当性向']
-        available_count = sum(1 for field in required_fields if analysis.get(field) is not None)
-        
-        if available_count == len(required_fields):
-            return 'complete'
-        elif available_count >= 2:
-            return 'partial'
-        else:
-            return 'incomplete'
-    
+    def rescore_from_db(self):
+        """キャッシュ済み銘柄の配当成長指標をdividendsテーブルから一括で再計算"""
+        print("=" * 60)
+        print("配当成長指標の一括再計算（DBの配当履歴から）")
+        print("=" * 60)
+
+        start_time = time.time()
+        updated = DividendAristocrats.rescore_cache_from_db(self.db_manager)
+        print(f"[OK] 更新: {updated} 銘柄")
+        print(f"[TIME] 所要時間: {time.time() - start_time:.1f}秒")
+
     def update_prime_market_stocks(
         self,
         limit: Optional[int] = None,
-        delay: float = 1.0,
+        delay: Optional[float] = None,
         incremental: bool = False,
-        max_age_hours: int = 168
+        max_age_hours: int = 168,
+        resume: bool = False,
+        failed_only: bool = False
     ):
         """
         プライム市場銘柄の配当指標を一括更新
 
         Args:
             limit: 更新する銘柄数の上限（Noneの場合は全件）
-            delay: API呼び出し間の待機時間（秒）
+            delay: API呼び出し間の初期待機時間（秒）。指定時はレートリミッターの初期レートを1/delay回/秒にする
+                   （以降は成功・レート制限に応じて自動調整。Noneの場合は設定値）
             incremental: True=増分更新（古いキャッシュのみ）、False=全件更新
             max_age_hours: 増分更新時のキャッシュ有効期間（時間）
+            resume: True=前回中断したジョブの未処理・失敗銘柄のみ更新
+            failed_only: True=前回ジョブの失敗銘柄のみ再試行
         """
+        tracker = UpdateJobTracker(self.db_manager, 'dividend_aristocrats_cache')
+
         print("=" * 60)
+        if resume or failed_only:
+            print("配当貴族指標キャッシュ更新の再開（" + ("失敗銘柄のみ" if failed_only else "未処理・失敗銘柄") + "）")
+            print("=" * 60)
+
+            job = tracker.resume(failed_only=failed_only)
+            if job is None:
+                print("[INFO] 再開するジョブはありません")
+                return
+            update_id, remaining = job
+            tickers = list(remaining)
+            print(f"[INFO] 更新履歴ID: {update_id} / 再開対象: {len(tickers)} 銘柄")
+            self._run(tickers, tracker, delay)
+            return
+
         if incremental:
             print(f"配当貴族指標キャッシュ増分更新開始（{max_age_hours}時間以上前を更新）")
         else:
@@ -156,38 +167,87 @@ class DividendAristocratsCacheUpdater:
 
         if limit:
             tickers = tickers[:limit]
-        
+
         print(f"[INFO] 対象銘柄数: {len(tickers)}")
-        print(f"[INFO] API待機時間: {delay}秒")
+
+        # 更新履歴と銘柄ごとの進捗を記録（中断時は --resume で再開できる）
+        update_id = tracker.start({ticker: ticker for ticker in tickers})
+        if update_id:
+            print(f"[INFO] 更新履歴ID: {update_id}")
+        self._run(tickers, tracker, delay)
+
+    def _save_results(self, results: List[Dict], tracker: UpdateJobTracker):
+        """
+        溜めた更新結果の指標と進捗をまとめて保存
+
+        Args:
+            results: update_single_ticker() の戻り値のリスト
+            tracker: UpdateJobTracker
+        """
+        if not results:
+            return
+        saved = self.db_manager.upsert_dividend_aristocrat_metrics_many(
+            [(result['ticker'], result['metrics']) for result in results if result['metrics'] is not None]
+        )
+        outcomes = []
+        for result in results:
+            success = result['status'] == 'success'
+            error = result['error']
+            if success and saved is None:
+                success, error = False, 'データベース保存失敗'
+            outcomes.append((result['ticker'], success, error))
+        tracker.mark_many(outcomes)
+
+    def _run(self, tickers, tracker: UpdateJobTracker, delay: Optional[float] = None, batch_size: int = 100):
+        """
+        銘柄リストを順に更新し、結果を進捗テーブルに記録
+
+        Args:
+            tickers: 銘柄コードのリスト
+            tracker: 開始または再開済みの UpdateJobTracker
+            delay: API呼び出し間の初期待機時間（秒）
+            batch_size: 指標と進捗をまとめて保存する銘柄数
+        """
+        if not tickers:
+            print("[INFO] 更新対象の銘柄はありません")
+            tracker.finish()
+            return
+
+        limiter = get_rate_limiter()
+        if delay:
+            limiter.set_rate(1.0 / delay)
+        print(f"[INFO] APIレート: 初期 {limiter.rate:.2f}回/秒（{limiter.min_rate:.2f}〜{limiter.max_rate:.2f}で自動調整）")
         print()
-        
-        # 更新履歴を記録
-        update_id = self._start_update_history('dividend_aristocrats_cache', len(tickers))
-        
+
         success_count = 0
         error_count = 0
         start_time = time.time()
+        # 指標と進捗は batch_size 銘柄ごとに複数行のUPSERTでまとめて保存する
+        pending = []
         
         for i, ticker in enumerate(tickers, 1):
             print(f"[{i}/{len(tickers)}] {ticker} を処理中...", end=" ")
             
             result = self.update_single_ticker(ticker)
-            
+            pending.append(result)
+
             if result['status'] == 'success':
                 print("[OK]")
                 success_count += 1
             else:
                 print(f"[ERROR] {result['error']}")
                 error_count += 1
-            
-            # API制限対策の待機
-            if i < len(tickers):
-                time.sleep(delay)
+
+            if len(pending) >= batch_size:
+                self._save_results(pending, tracker)
+                pending = []
+
+        self._save_results(pending, tracker)
         
         elapsed_time = time.time() - start_time
         
-        # 更新履歴を完了
-        self._complete_update_history(update_id, success_count, error_count)
+        # 更新履歴を完了（再開分を含むジョブ全体で集計）
+        job_counts = tracker.finish()
         
         # サマリー表示
         print()
@@ -196,61 +256,15 @@ class DividendAristocratsCacheUpdater:
         print("=" * 60)
         print(f"[OK] 成功: {success_count} 銘柄")
         print(f"[ERROR] エラー: {error_count} 銘柄")
+        if job_counts['pending'] + job_counts['failed'] > 0:
+            print(f"[INFO] ジョブ全体の未完了: {job_counts['pending'] + job_counts['failed']} 銘柄"
+                  f"（--resume で再開、--retry-failed で失敗分のみ再試行）")
         print(f"[TIME] 所要時間: {elapsed_time:.1f}秒")
         print(f"[TIME] 平均処理時間: {elapsed_time/len(tickers):.2f}秒/銘柄")
+        rate_stats = limiter.stats()
+        print(f"[RATE] 最終レート: {rate_stats['rate']:.2f}回/秒（最大 {rate_stats['peak_rate']:.2f}）"
+              f" / リクエスト: {rate_stats['requests']} / レート制限: {rate_stats['rate_limited']}回")
         print()
-    
-    def _start_update_history(self, update_type: str, total_records: int) -> int:
-        """更新履歴の開始を記録"""
-        query = """
-            INSERT INTO update_history (update_type, status, records_updated, started_at)
-            VALUES (%s, 'running', %s, %s)
-        """
-        connection = self.db_manager.get_connection()
-        if not connection:
-            return 0
-        
-        try:
-            cursor = connection.cursor()
-            cursor.execute(query, (update_type, total_records, datetime.now()))
-            connection.commit()
-            update_id = cursor.lastrowid
-            cursor.close()
-            connection.close()
-            return update_id
-        except Exception as e:
-            print(f"[WARN] 更新履歴記録エラー: {e}")
-            if connection:
-                connection.close()
-            return 0
-    
-    def _complete_update_history(self, update_id: int, success_count: int, error_count: int):
-        """更新履歴の完了を記録"""
-        if update_id == 0:
-            return
-        
-        status = 'success' if error_count == 0 else 'partial'
-        error_message = f"{error_count} 銘柄でエラー" if error_count > 0 else None
-        
-        query = """
-            UPDATE update_history 
-            SET status = %s, records_updated = %s, error_message = %s, completed_at = %s
-            WHERE id = %s
-        """
-        connection = self.db_manager.get_connection()
-        if not connection:
-            return
-        
-        try:
-            cursor = connection.cursor()
-            cursor.execute(query, (status, success_count, error_message, datetime.now(), update_id))
-            connection.commit()
-            cursor.close()
-            connection.close()
-        except Exception as e:
-            print(f"[WARN] 更新履歴完了記録エラー: {e}")
-            if connection:
-                connection.close()
 
 
 def main():
@@ -259,18 +273,27 @@ def main():
     
     parser = argparse.ArgumentParser(description='配当貴族指標キャッシュ更新')
     parser.add_argument('--limit', type=int, help='更新する銘柄数の上限（テスト用）')
-    parser.add_argument('--delay', type=float, default=1.0, help='API呼び出し間の待機時間（秒）')
+    parser.add_argument('--delay', type=float, help='API呼び出し間の初期待機時間（秒、以降は自動調整）')
     parser.add_argument('--incremental', action='store_true', help='増分更新モード（古いキャッシュのみ更新）')
     parser.add_argument('--max-age', type=int, default=168, help='増分更新時のキャッシュ有効期間（時間、デフォルト168=1週間）')
+    parser.add_argument('--resume', action='store_true', help='前回中断したジョブの未処理・失敗銘柄のみ更新')
+    parser.add_argument('--retry-failed', action='store_true', help='前回ジョブの失敗銘柄のみ再試行')
+    parser.add_argument('--rescore', action='store_true',
+                        help='yfinanceに接続せず、DBの配当履歴から連続増配年数・CAGRだけを全銘柄一括で再計算')
 
     args = parser.parse_args()
 
     updater = DividendAristocratsCacheUpdater()
+    if args.rescore:
+        updater.rescore_from_db()
+        return
     updater.update_prime_market_stocks(
         limit=args.limit,
         delay=args.delay,
         incremental=args.incremental,
-        max_age_hours=args.max_age
+        max_age_hours=args.max_age,
+        resume=args.resume,
+        failed_only=args.retry_failed
     )
 
 
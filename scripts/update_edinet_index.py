@@ -0,0 +1,69 @@
+"""
+EDINETの書類一覧を並列に取得して書類一覧インデックス（edinet_documents）に保存
+取り込み済みの日付は取得しないため、毎日実行すると前回以降の日付だけを取り込む
+
+使い方:
+    python scripts/update_edinet_index.py                 # 過去365日のうち未取得の日付を取り込む
+    python scripts/update_edinet_index.py --days 1825     # 過去5年分
+    python scripts/update_edinet_index.py --api-key KEY   # APIキーを指定（省略時は環境変数 EDINET_API_KEY）
+"""
+
+import os
+import sys
+import io
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Windows環境での文字エンコーディング問題を回避
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from repository.edinet_index import EDINETFilingIndex
+from repository.edinet_repository import EDINETRepository
+
+
+def update_edinet_index(api_key, days=365):
+    """
+    過去N日のうち未取得の日付の書類一覧を取り込む
+    Args:
+        api_key: EDINET APIキー
+        days: 対象期間（日）
+    """
+    print("=" * 60)
+    print(f"EDINET書類一覧インデックスの更新（過去{days}日）")
+    print("=" * 60)
+
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=days)
+
+    def on_progress(done, total):
+        print(f"  {done}/{total}日")
+
+    index = EDINETFilingIndex()
+    stats = index.sync(EDINETRepository(api_key), start_date.strftime('%Y-%m-%d'),
+                       end_date.strftime('%Y-%m-%d'), on_progress=on_progress)
+    if stats is None:
+        print("[ERROR] データベースに接続できません")
+        return
+
+    print(f"\n完了: {stats['dates']}日・{stats['documents']}件を保存, 取得・保存失敗={stats['failed']}日")
+    if stats['failed']:
+        print("取得・保存に失敗した日付は次回の実行で取得し直します")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description='EDINET書類一覧インデックスの更新')
+    parser.add_argument('--days', type=int, default=365, help='対象期間（日）')
+    parser.add_argument('--api-key', default=os.getenv('EDINET_API_KEY'), help='EDINET APIキー')
+    args = parser.parse_args()
+
+    if not args.api_key:
+        print("[ERROR] EDINET APIキーを --api-key または環境変数 EDINET_API_KEY で指定してください")
+        sys.exit(1)
+    update_edinet_index(args.api_key, days=args.days)
@@ -0,0 +1,297 @@
+"""
+データ更新ワーカー
+update_jobs テーブルに登録されたジョブを取り出し、Streamlitとは別プロセスで全銘柄更新・差分更新を実行する
+
+対象銘柄は update_progress の行単位でリース（期限付きで確保）して処理するため、
+複数のホスト・プロセスでワーカーを起動すると同じジョブを分担して並列に更新する。
+ワーカーが停止してもリースの期限が切れれば、その銘柄は他のワーカーが取り直す。
+yfinanceのレート予算（YFINANCE_GLOBAL_RATE）は、同じ送信元（WORKER_EGRESS）で稼働中のワーカー数で等分する。
+
+使い方:
+    python scripts/update_worker.py            # ジョブを待ち続ける
+    python scripts/update_worker.py --once     # ジョブを1件処理して終了
+"""
+
+import sys
+import io
+import socket
+import threading
+import time
+from pathlib import Path
+
+# Windows環境での文字エンコーディング問題を回避
+if sys.platform == 'win32':
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+
+# プロジェクトルートをパスに追加
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config import APP_CONFIG, RATE_LIMIT_CONFIG
+from database.db_config import DatabaseManager
+from database.data_updater import StockDataUpdater
+from database.update_pipeline import UpdatePipeline
+from repository.rate_limiter import get_rate_limiter
+from repository.stock_list_repository import StockListRepository
+from repository.update_job_queue import UpdateJobQueue
+from repository.update_job_tracker import UpdateJobTracker
+
+
+class UpdateWorker:
+    """update_jobs のジョブを銘柄のリース単位で実行するワーカー"""
+
+    # 進捗の記録・中止要求の確認を行う最小間隔（秒）
+    REPORT_INTERVAL = 2.0
+
+    def __init__(self, poll_interval: float = None, shard_size: int = None,
+                 lease_seconds: int = None, egress: str = None):
+        """
+        初期化
+        Args:
+            poll_interval: 待機中ジョブを確認する間隔（秒、Noneの場合は設定値）
+            shard_size: 1回にリースする銘柄数（Noneの場合は設定値）
+            lease_seconds: リースの有効秒数（Noneの場合は設定値）
+            egress: 送信元の識別名（Noneの場合は設定値、未設定ならホスト名）
+        """
+        self.db = DatabaseManager()
+        self.queue = UpdateJobQueue(self.db)
+        self.updater = StockDataUpdater()
+        self.name = UpdateJobQueue.worker_name()
+        self.poll_interval = poll_interval or APP_CONFIG.update_worker_poll_interval
+        self.shard_size = shard_size or APP_CONFIG.update_shard_size
+        self.lease_seconds = lease_seconds or APP_CONFIG.update_lease_seconds
+        self.egress = egress or APP_CONFIG.update_worker_egress or socket.gethostname()
+
+        # ハートビートはリースの1/3の間隔で送る（期限切れ前に必ず延長する）
+        self.heartbeat_interval = max(5.0, self.lease_seconds / 3)
+        self._current = None  # (ジョブID, UpdateJobTracker)
+        self._processed = 0
+        self._stop = threading.Event()
+
+    def run(self, once: bool = False):
+        """
+        ジョブを待ち受けて実行
+        Args:
+            once: Trueの場合はジョブを1件処理して終了
+        """
+        print("=" * 60)
+        print(f"データ更新ワーカー起動: {self.name}（送信元: {self.egress}）")
+        print("=" * 60)
+
+        heartbeat = threading.Thread(target=self._heartbeat_loop, daemon=True)
+        heartbeat.start()
+        try:
+            while True:
+                job = self.queue.claim(self.name, stale_seconds=self.lease_seconds * 2)
+                if job is not None:
+                    self.run_job(job)
+                else:
+                    # 他のワーカーが実行中のジョブにリースできる銘柄が残っていれば参加
+                    job = self.queue.find_joinable()
+                    if job is not None:
+                        print(f"\n[JOB {job['id']}] 実行中のジョブに参加")
+                        self.process_shards(job)
+
+                if job is None:
+                    if once:
+                        print("[INFO] 待機中のジョブはありません")
+                        return
+                    time.sleep(self.poll_interval)
+                elif once:
+                    return
+        finally:
+            self._stop.set()
+            self.queue.unregister_worker(self.name)
+
+    def _heartbeat_loop(self):
+        """生存を記録し、リースを延長し、送信元ごとのレート予算から自分の最大レートを決める"""
+        limiter = get_rate_limiter()
+        while not self._stop.is_set():
+            current = self._current
+            try:
+                active = self.queue.heartbeat_worker(
+                    self.name, self.egress, job_id=current[0] if current else None,
+                    processed=self._processed, stale_seconds=int(self.heartbeat_interval * 3)
+                )
+                share = RATE_LIMIT_CONFIG.global_rate_per_egress / active
+                limiter.set_max_rate(share)
+                self.queue.set_worker_rate(self.name, share)
+                if current is not None:
+                    current[1].renew_lease(self.name, self.lease_seconds)
+            except Exception as e:
+                print(f"[WARN] ハートビート失敗: {e}")
+            self._stop.wait(self.heartbeat_interval)
+
+    def _target_stocks(self, job):
+        """
+        新規ジョブの対象銘柄を取得
+        Returns:
+            {ticker: name} の辞書（取得失敗時はNone）
+        """
+        if job['job_type'] == 'full':
+            return StockListRepository.get_premium_market_stocks()
+
+        days_old = int(job['params'].get('days_old', 1))
+        rows = self.db.execute_query("""
+            SELECT ticker, name FROM stocks
+            WHERE updated_at < DATE_SUB(NOW(), INTERVAL %s DAY)
+        """, (days_old,))
+        if rows is None:
+            return None
+        return {row['ticker']: row['name'] for row in rows}
+
+    def run_job(self, job):
+        """
+        取り出したジョブの対象銘柄を update_progress に登録し、リース単位で処理を開始
+        Args:
+            job: UpdateJobQueue.claim() が返したジョブ辞書
+        """
+        job_id = job['id']
+        job_type = job['job_type']
+        params = job['params']
+        print(f"\n[JOB {job_id}] {UpdateJobQueue.JOB_TYPES.get(job_type, job_type)} を開始 {params}")
+
+        try:
+            if job_type in ('resume', 'retry_failed'):
+                tracker = UpdateJobTracker(self.db, params.get('update_type', 'full'))
+                resumed = tracker.resume(failed_only=job_type == 'retry_failed')
+                if resumed is None:
+                    self.queue.finish(job_id, 'success', '再開する銘柄はありません')
+                    print(f"[JOB {job_id}] 再開する銘柄はありません")
+                    return
+            else:
+                stocks = self._target_stocks(job)
+                if stocks is None:
+                    self.queue.finish(job_id, 'failed', '銘柄リストの取得に失敗しました')
+                    print(f"[JOB {job_id}] [ERROR] 銘柄リストの取得に失敗しました")
+                    return
+                if not stocks:
+                    self.queue.finish(job_id, 'success', '更新が必要な銘柄はありません')
+                    print(f"[JOB {job_id}] 更新が必要な銘柄はありません")
+                    return
+                tracker = UpdateJobTracker(self.db, job_type)
+                if tracker.start(stocks) is None:
+                    self.queue.finish(job_id, 'failed', '更新履歴の記録に失敗しました')
+                    print(f"[JOB {job_id}] [ERROR] 更新履歴の記録に失敗しました")
+                    return
+        except Exception as e:
+            self.queue.finish(job_id, 'failed', f"予期しないエラー: {str(e)[:200]}")
+            print(f"[JOB {job_id}] [ERROR] {e}")
+            return
+
+        # 以降は他のワーカーも find_joinable() で参加できる
+        job['update_id'] = tracker.update_id
+        self.queue.set_update_id(job_id, tracker.update_id, sum(tracker.summary().values()))
+        self.process_shards(job, tracker)
+
+    def process_shards(self, job, tracker: UpdateJobTracker = None):
+        """
+        ジョブの銘柄をリースできなくなるまで取得・処理し、最後の1台がジョブを完了にする
+        Args:
+            job: ジョブ辞書（update_id 設定済み）
+            tracker: 開始済みの UpdateJobTracker（参加する場合はNone）
+        """
+        job_id = job['id']
+        params = job['params']
+        if tracker is None:
+            tracker = UpdateJobTracker(self.db, params.get('update_type', job['job_type']))
+            tracker.update_id = job['update_id']
+
+        max_workers = int(params.get('max_workers', APP_CONFIG.max_workers))
+        incremental = bool(params.get('incremental', False))
+        last_report = {'at': 0.0}
+        cancelled = False
+
+        def on_progress(processed, total, success_count, error_count):
+            self._processed += 1
+            now = time.monotonic()
+            if processed < total and now - last_report['at'] < self.REPORT_INTERVAL:
+                return True
+            last_report['at'] = now
+            self.queue.sync_progress(job_id, tracker.update_id)
+            return not self.queue.is_cancel_requested(job_id)
+
+        self._current = (job_id, tracker)
+        start = time.time()
+        try:
+            while True:
+                if self.queue.is_cancel_requested(job_id):
+                    cancelled = True
+                    break
+
+                shard = tracker.claim_shard(self.name, self.shard_size, self.lease_seconds)
+                if not shard:
+                    pending = tracker.pending_count()
+                    if pending['claimable'] + pending['leased'] == 0:
+                        break
+                    # 他のワーカーがリース中の銘柄が完了するか、期限切れで取り直せるまで待つ
+                    time.sleep(self.poll_interval)
+                    continue
+
+                success_count, error_count = self.updater.update_all_stocks(
+                    shard, max_workers=max_workers, incremental=incremental,
+                    tracker=tracker, progress_callback=on_progress
+                )
+                print(f"[JOB {job_id}] {len(shard)}銘柄を処理（成功: {success_count}, 失敗: {error_count}）")
+                for line in UpdatePipeline.format_stats(self.updater.last_pipeline_stats or {}):
+                    print(f"[JOB {job_id}]   {line}")
+
+        except KeyboardInterrupt:
+            # リースを解放して他のワーカーにすぐ引き継ぐ（ジョブは他のワーカーが続行・完了する）
+            tracker.release_lease(self.name)
+            print(f"[JOB {job_id}] ワーカー停止のため中断（未完了の銘柄は他のワーカーが引き継ぎます）")
+            raise
+        finally:
+            self._current = None
+
+        tracker.release_lease(self.name)
+        self._finalize(job_id, tracker, cancelled, time.time() - start)
+
+    def _finalize(self, job_id, tracker: UpdateJobTracker, cancelled: bool, elapsed: float):
+        """ジョブを完了として記録（複数ワーカーのうち最初の1台だけが記録する）"""
+        self.queue.sync_progress(job_id, tracker.update_id)
+        counts = tracker.summary()
+        unfinished = counts['pending'] + counts['failed']
+        if cancelled and counts['pending']:
+            status = 'cancelled'
+        elif unfinished == 0:
+            status = 'success'
+        elif counts['success'] > 0:
+            status = 'partial'
+        else:
+            status = 'failed'
+        message = (f"成功 {counts['success']} / 失敗 {counts['failed']} / 未処理 {counts['pending']}"
+                   f"（このワーカーの処理時間 {elapsed / 60:.1f}分）"
+                   + ("（未完了の銘柄は再開できます）" if unfinished else ""))
+
+        if self.queue.finish(job_id, status, message):
+            tracker.finish()
+            print(f"[JOB {job_id}] 完了（{status}）: {message}")
+
+
+def main():
+    """メイン処理"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='データ更新ワーカー')
+    parser.add_argument('--once', action='store_true', help='ジョブを1件処理して終了')
+    parser.add_argument('--poll-interval', type=float, help='待機中ジョブを確認する間隔（秒）')
+    parser.add_argument('--shard-size', type=int, help='1回にリースする銘柄数')
+    parser.add_argument('--lease-seconds', type=int, help='リースの有効秒数')
+    parser.add_argument('--egress', help='送信元の識別名（同じ値のワーカーでレート予算を共有）')
+    args = parser.parse_args()
+
+    worker = UpdateWorker(
+        poll_interval=args.poll_interval,
+        shard_size=args.shard_size,
+        lease_seconds=args.lease_seconds,
+        egress=args.egress
+    )
+    try:
+        worker.run(once=args.once)
+    except KeyboardInterrupt:
+        print("\n[INFO] ワーカーを停止しました")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,103 +3,78 @@
 連続増配銘柄の分析と発見
 """
 
-import yfinance as yf
+import threading
+import numpy as np
 import pandas as pd
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from typing import List, Dict, Optional, Tuple
 from datetime import datetime, timedelta
+from config import APP_CONFIG
+from repository.ticker_snapshot import TickerSnapshot
+from domain.calculators.historical_metrics import year_end_closes
+from domain.calculators.dividend_growth import (
+    consecutive_increases, dividend_cagr, dividend_growth_panel, yearly_dividends, yearly_dividends_panel
+)
+
+# キャッシュミス補完の共有スレッドプールと、取得中の銘柄（画面の再実行で同じ銘柄を二重に取得しない）
+_backfill_executor: Optional[ThreadPoolExecutor] = None
+_backfill_in_flight: Dict[Tuple[str, int], Future] = {}
+_backfill_lock = threading.Lock()
 
 
 class DividendAristocrats:
     """配当貴族スクリーニング"""
 
     @staticmethod
-    def calculate_dividend_cagr(dividends: pd.Series, years: int = 5) -> Optional[float]:
+    def calculate_dividend_cagr(dividends: pd.Series, years: int = 5,
+                                yearly: Optional[pd.DataFrame] = None) -> Optional[float]:
         """
         配当のCAGR（年平均成長率）を計算
 
         Args:
             dividends: 配当履歴（pd.Series）
             years: 計算期間（年）
+            yearly: 集計済みの年次配当（yearly_dividends() の戻り値。Noneの場合はdividendsから集計）
 
         Returns:
             CAGR（%）またはNone
         """
-        if dividends is None or dividends.empty:
-            return None
-
-        if len(dividends) < years:
-            return None
-
-        # 年ごとの配当合計を計算
-        dividends_df = dividends.to_frame(name='dividend')
-        dividends_df['year'] = dividends_df.index.year
-        yearly_dividends = dividends_df.groupby('year')['dividend'].sum()
-
-        if len(yearly_dividends) < years:
-            return None
-
-        # 最古と最新のN年間を比較
-        recent_years = yearly_dividends.tail(years)
-        first_year_div = recent_years.iloc[0]
-        last_year_div = recent_years.iloc[-1]
-
-        if first_year_div <= 0:
-            return None
-
-        # CAGR計算: ((最終値 / 初期値) ^ (1/年数) - 1) * 100
-        cagr = ((last_year_div / first_year_div) ** (1 / (years - 1)) - 1) * 100
-
-        return float(cagr)
+        if yearly is None:
+            yearly = yearly_dividends(dividends)
+        return dividend_cagr(yearly, years)
 
     @staticmethod
-    def count_consecutive_increases(dividends: pd.Series) -> int:
+    def count_consecutive_increases(dividends: pd.Series,
+                                    yearly: Optional[pd.DataFrame] = None) -> int:
         """
         連続増配年数をカウント
 
         Args:
             dividends: 配当履歴
+            yearly: 集計済みの年次配当（yearly_dividends() の戻り値。Noneの場合はdividendsから集計）
 
         Returns:
             連続増配年数
         """
-        if dividends is None or dividends.empty:
-            return 0
-
-        # 年ごとの配当合計
-        dividends_df = dividends.to_frame(name='dividend')
-        dividends_df['year'] = dividends_df.index.year
-        yearly_dividends = dividends_df.groupby('year')['dividend'].sum().sort_index()
-
-        if len(yearly_dividends) < 2:
-            return 0
-
-        consecutive_years = 0
-
-        # 最新年から過去に向かってチェック
-        for i in range(len(yearly_dividends) - 1, 0, -1):
-            current_year_div = yearly_dividends.iloc[i]
-            previous_year_div = yearly_dividends.iloc[i - 1]
-
-            if current_year_div > previous_year_div:
-                consecutive_years += 1
-            else:
-                break
-
-        return consecutive_years
+        if yearly is None:
+            yearly = yearly_dividends(dividends)
+        return consecutive_increases(yearly)
 
     @staticmethod
-    def calculate_payout_ratio(ticker_symbol: str) -> Tuple[Optional[float], str]:
+    def calculate_payout_ratio(ticker_symbol: str,
+                               snapshot: Optional[TickerSnapshot] = None) -> Tuple[Optional[float], str]:
         """
         配当性向を計算
 
         Args:
             ticker_symbol: 銘柄コード
+            snapshot: 取得済みのTickerSnapshot（Noneの場合は新規取得）
 
         Returns:
             (配当性向(%), メッセージ)
         """
         try:
-            ticker = yf.Ticker(ticker_symbol)
+            ticker = snapshot or TickerSnapshot(ticker_symbol)
             info = ticker.info
 
             # EPSと配当金を取得
@@ -128,18 +103,20 @@ class DividendAristocrats:
             return None, f"エラー: {str(e)[:30]}"
 
     @staticmethod
-    def calculate_fcf_payout_ratio(ticker_symbol: str) -> Tuple[Optional[float], str]:
+    def calculate_fcf_payout_ratio(ticker_symbol: str,
+                                   snapshot: Optional[TickerSnapshot] = None) -> Tuple[Optional[float], str]:
         """
         FCF配当性向を計算
         
         Args:
             ticker_symbol: 銘柄コード
+            snapshot: 取得済みのTickerSnapshot（Noneの場合は新規取得）
             
         Returns:
             (FCF配当性向(%), メッセージ)
         """
         try:
-            ticker = yf.Ticker(ticker_symbol)
+            ticker = snapshot or TickerSnapshot(ticker_symbol)
             info = ticker.info
             
             # フリーキャッシュフローと配当総額を取得
@@ -188,19 +165,22 @@ class DividendAristocrats:
             return None, f"エラー: {str(e)[:30]}"
 
     @staticmethod
-    def analyze_dividend_growth(ticker_symbol: str, years: int = 5) -> Dict:
+    def analyze_dividend_growth(ticker_symbol: str, years: int = 5,
+                                snapshot: Optional[TickerSnapshot] = None) -> Dict:
         """
         配当成長を総合分析
         
         Args:
             ticker_symbol: 銘柄コード
             years: 分析期間
+            snapshot: 取得済みのTickerSnapshot（Noneの場合は新規取得）
             
         Returns:
             分析結果の辞書
         """
         try:
-            ticker = yf.Ticker(ticker_symbol)
+            # info・配当・キャッシュフローを1回だけ取得し、各計算で共有する
+            ticker = snapshot or TickerSnapshot(ticker_symbol)
             info = ticker.info
             dividends = ticker.dividends
             
@@ -231,37 +211,31 @@ class DividendAristocrats:
                 after_tax_yield = current_yield * (1 - tax_rate)
                 result['税引後利回り'] = round(after_tax_yield, 2)
 
-            # 配当CAGR
+            # 配当CAGR（年次集計は1回だけ行い、連続増配年数と共用する）
             if dividends is not None and not dividends.empty:
-                cagr = DividendAristocrats.calculate_dividend_cagr(dividends, years)
+                yearly = yearly_dividends(dividends)
+                cagr = DividendAristocrats.calculate_dividend_cagr(dividends, years, yearly=yearly)
                 if cagr is not None:
                     result['配当CAGR'] = round(cagr, 2)
                 
                 # 連続増配年数
-                consecutive_years = DividendAristocrats.count_consecutive_increases(dividends)
+                consecutive_years = DividendAristocrats.count_consecutive_increases(dividends, yearly=yearly)
                 result['連続増配年数'] = consecutive_years
 
             # 配当性向
-            payout_ratio, payout_message = DividendAristocrats.calculate_payout_ratio(ticker_symbol)
+            payout_ratio, payout_message = DividendAristocrats.calculate_payout_ratio(ticker_symbol, snapshot=ticker)
             if payout_ratio is not None:
                 result['配当性向'] = round(payout_ratio, 2)
                 result['配当性向評価'] = payout_message
                 
             # FCF配当性向
-            fcf_ratio, fcf_message = DividendAristocrats.calculate_fcf_payout_ratio(ticker_symbol)
+            fcf_ratio, fcf_message = DividendAristocrats.calculate_fcf_payout_ratio(ticker_symbol, snapshot=ticker)
             if fcf_ratio is not None:
                 result['FCF配当性向'] = round(fcf_ratio, 2)
                 result['FCF配当性向評価'] = fcf_message
 
             # ステータス判定
-            if result['連続増配年数'] >= 10:
-                result['ステータス'] = "🏆 配当貴族候補"
-            elif result['連続増配年数'] >= 5:
-                result['ステータス'] = "⭐ 配当成長株"
-            elif result.get('配当CAGR') and result['配当CAGR'] > 5:
-                result['ステータス'] = "📈 高成長配当"
-            else:
-                result['ステータス'] = "📊 一般"
+            result['ステータス'] = DividendAristocrats.classify_status(result['連続増配年数'], result.get('配当CAGR'))
                 
             return result
 
@@ -273,55 +247,133 @@ class DividendAristocrats:
             }
 
     @staticmethod
-    def get_dividend_history(ticker_symbol: str, years: int = 10) -> pd.DataFrame:
+    def classify_status(consecutive_years: int, cagr: Optional[float]) -> str:
+        """
+        連続増配年数と配当CAGRからステータスを判定
+
+        Args:
+            consecutive_years: 連続増配年数
+            cagr: 配当CAGR (%)
+
+        Returns:
+            ステータス文字列
+        """
+        if consecutive_years >= 10:
+            return "🏆 配当貴族候補"
+        elif consecutive_years >= 5:
+            return "⭐ 配当成長株"
+        elif cagr and cagr > 5:
+            return "📈 高成長配当"
+        return "📊 一般"
+
+    @staticmethod
+    def growth_metrics_panel(dividends: Optional[pd.DataFrame] = None,
+                             yearly: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        全銘柄の配当成長指標を1回の年次集計からまとめて計算
+
+        Args:
+            dividends: 配当の縦持ちDataFrame（列: ticker, date, amount）
+            yearly: 集計済みの年次配当（yearly_dividends_panel() と同じ形式。指定時はdividendsを集計しない）
+
+        Returns:
+            銘柄コードをインデックスとするDataFrame
+            （列: consecutive_increase_years, dividend_cagr_5y, dividend_cagr_10y, aristocrat_status）
+        """
+        if yearly is None:
+            yearly = yearly_dividends_panel(dividends)
+        growth_5y = dividend_growth_panel(yearly, years=5)
+        growth_10y = dividend_growth_panel(yearly, years=10)
+
+        result = pd.DataFrame({
+            'consecutive_increase_years': growth_5y['consecutive_increases'],
+            'dividend_cagr_5y': growth_5y['cagr'].round(2),
+            'dividend_cagr_10y': growth_10y['cagr'].round(2),
+        })
+        # ステータス判定（classify_status と同じ基準）
+        streak = result['consecutive_increase_years']
+        result['aristocrat_status'] = np.select(
+            [streak >= 10, streak >= 5, result['dividend_cagr_5y'] > 5],
+            ["🏆 配当貴族候補", "⭐ 配当成長株", "📈 高成長配当"],
+            default="📊 一般"
+        )
+        return result
+
+    @staticmethod
+    def rescore_cache_from_db(db_manager=None) -> int:
+        """
+        キャッシュ済み銘柄の連続増配年数・CAGR・ステータスをyearly_dividendsテーブルから一括で再計算（yfinanceに接続しない）
+
+        Args:
+            db_manager: DatabaseManager（Noneの場合は新規作成）
+
+        Returns:
+            更新した銘柄数
+        """
+        if db_manager is None:
+            from repository.database_manager import DatabaseManager
+            db_manager = DatabaseManager()
+
+        cached = db_manager.execute_query("SELECT ticker FROM dividend_aristocrats_metrics")
+        tickers = [row['ticker'] for row in cached or []]
+        if not tickers:
+            return 0
+
+        # 配当の生データではなく、銘柄・年ごとに集計済みの行を読む
+        rows = db_manager.get_yearly_dividends(tickers)
+        yearly = pd.DataFrame(rows, columns=['ticker', 'year', 'dividend', 'payments'])
+        yearly = yearly.astype({'year': 'int64', 'dividend': 'float64', 'payments': 'int64'})
+        panel = DividendAristocrats.growth_metrics_panel(yearly=yearly.set_index(['ticker', 'year']))
+
+        # numpy型・NaNをPython標準型・Noneに変換
+        update_rows = [
+            (ticker, int(streak), None if pd.isna(cagr_5y) else float(cagr_5y),
+             None if pd.isna(cagr_10y) else float(cagr_10y), status)
+            for ticker, streak, cagr_5y, cagr_10y, status in panel.itertuples()
+        ]
+        db_manager.update_dividend_growth_metrics(update_rows)
+        return len(update_rows)
+
+    @staticmethod
+    def get_dividend_history(ticker_symbol: str, years: int = 10,
+                             snapshot: Optional[TickerSnapshot] = None) -> pd.DataFrame:
         """
         配当履歴データを取得（グラフ表示用）
         
         Args:
             ticker_symbol: 銘柄コード
             years: 取得期間（年）
+            snapshot: 取得済みのTickerSnapshot（Noneの場合は新規取得）
             
         Returns:
             配当履歴のDataFrame (Year, Dividend, Yield, PayoutRatio)
         """
         try:
-            ticker = yf.Ticker(ticker_symbol)
+            ticker = snapshot or TickerSnapshot(ticker_symbol)
             dividends = ticker.dividends
             
             if dividends is None or dividends.empty:
                 return pd.DataFrame()
             
-            # 年ごとの配当合計を計算
-            dividends_df = dividends.to_frame(name='dividend')
-            dividends_df['year'] = dividends_df.index.year
-            yearly_dividends = dividends_df.groupby('year')['dividend'].sum().sort_index()
-            
-            # 最近N年のデータに絞る
-            if len(yearly_dividends) > years:
-                yearly_dividends = yearly_dividends.tail(years)
+            # 年ごとの配当合計を計算し、最近N年のデータに絞る
+            yearly = yearly_dividends(dividends).tail(years)
             
             # DataFrameに変換
             result_df = pd.DataFrame({
-                'Year': yearly_dividends.index,
-                'Dividend': yearly_dividends.values
+                'Year': yearly.index,
+                'Dividend': yearly['dividend'].values
             })
             
             # 配当利回りを計算（年末株価が必要）
             try:
                 hist = ticker.history(period=f"{years+1}y")
                 if not hist.empty:
+                    # その年の最後の取引日の終値（年末終値インデックス）
+                    year_ends = year_end_closes(hist)
                     yields = []
-                    for year in result_df['Year']:
-                        # その年の最後の取引日の終値を取得
-                        year_data = hist[hist.index.year == year]
-                        if not year_data.empty:
-                            year_end_price = year_data['Close'].iloc[-1]
-                            dividend_amount = result_df[result_df['Year'] == year]['Dividend'].values[0]
-                            if year_end_price > 0:
-                                div_yield = (dividend_amount / year_end_price) * 100
-                                yields.append(div_yield)
-                            else:
-                                yields.append(None)
+                    for year, dividend_amount in zip(result_df['Year'], result_df['Dividend']):
+                        if year in year_ends.index and year_ends.at[year, 'close'] > 0:
+                            yields.append((dividend_amount / year_ends.at[year, 'close']) * 100)
                         else:
                             yields.append(None)
                     result_df['Yield'] = yields
@@ -371,6 +423,95 @@ class DividendAristocrats:
             print(f"Error fetching dividend history for {ticker_symbol}: {str(e)}")
             return pd.DataFrame()
 
+    @staticmethod
+    def assess_data_quality(analysis: Dict) -> str:
+        """
+        データ品質を評価
+        
+        Args:
+            analysis: 分析結果
+            
+        Returns:
+            品質レベル（complete/partial/incomplete）
+        """
+        required_fields = ['現在配当利回り', '配当CAGR', '連続増配年数', '配当性向']
+        available_count = sum(1 for field in required_fields if analysis.get(field) is not None)
+        
+        if available_count == len(required_fields):
+            return 'complete'
+        elif available_count >= 2:
+            return 'partial'
+        else:
+            return 'incomplete'
+
+    @staticmethod
+    def _backfill_one(ticker_symbol: str, years: int, db_manager) -> Dict:
+        """
+        1銘柄を分析し、結果をすぐに dividend_aristocrats_metrics に保存（補完スレッドで実行）
+        分析できなかった銘柄もエラーとして保存し、有効期間内は再取得しない
+        """
+        analysis = DividendAristocrats.analyze_dividend_growth(ticker_symbol, years)
+        if 'エラー' in analysis:
+            metrics = {'company_name': ticker_symbol, 'data_quality': 'incomplete',
+                       'calculation_error': str(analysis['エラー'])[:500]}
+        else:
+            metrics = dict(analysis, data_quality=DividendAristocrats.assess_data_quality(analysis))
+        db_manager.upsert_dividend_aristocrat_metrics(ticker_symbol, metrics)
+        return analysis
+
+    @staticmethod
+    def backfill_cache(ticker_list: List[str], years: int = 5, db_manager=None,
+                       timeout: Optional[float] = None) -> Tuple[List[Dict], int]:
+        """
+        キャッシュにない銘柄を共有スレッドプールで並列に分析し、完了したものから順にキャッシュへ保存
+        yfinanceへの呼び出し間隔は共有レートリミッター（TickerSnapshot経由）が制御する
+
+        Args:
+            ticker_list: 銘柄コードリスト
+            years: 分析期間
+            db_manager: 保存先の DatabaseManager（Noneの場合は新規作成）
+            timeout: 結果を待つ秒数（Noneの場合は全件待つ）。
+                     過ぎた銘柄は裏で取得を続け、完了時にキャッシュへ保存する
+
+        Returns:
+            (時間内に完了した分析結果のリスト, 取得中のまま返した銘柄数)
+        """
+        global _backfill_executor
+        if db_manager is None:
+            from repository.database_manager import DatabaseManager
+            db_manager = DatabaseManager()
+
+        futures = []
+        submitted = []
+        with _backfill_lock:
+            if _backfill_executor is None:
+                _backfill_executor = ThreadPoolExecutor(
+                    max_workers=APP_CONFIG.aristocrat_backfill_workers, thread_name_prefix='aristocrat-backfill'
+                )
+            for ticker_symbol in ticker_list:
+                key = (ticker_symbol, years)
+                future = _backfill_in_flight.get(key)
+                if future is None:
+                    future = _backfill_executor.submit(DividendAristocrats._backfill_one, ticker_symbol, years, db_manager)
+                    _backfill_in_flight[key] = future
+                    submitted.append((key, future))
+                futures.append(future)
+
+        # 完了済みのFutureはadd_done_callbackがその場でコールバックを呼ぶため、ロックの外で登録する
+        for key, future in submitted:
+            future.add_done_callback(lambda done, key=key: DividendAristocrats._forget_backfill(key, done))
+
+        done, not_done = wait(futures, timeout=timeout)
+        analyses = [future.result() for future in done if future.exception() is None]
+        return analyses, len(not_done)
+
+    @staticmethod
+    def _forget_backfill(key: Tuple[str, int], future: Future):
+        """完了した補完を取得中の一覧から外す（同じ銘柄の新しい補完は残す）"""
+        with _backfill_lock:
+            if _backfill_in_flight.get(key) is future:
+                del _backfill_in_flight[key]
+
     @staticmethod
     def screen_dividend_aristocrats(
         ticker_list: Optional[List[str]] = None,
@@ -415,34 +556,22 @@ class DividendAristocrats:
                 ]
         
         results = []
+        cache_miss_tickers = []
+        pending_count = 0
         
         # キャッシュを使用する場合
         if use_cache:
-            # DBから指標を取得
-            cached_metrics = db_manager.get_dividend_aristocrats_metrics(
+            # 条件での絞り込み・並べ替えはDB側で行う（有効期間内のキャッシュがある銘柄も同時に取得）
+            cached_metrics, cached_tickers = db_manager.screen_dividend_aristocrats_metrics(
                 tickers=ticker_list,
-                min_consecutive_years=0,  # フィルタリングは後で行う
+                min_consecutive_years=min_consecutive_years,
+                min_cagr=min_cagr,
+                max_payout_ratio=max_payout_ratio,
                 max_cache_age_hours=max_cache_age_hours
             )
             
-            # キャッシュされた銘柄のセット
-            cached_tickers = {m['ticker'] for m in cached_metrics}
-            
             # キャッシュされたデータを結果に追加
             for metrics in cached_metrics:
-                # フィルタリング
-                if metrics['consecutive_increase_years'] < min_consecutive_years:
-                    continue
-                
-                if metrics.get('dividend_cagr_5y') is None:
-                    continue
-                if metrics['dividend_cagr_5y'] < min_cagr:
-                    continue
-                
-                if metrics.get('payout_ratio') is not None:
-                    if metrics['payout_ratio'] > max_payout_ratio:
-                        continue
-                
                 # 結果フォーマットに変換
                 result = {
                     '銘柄コード': metrics['ticker'],
@@ -463,10 +592,13 @@ class DividendAristocrats:
             cache_miss_tickers = [t for t in ticker_list if t not in cached_tickers]
             
             if cache_miss_tickers:
-                print(f"⚠️ {len(cache_miss_tickers)} 銘柄がキャッシュにありません。yfinanceから取得中...")
-                for ticker_symbol in cache_miss_tickers:
-                    analysis = DividendAristocrats.analyze_dividend_growth(ticker_symbol, years)
-                    
+                print(f"⚠️ {len(cache_miss_tickers)} 銘柄がキャッシュにありません。yfinanceから並列に取得中...")
+                # 時間内に終わらなかった銘柄は裏で取得・保存を続け、今回は取得済みの分だけ返す
+                analyses, pending_count = DividendAristocrats.backfill_cache(
+                    cache_miss_tickers, years, db_manager=db_manager,
+                    timeout=APP_CONFIG.aristocrat_backfill_timeout
+                )
+                for analysis in analyses:
                     # エラーチェック
                     if 'エラー' in analysis:
                         continue
@@ -512,14 +644,17 @@ class DividendAristocrats:
                 results.append(analysis)
 
         if not results:
-            return pd.DataFrame()
-
-        df = pd.DataFrame(results)
+            df = pd.DataFrame()
+        else:
+            df = pd.DataFrame(results)
 
-        # ソート: 連続増配年数降順 → CAGR降順
-        df = df.sort_values(
-            ['連続増配年数', '配当CAGR'],
-            ascending=[False, False]
-        )
+            # ソート: 連続増配年数降順 → CAGR降順
+            df = df.sort_values(
+                ['連続増配年数', '配当CAGR'],
+                ascending=[False, False]
+            )
 
+        # 取得中のまま返した銘柄数（0より大きい場合は一部の銘柄が未反映）
+        df.attrs['cache_misses'] = len(cache_miss_tickers)
+        df.attrs['pending_tickers'] = pending_count
         return df
@@ -4,27 +4,29 @@
 """
 
 import pandas as pd
-import yfinance as yf
 from typing import Dict, Optional, Tuple, List
 from datetime import datetime, timedelta
+from repository.ticker_snapshot import TickerSnapshot
 
 
 class InvestmentScreener:
     """投資スクリーニング機能"""
 
     @staticmethod
-    def calculate_regular_dividend_yield(ticker_symbol: str) -> Tuple[Optional[float], str]:
+    def calculate_regular_dividend_yield(ticker_symbol: str,
+                                         snapshot: Optional[TickerSnapshot] = None) -> Tuple[Optional[float], str]:
         """
         通常配当利回りを計算（特別配当を除く）
 
         Args:
             ticker_symbol: 銘柄コード
+            snapshot: 取得済みのTickerSnapshot（Noneの場合は新規取得）
 
         Returns:
             (配当利回り(%), メッセージ)
         """
         try:
-            ticker = yf.Ticker(ticker_symbol)
+            ticker = snapshot or TickerSnapshot(ticker_symbol)
             info = ticker.info
 
             # 現在株価
@@ -40,10 +42,9 @@ class InvestmentScreener:
             # 過去1年間の配当を取得（タイムゾーンを揃える）
             one_year_ago = datetime.now() - timedelta(days=365)
             # dividends.indexがtz-awareならone_year_agoも合わせる
+            # （DBから読み込んだ配当はzoneinfo、yfinanceはpytzのため、どちらでも使えるpandasで変換）
             if hasattr(dividends.index, 'tz') and dividends.index.tz is not None:
-                import pytz
-                tz = dividends.index.tz
-                one_year_ago = tz.localize(one_year_ago.replace(tzinfo=None))
+                one_year_ago = pd.Timestamp(one_year_ago).tz_localize(dividends.index.tz)
             recent_dividends = dividends[dividends.index > one_year_ago]
 
             if recent_dividends.empty:
@@ -82,18 +83,20 @@ class InvestmentScreener:
             return None, f"エラー: {str(e)[:30]}"
 
     @staticmethod
-    def assess_bankruptcy_risk(ticker_symbol: str) -> Tuple[str, Dict[str, any], str]:
+    def assess_bankruptcy_risk(ticker_symbol: str,
+                               snapshot: Optional[TickerSnapshot] = None) -> Tuple[str, Dict[str, any], str]:
         """
         倒産リスクを評価
 
         Args:
             ticker_symbol: 銘柄コード
+            snapshot: 取得済みのTickerSnapshot（Noneの場合は新規取得）
 
         Returns:
             (リスクレベル, 指標辞書, 詳細メッセージ)
         """
         try:
-            ticker = yf.Ticker(ticker_symbol)
+            ticker = snapshot or TickerSnapshot(ticker_symbol)
             balance_sheet = ticker.balance_sheet
             info = ticker.info
 
@@ -201,11 +204,14 @@ class InvestmentScreener:
         results = []
 
         for symbol in ticker_symbols:
+            # infoは配当利回り・倒産リスクの両方で使うため1回だけ取得して共有
+            snapshot = TickerSnapshot(symbol)
+
             # 配当利回りを計算
-            div_yield, div_msg = InvestmentScreener.calculate_regular_dividend_yield(symbol)
+            div_yield, div_msg = InvestmentScreener.calculate_regular_dividend_yield(symbol, snapshot=snapshot)
 
             # 倒産リスクを評価
-            risk_level, risk_metrics, risk_detail = InvestmentScreener.assess_bankruptcy_risk(symbol)
+            risk_level, risk_metrics, risk_detail = InvestmentScreener.assess_bankruptcy_risk(symbol, snapshot=snapshot)
 
             # 最低配当利回りをクリアした銘柄のみ
             if div_yield and div_yield >= min_dividend_yield:
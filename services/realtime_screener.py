@@ -0,0 +1,359 @@
+"""
+リアルタイムスクリーニングサービス
+銘柄ごとにyfinanceから1回だけデータを取得し、指標計算と条件判定をワーカープロセスで並列実行する
+取得はasyncio（1本のスレッド上のイベントループ）で並列に行い、取得できた銘柄から順に分析へ回す
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import pandas as pd
+
+from domain.calculators.historical_metrics import (
+    calculate_historical_dividend_yield,
+    calculate_dividend_quality_score,
+    calculate_historical_per_from_data,
+)
+from repository.async_fetcher import AsyncFetcher
+from repository.ticker_snapshot import TickerSnapshot
+from repository.yfinance_repository import YFinanceRepository
+
+
+def history_period(conditions: Dict[str, Any]) -> str:
+    """
+    配当分析・PER分析の両方を満たす株価履歴の取得期間
+    （PER分析は分析年数+1年分が必要）
+    """
+    years = max(5, conditions.get('dividend_years', 4), conditions.get('per_years', 4) + 1)
+    return f"{years}y"
+
+
+def fetch_ticker_data(ticker: str, period: str = '5y') -> Dict[str, Any]:
+    """
+    スクリーニングに必要なデータを1銘柄につき1回だけ取得
+
+    Args:
+        ticker: 銘柄コード
+        period: 株価履歴の取得期間
+
+    Returns:
+        {'info': dict, 'dividends': Series, 'history': DataFrame}
+    """
+    return snapshot_data(TickerSnapshot(ticker).prefetch('info', 'dividends', period=period), period)
+
+
+def snapshot_data(snapshot: TickerSnapshot, period: str) -> Dict[str, Any]:
+    """
+    TickerSnapshotからスクリーニングに必要なデータを取り出す（未取得の項目はyfinanceから取得）
+
+    Args:
+        snapshot: TickerSnapshot
+        period: 株価履歴の取得期間
+
+    Returns:
+        {'info': dict, 'dividends': Series, 'history': DataFrame}
+    """
+    return {
+        'info': snapshot.info,
+        'dividends': snapshot.dividends,
+        'history': snapshot.history(period=period),
+    }
+
+
+def fetch_all_async(tickers: List[str], period: str, futures: Dict[str, Future], max_in_flight: int):
+    """
+    全銘柄をasyncioで並列に取得し、取得できた銘柄から順に対応するFutureへ結果を設定（取得用スレッドで実行）
+    株価履歴・配当はチャートAPI、infoはyfinanceの関数をスレッドで取得する
+
+    Args:
+        tickers: 銘柄コードのリスト
+        period: 株価履歴の取得期間
+        futures: {ticker: Future}（結果または例外を設定する）
+        max_in_flight: 同時に取得する銘柄数
+    """
+    host = urlsplit(YFinanceRepository.CHART_URL).hostname
+
+    async def fetch_one(fetcher, semaphore, ticker):
+        try:
+            async with semaphore:
+                snapshot = await YFinanceRepository.get_snapshot_async(fetcher, ticker, period, fields=('info',))
+                # チャートAPIで取れなかった項目はyfinanceから取得するため、イベントループの外で取り出す
+                data = await fetcher.run_blocking(host, snapshot_data, snapshot, period)
+            futures[ticker].set_result(data)
+        except Exception as e:
+            futures[ticker].set_exception(e)
+
+    async def fetch_all():
+        semaphore = asyncio.Semaphore(max(1, max_in_flight))
+        async with AsyncFetcher() as fetcher:
+            await asyncio.gather(*(fetch_one(fetcher, semaphore, ticker) for ticker in tickers))
+
+    try:
+        asyncio.run(fetch_all())
+    except Exception as e:
+        # 取得レイヤー自体が使えない場合も、待っている側が止まらないよう全銘柄を失敗にする
+        for future in futures.values():
+            if not future.done():
+                future.set_exception(e)
+
+
+def analyze_ticker(ticker: str, name: str, data: Dict[str, Any],
+                   conditions: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    取得済みデータから指標を計算し、条件に合致すれば結果行を返す
+    （ワーカープロセスで実行するためモジュールレベルの関数とする）
+
+    Args:
+        ticker: 銘柄コード
+        name: 銘柄名
+        data: fetch_ticker_data() の戻り値
+        conditions: スクリーニング条件
+
+    Returns:
+        結果行の辞書（条件に合致しない場合はNone）
+    """
+    try:
+        info = data['info']
+        dividends = data['dividends']
+        hist_prices = data['history']
+
+        # 基本データ取得
+        dividend_yield = info.get('dividendYield', 0)
+        if dividend_yield and dividend_yield < 1:
+            dividend_yield = dividend_yield * 100
+        elif not dividend_yield:
+            dividend_yield = 0
+
+        per = info.get('trailingPE', 0) or 0
+        pbr = info.get('priceToBook', 0) or 0
+        profit_margin = info.get('profitMargins', 0) or 0
+        if profit_margin < 1:
+            profit_margin = profit_margin * 100
+
+        revenue_growth_rate = info.get('revenueGrowth', 0) or 0
+        if revenue_growth_rate < 1:
+            revenue_growth_rate = revenue_growth_rate * 100
+
+        # 配当履歴チェック
+        dividend_increasing = False
+        if len(dividends) >= 2:
+            recent_div = dividends.iloc[-5:] if len(dividends) >= 5 else dividends
+            dividend_increasing = all(recent_div.iloc[i] <= recent_div.iloc[i+1] for i in range(len(recent_div)-1))
+
+        # 高度な配当分析
+        avg_div_yield, div_cv, current_div_yield, div_trend, has_special_div = calculate_historical_dividend_yield(
+            None, dividends, hist_prices, years=conditions.get('dividend_years', 4)
+        )
+
+        # 配当クオリティスコア
+        div_quality_score = calculate_dividend_quality_score(avg_div_yield, div_cv, div_trend, has_special_div)
+
+        # 高度なPER分析（株価履歴を再取得せずに計算）
+        avg_per, per_cv, current_per = calculate_historical_per_from_data(
+            hist_prices, info.get('trailingEps'), years=conditions.get('per_years', 4)
+        )
+
+        # 条件チェック
+        passes = True
+
+        # 基本的な配当利回り条件
+        if conditions.get('use_basic_dividend', True):
+            if dividend_yield < conditions.get('min_dividend_yield', 0):
+                passes = False
+
+        # 高度な配当条件
+        if conditions.get('use_advanced_dividend', False):
+            # 過去N年平均配当利回り条件
+            if conditions.get('min_avg_dividend_yield', None) is not None:
+                if avg_div_yield is None or avg_div_yield < conditions['min_avg_dividend_yield']:
+                    passes = False
+
+            # 配当の安定性条件（変動係数が小さい）
+            if conditions.get('max_dividend_cv', None) is not None:
+                if div_cv is None or div_cv > conditions['max_dividend_cv']:
+                    passes = False
+
+            # 配当トレンド条件（増配傾向）
+            if conditions.get('require_increasing_trend', False):
+                if div_trend is None or div_trend <= 0:
+                    passes = False
+
+            # 特別配当を除外
+            if conditions.get('exclude_special_dividend', False):
+                if has_special_div:
+                    passes = False
+
+            # 配当クオリティスコア条件
+            if conditions.get('min_dividend_quality_score', None) is not None:
+                if div_quality_score is None or div_quality_score < conditions['min_dividend_quality_score']:
+                    passes = False
+
+            # 減配だが過去平均が高い条件
+            if conditions.get('declining_but_high_avg', False):
+                if current_div_yield is None or avg_div_yield is None:
+                    passes = False
+                elif not (current_div_yield < avg_div_yield and avg_div_yield >= conditions.get('min_avg_dividend_yield', 4.0)):
+                    passes = False
+
+        # 高度なPER条件
+        if conditions.get('use_advanced_per', False):
+            # 過去N年平均PER条件
+            if conditions.get('min_avg_per', None) is not None:
+                if avg_per is None or avg_per < conditions['min_avg_per']:
+                    passes = False
+
+            if conditions.get('max_avg_per', None) is not None:
+                if avg_per is None or avg_per > conditions['max_avg_per']:
+                    passes = False
+
+            # PERの安定性条件
+            if conditions.get('max_per_cv', None) is not None:
+                if per_cv is None or per_cv > conditions['max_per_cv']:
+                    passes = False
+
+            # 現在PERが低いが過去平均は高い（バリュー株発掘）
+            if conditions.get('low_current_high_avg_per', False):
+                if current_per is None or avg_per is None:
+                    passes = False
+                elif not (current_per < avg_per * 0.8):  # 現在PERが過去平均の80%未満
+                    passes = False
+
+        # 基本的な条件
+        if conditions.get('dividend_growth', False) and not dividend_increasing:
+            passes = False
+
+        if conditions.get('revenue_growth', False) and revenue_growth_rate <= 0:
+            passes = False
+
+        if profit_margin < conditions.get('min_profit_margin', 0):
+            passes = False
+
+        if conditions.get('use_basic_per', True):
+            if per > conditions.get('max_per', 100) and per > 0:
+                passes = False
+
+        if pbr > conditions.get('max_pbr', 100) and pbr > 0:
+            passes = False
+
+        if not passes:
+            return None
+
+        result_row = {
+            '銘柄コード': ticker,
+            '銘柄名': name,
+            '配当利回り': f"{dividend_yield:.2f}%" if dividend_yield > 0 else "N/A",
+            'PER': f"{per:.2f}" if per > 0 else "N/A",
+            'PBR': f"{pbr:.2f}" if pbr > 0 else "N/A",
+            '利益率': f"{profit_margin:.2f}%",
+            '売上成長率': f"{revenue_growth_rate:.2f}%",
+        }
+
+        # 高度な配当情報を追加
+        if conditions.get('use_advanced_dividend', False):
+            result_row['過去平均配当利回り'] = f"{avg_div_yield:.2f}%" if avg_div_yield else "N/A"
+            result_row['配当安定性(CV)'] = f"{div_cv:.2f}" if div_cv is not None else "N/A"
+
+            # トレンド表示
+            if div_trend is not None:
+                if div_trend > 0.3:
+                    trend_str = f"↑↑ {div_trend:.2f}"
+                elif div_trend > 0:
+                    trend_str = f"↑ {div_trend:.2f}"
+                elif div_trend > -0.15:
+                    trend_str = f"→ {div_trend:.2f}"
+                else:
+                    trend_str = f"↓ {div_trend:.2f}"
+                result_row['配当トレンド'] = trend_str
+            else:
+                result_row['配当トレンド'] = "N/A"
+
+            result_row['配当クオリティ'] = f"{div_quality_score:.0f}点" if div_quality_score else "N/A"
+            result_row['特別配当'] = "あり" if has_special_div else "なし"
+
+        # 高度なPER情報を追加
+        if conditions.get('use_advanced_per', False):
+            result_row['過去平均PER'] = f"{avg_per:.2f}" if avg_per else "N/A"
+            result_row['PER安定性'] = f"{per_cv:.2f}" if per_cv is not None else "N/A"
+
+        return result_row
+
+    except Exception:
+        return None
+
+
+class RealtimeScreener:
+    """yfinanceからのリアルタイムスクリーニング"""
+
+    @staticmethod
+    def screen(stocks: Dict[str, str], conditions: Dict[str, Any],
+               max_fetch_workers: int = 5, max_process_workers: Optional[int] = None,
+               use_processes: bool = True,
+               progress_callback: Optional[Callable[[int, int, str, str, int], None]] = None) -> pd.DataFrame:
+        """
+        取得（asyncio）と分析（プロセス）をパイプラインで並列実行
+
+        Args:
+            stocks: {ticker: name} の辞書
+            conditions: スクリーニング条件
+            max_fetch_workers: 同時に取得する銘柄数（実際の送信間隔は共有レートリミッターで制御）
+            max_process_workers: 分析プロセス数（Noneの場合はCPU数）
+            use_processes: Falseの場合は分析もスレッドで実行
+            progress_callback: 1銘柄完了ごとに (完了数, 総数, ticker, name, 合致数) で呼ばれる
+
+        Returns:
+            結果DataFrame（行順は stocks の順）
+        """
+        total = len(stocks)
+        period = history_period(conditions)
+        results = {}
+        done = 0
+
+        # 取得は別スレッドのイベントループで行い、銘柄ごとのFutureで結果を受け取る
+        fetch_futures = {ticker: Future() for ticker in stocks}
+        threading.Thread(
+            target=fetch_all_async, args=(list(stocks), period, fetch_futures, max_fetch_workers), daemon=True
+        ).start()
+
+        analysis_executor = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        with analysis_executor(max_workers=max_process_workers) as analysis_pool:
+            pending = {
+                fetch_futures[ticker]: ('fetch', ticker, name, None)
+                for ticker, name in stocks.items()
+            }
+
+            while pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage, ticker, name, data = pending.pop(future)
+                    row = None
+
+                    if stage == 'fetch':
+                        try:
+                            data = future.result()
+                        except Exception:
+                            data = None
+                        if data is not None:
+                            # 取得が終わった銘柄から順に分析へ回す
+                            analysis_future = analysis_pool.submit(analyze_ticker, ticker, name, data, conditions)
+                            pending[analysis_future] = ('analyze', ticker, name, data)
+                            continue
+                    else:
+                        try:
+                            row = future.result()
+                        except BrokenProcessPool:
+                            # プロセスプールが使えない環境ではこのスレッドで分析
+                            row = analyze_ticker(ticker, name, data, conditions)
+                        except Exception:
+                            row = None
+
+                    done += 1
+                    if row is not None:
+                        results[ticker] = row
+                    if progress_callback:
+                        progress_callback(done, total, ticker, name, len(results))
+
+        return pd.DataFrame([results[ticker] for ticker in stocks if ticker in results])
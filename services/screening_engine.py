@@ -0,0 +1,192 @@
+"""
+インメモリ・カラム型スクリーニングエンジン
+スクリーニング対象の全銘柄を1度だけ読み込み、NumPy配列のブールマスクで絞り込む
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+class ScreeningEngine:
+    """get_screening_data と同じ条件キーをメモリ上で評価するエンジン"""
+
+    # 数値列（NULLはNaNとして保持するため、SQLと同じくNULLとの比較は常に偽になる）
+    NUMERIC_COLUMNS = [
+        'market_cap', 'per', 'pbr', 'roe', 'dividend_yield', 'dividend_rate', 'payout_ratio',
+        'profit_margin', 'revenue_growth', 'avg_dividend_yield', 'dividend_cv', 'dividend_trend',
+        'has_special_dividend', 'dividend_quality_score', 'current_dividend_yield',
+        'regular_dividend_yield', 'avg_per', 'min_per', 'max_per', 'per_cv', 'current_per', 'is_low_per'
+    ]
+
+    # 「列 >= 値」で評価する条件
+    MIN_CONDITIONS = {
+        'min_dividend_yield': 'dividend_yield',
+        'min_dividend_quality_score': 'dividend_quality_score',
+        'min_profit_margin': 'profit_margin',
+        'min_avg_per': 'avg_per',
+    }
+
+    # 「列 <= 値」で評価する条件
+    MAX_CONDITIONS = {
+        'max_avg_per': 'avg_per',
+        'max_per_cv': 'per_cv',
+    }
+
+    def __init__(self, db, version_check_interval: float = 5.0):
+        """
+        初期化
+        Args:
+            db: database.db_config.DatabaseManager
+            version_check_interval: update_history を確認する間隔（秒）。
+                                    この間隔内の再スクリーニングはDBに問い合わせない
+        """
+        self.db = db
+        self.version_check_interval = version_check_interval
+
+        self._lock = threading.Lock()
+        # (行辞書のリスト, {列名: NumPy配列}) を1つのタプルで差し替える（一度も読み込めていない間はNone）
+        self._data = None
+        self._version = None
+        self._checked_at = 0.0
+        self._loaded = False
+
+    def _data_version(self):
+        """データの版（update_history の最新ID）を取得"""
+        result = self.db.execute_query("SELECT MAX(id) AS version FROM update_history")
+        if not result:
+            return None
+        return result[0]['version']
+
+    def _current(self):
+        """最新のデータ（行, 列配列）を取得（一度も読み込めていない場合はNone）"""
+        self._ensure_fresh()
+        return self._data
+
+    def _ensure_fresh(self):
+        """未読み込み、または更新履歴に新しい記録があれば再読み込み"""
+        now = time.monotonic()
+        if self._loaded and now - self._checked_at < self.version_check_interval:
+            return
+
+        with self._lock:
+            if self._loaded and now - self._checked_at < self.version_check_interval:
+                return
+            version = self._data_version()
+            if not self._loaded or version != self._version:
+                self._load()
+                if self._loaded:
+                    self._version = version
+            self._checked_at = time.monotonic()
+
+    def _load(self):
+        """スクリーニング対象を全件読み込み、列ごとのNumPy配列に変換"""
+        rows = self.db.get_screening_data(use_engine=False)
+        if rows is None:
+            # クエリ失敗時は前回のデータを使い続ける（次回の確認で再試行）
+            return
+
+        columns = {}
+        for column in self.NUMERIC_COLUMNS:
+            columns[column] = np.array(
+                [np.nan if row.get(column) is None else float(row[column]) for row in rows],
+                dtype='float64'
+            )
+        columns['market'] = np.array([row.get('market') for row in rows], dtype=object)
+
+        self._data = (rows, columns)
+        self._loaded = True
+
+    def invalidate(self):
+        """次回のスクリーニングで強制的に再読み込みする"""
+        with self._lock:
+            self._loaded = False
+
+    def mask(self, conditions: Optional[Dict[str, Any]] = None) -> np.ndarray:
+        """
+        条件に合致する行のブールマスクを作成
+        Args:
+            conditions: get_screening_data と同じ条件辞書
+        Returns:
+            行数分のブール配列（データを読み込めていない場合はNone）
+        """
+        data = self._current()
+        if data is None:
+            return None
+        rows, cols = data
+        return self._evaluate(cols, len(rows), conditions)
+
+    def _evaluate(self, cols, size, conditions):
+        """列配列に対して条件を評価"""
+        result = np.ones(size, dtype=bool)
+        if not conditions:
+            return result
+
+        for key, column in self.MIN_CONDITIONS.items():
+            if conditions.get(key):
+                result &= cols[column] >= conditions[key]
+
+        for key, column in self.MAX_CONDITIONS.items():
+            if conditions.get(key):
+                result &= cols[column] <= conditions[key]
+
+        if conditions.get('min_avg_dividend_yield'):
+            # 特別配当を除外する場合はregular_dividend_yieldを使用
+            column = 'regular_dividend_yield' if conditions.get('exclude_special_dividend') else 'avg_dividend_yield'
+            result &= cols[column] >= conditions['min_avg_dividend_yield']
+
+        if conditions.get('max_per'):
+            result &= (cols['per'] <= conditions['max_per']) & (cols['per'] > 0)
+
+        if conditions.get('max_pbr'):
+            result &= (cols['pbr'] <= conditions['max_pbr']) & (cols['pbr'] > 0)
+
+        if conditions.get('revenue_growth'):
+            result &= cols['revenue_growth'] > 0
+
+        if conditions.get('low_current_high_avg_per'):
+            result &= cols['is_low_per'] == 1
+
+        if conditions.get('market'):
+            result &= cols['market'] == conditions['market']
+
+        return result
+
+    def screen(self, conditions: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        スクリーニングを実行
+        Args:
+            conditions: get_screening_data と同じ条件辞書
+        Returns:
+            行辞書のリスト（並び順は get_screening_data と同じ）。
+            データを読み込めていない場合はNone（呼び出し側でSQLに切り替える）
+        """
+        data = self._current()
+        if data is None:
+            return None
+        rows, cols = data
+        indexes = np.flatnonzero(self._evaluate(cols, len(rows), conditions))
+        return [rows[i] for i in indexes]
+
+
+# プロセス内で共有するエンジン
+_engine: Optional[ScreeningEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_screening_engine(db, version_check_interval: float = 5.0) -> ScreeningEngine:
+    """
+    共有のScreeningEngineを取得（なければ作成）
+    Args:
+        db: database.db_config.DatabaseManager
+        version_check_interval: update_history を確認する間隔（秒）
+    Returns:
+        ScreeningEngine
+    """
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = ScreeningEngine(db, version_check_interval)
+        return _engine
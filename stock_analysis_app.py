@@ -11,6 +11,13 @@ from datetime import datetime, timedelta
 import io
 import requests
 from services.screening_presets import ScreeningPresets
+from config import CACHE_CONFIG
+from repository.response_cache import cached_http_get
+from domain.calculators.historical_metrics import (
+    calculate_historical_dividend_yield,
+    calculate_dividend_quality_score,
+    calculate_historical_per,
+)
 
 # Streamlitアプリの設定 - ページ設定を最初に
 st.set_page_config(
@@ -489,10 +496,9 @@ def get_premium_market_stocks():
         for url, engine in urls:
             try:
                 st.info(f"銘柄リストをダウンロード中... ({url.split('/')[-1]})")
-                response = requests.get(url, timeout=30)
-                response.raise_for_status()
+                content = cached_http_get('jpx.listing', url, ttl=CACHE_CONFIG.jpx_listing_ttl)
 
-                df = pd.read_excel(io.BytesIO(response.content), engine=engine)
+                df = pd.read_excel(io.BytesIO(content), engine=engine)
                 st.success(f"✅ ダウンロード成功")
                 break  # 成功したらループを抜ける
 
@@ -1071,401 +1077,40 @@ def translate_financial_terms(df):
         return df_copy
     return df
 
-def calculate_historical_dividend_yield(ticker_obj, dividends, hist_prices, years=5):
-    """過去N年の配当利回りを計算（トレンド分析と特別配当検出付き）"""
-    try:
-        if dividends is None or len(dividends) == 0 or hist_prices is None or len(hist_prices) == 0:
-            return None, None, None, None, None
-
-        # タイムゾーン情報を削除（yfinanceのデータはUTC、datetime.now()はnaive）
-        dividends = dividends.copy()
-        hist_prices = hist_prices.copy()
-        if hasattr(dividends.index, 'tz') and dividends.index.tz is not None:
-            dividends.index = dividends.index.tz_localize(None)
-        if hasattr(hist_prices.index, 'tz') and hist_prices.index.tz is not None:
-            hist_prices.index = hist_prices.index.tz_localize(None)
-
-        # 過去N年分のデータを取得
-        cutoff_date = datetime.now() - timedelta(days=365 * years)
-        recent_dividends = dividends[dividends.index >= cutoff_date]
-
-        if len(recent_dividends) == 0:
-            return None, None, None, None, None
-
-        # 年次配当利回りを計算
-        yearly_yields = []
-        for year in range(years):
-            year_start = datetime.now() - timedelta(days=365 * (year + 1))
-            year_end = datetime.now() - timedelta(days=365 * year)
-
-            # その年の配当合計
-            year_divs = recent_dividends[(recent_dividends.index >= year_start) & (recent_dividends.index < year_end)]
-            if len(year_divs) == 0:
-                continue
-
-            total_div = year_divs.sum()
-
-            # その年の平均株価（年初の価格を使用）
-            year_prices = hist_prices[(hist_prices.index >= year_start) & (hist_prices.index < year_end)]
-            if len(year_prices) == 0:
-                continue
-
-            avg_price = year_prices['Close'].iloc[0] if len(year_prices) > 0 else None
-            if avg_price and avg_price > 0:
-                yield_pct = (total_div / avg_price) * 100
-                yearly_yields.append(yield_pct)
-
-        if len(yearly_yields) == 0:
-            return None, None, None, None, None
-
-        # データを新しい順から古い順に並べ替え（時系列分析用）
-        yearly_yields.reverse()
-
-
-        # 特別配当の検出と除外（中央値の2倍ルール）
-        if len(yearly_yields) >= 1:
-            median = pd.Series(yearly_yields).median()
-            filtered_yields = [y for y in yearly_yields if y <= median * 2]
-            has_special_dividend = len(filtered_yields) < len(yearly_yields)
-        else:
-            filtered_yields = yearly_yields
-            has_special_dividend = False
-
-        # フィルタ後のデータで再計算
-        if len(filtered_yields) == 0:
-            filtered_yields = yearly_yields  # 全て外れ値の場合は元データを使用
-
-        # 平均配当利回り（特別配当除外後）
-        avg_yield = sum(filtered_yields) / len(filtered_yields)
-
-        # 配当の変動係数（CV = 標準偏差 / 平均）
-        if len(filtered_yields) >= 2:
-            std_dev = pd.Series(filtered_yields).std()
-            cv = (std_dev / avg_yield) if avg_yield > 0 else float('inf')
-        else:
-            cv = 0
-
-        # 配当トレンド分析（線形回帰の傾き）
-        if len(filtered_yields) >= 3:
-            # x = 年数（0, 1, 2, ...）、y = 配当利回り
-            x = list(range(len(filtered_yields)))
-            y = filtered_yields
-
-            # 線形回帰: y = ax + b
-            n = len(x)
-            sum_x = sum(x)
-            sum_y = sum(y)
-            sum_xy = sum(x[i] * y[i] for i in range(n))
-            sum_x2 = sum(xi ** 2 for xi in x)
-
-            # 傾き a = (n*Σxy - Σx*Σy) / (n*Σx² - (Σx)²)
-            denominator = (n * sum_x2 - sum_x ** 2)
-            if denominator != 0:
-                slope = (n * sum_xy - sum_x * sum_y) / denominator
-                dividend_trend = slope  # 正なら増配傾向、負なら減配傾向
-            else:
-                dividend_trend = 0
-        else:
-            dividend_trend = 0
-
-        # 最新年の配当利回り
-        current_yield = yearly_yields[-1] if len(yearly_yields) > 0 else None
-
-        return avg_yield, cv, current_yield, dividend_trend, has_special_dividend
-
-    except Exception as e:
-        return None, None, None, None, None
-
-def calculate_dividend_quality_score(avg_yield, cv, trend, has_special_div):
-    """配当の質を総合的にスコアリング（0-100点）"""
-    try:
-        if avg_yield is None or cv is None or trend is None:
-            return None
-
-        score = 0
-
-        # 1. 配当利回り（最大40点）
-        if avg_yield >= 5.0:
-            score += 40
-        elif avg_yield >= 4.0:
-            score += 35
-        elif avg_yield >= 3.0:
-            score += 30
-        elif avg_yield >= 2.0:
-            score += 20
-        else:
-            score += 10
-
-        # 2. 安定性（最大30点）
-        if cv <= 0.15:
-            score += 30  # 非常に安定
-        elif cv <= 0.25:
-            score += 25  # 安定
-        elif cv <= 0.35:
-            score += 20  # やや安定
-        elif cv <= 0.50:
-            score += 10  # 中程度
-        else:
-            score += 0   # 不安定
-
-        # 3. トレンド（最大30点）
-        if trend > 0.3:
-            score += 30  # 強い増配傾向
-        elif trend > 0.15:
-            score += 25  # 増配傾向
-        elif trend > 0:
-            score += 20  # 緩やかな増配
-        elif trend > -0.15:
-            score += 10  # 横ばい
-        else:
-            score += 0   # 減配傾向
-
-        # 4. 特別配当ペナルティ（-10点）
-        if has_special_div:
-            score -= 10
-
-        # スコアを0-100の範囲に収める
-        score = max(0, min(100, score))
-
-        return score
-
-    except Exception:
-        return None
-
-def calculate_historical_per(ticker_obj, years=5):
-    """過去N年のPERを計算（過去の各年末時点のPER）"""
-    try:
-        import pandas as pd
-        from datetime import datetime
-
-        # 過去N年+1年の株価データを取得（十分な履歴を確保）
-        hist = ticker_obj.history(period=f'{years + 1}y')
-        if hist is None or len(hist) == 0 or 'Close' not in hist.columns:
-            return None, None, None
+def screen_stocks(stocks, conditions, parallel=False, max_workers=5):
+    """
+    条件に基づいて銘柄をスクリーニング
+    parallel=Trueの場合はデータ取得をスレッド、指標計算をプロセスで並列実行する
+    """
+    from services.realtime_screener import RealtimeScreener, fetch_ticker_data, analyze_ticker, history_period
 
-        # 現在のEPSを取得
-        info = ticker_obj.info
-        current_eps = info.get('trailingEps')
-        if not current_eps or current_eps <= 0:
-            return None, None, None
-
-        # 年次PERを計算（過去N年の各年末時点）
-        yearly_pers = []
-        current_date = datetime.now()
-
-        for year_offset in range(years):
-            try:
-                # N年前の年末日付を計算（12月31日）
-                target_year = current_date.year - year_offset
-                year_end = pd.Timestamp(target_year, 12, 31, tz='Asia/Tokyo')
-
-                # その年末以前の最も近い株価を取得
-                hist_before = hist[hist.index <= year_end]
-                if len(hist_before) > 0:
-                    close_price = hist_before['Close'].iloc[-1]
-
-                    # PER = 株価 / EPS
-                    # 注意: 現在のEPSを使用（過去のEPSは取得不可）
-                    per = close_price / current_eps
-                    if per > 0:
-                        yearly_pers.append(per)
-
-            except Exception:
-                continue
-
-        if len(yearly_pers) == 0:
-            return None, None, None
-
-        # 平均PER
-        avg_per = sum(yearly_pers) / len(yearly_pers)
-
-        # PERの変動係数
-        if len(yearly_pers) >= 2:
-            std_dev = pd.Series(yearly_pers).std()
-            cv = (std_dev / avg_per) if avg_per > 0 else float('inf')
-        else:
-            cv = 0
-
-        # 現在のPER（最新＝0年前）
-        current_per = yearly_pers[0] if len(yearly_pers) > 0 else None
+    progress_bar = st.progress(0)
+    status_text = st.empty()
+    total_stocks = len(stocks)
 
-        return avg_per, cv, current_per
+    if parallel:
+        def on_progress(done, total, ticker, name, matched):
+            progress_bar.progress(done / total)
+            status_text.text(f"分析完了: {name} ({ticker}) - {done}/{total}（合致: {matched}件）")
 
-    except Exception as e:
-        return None, None, None
+        results_df = RealtimeScreener.screen(
+            stocks, conditions, max_fetch_workers=max_workers, progress_callback=on_progress
+        )
+        progress_bar.empty()
+        status_text.empty()
+        return results_df
 
-def screen_stocks(stocks, conditions):
-    """条件に基づいて銘柄をスクリーニング"""
     results = []
-
-    progress_bar = st.progress(0)
-    status_text = st.empty()
-
-    total_stocks = len(stocks)
+    period = history_period(conditions)
     for idx, (ticker, name) in enumerate(stocks.items()):
         try:
             status_text.text(f"分析中: {name} ({ticker}) - {idx+1}/{total_stocks}")
             progress_bar.progress((idx + 1) / total_stocks)
 
-            stock = yf.Ticker(ticker)
-            info = stock.info
-
-            # 基本データ取得
-            dividend_yield = info.get('dividendYield', 0)
-            if dividend_yield and dividend_yield < 1:
-                dividend_yield = dividend_yield * 100
-            elif not dividend_yield:
-                dividend_yield = 0
-
-            per = info.get('trailingPE', 0) or 0
-            pbr = info.get('priceToBook', 0) or 0
-            profit_margin = info.get('profitMargins', 0) or 0
-            if profit_margin < 1:
-                profit_margin = profit_margin * 100
-
-            revenue_growth_rate = info.get('revenueGrowth', 0) or 0
-            if revenue_growth_rate < 1:
-                revenue_growth_rate = revenue_growth_rate * 100
-
-            # 配当履歴チェック
-            dividends = stock.dividends
-            dividend_increasing = False
-            if len(dividends) >= 2:
-                recent_div = dividends[-5:] if len(dividends) >= 5 else dividends
-                dividend_increasing = all(recent_div.iloc[i] <= recent_div.iloc[i+1] for i in range(len(recent_div)-1))
-
-            # 高度な配当分析
-            hist_prices = stock.history(period="5y")
-            avg_div_yield, div_cv, current_div_yield, div_trend, has_special_div = calculate_historical_dividend_yield(
-                stock, dividends, hist_prices, years=conditions.get('dividend_years', 4)
-            )
-
-            # 配当クオリティスコア
-            div_quality_score = calculate_dividend_quality_score(avg_div_yield, div_cv, div_trend, has_special_div)
-
-            # 高度なPER分析
-            avg_per, per_cv, current_per = calculate_historical_per(stock, years=conditions.get('per_years', 4))
-
-            # 条件チェック
-            passes = True
-
-            # 基本的な配当利回り条件
-            if conditions.get('use_basic_dividend', True):
-                if dividend_yield < conditions.get('min_dividend_yield', 0):
-                    passes = False
-
-            # 高度な配当条件
-            if conditions.get('use_advanced_dividend', False):
-                # 過去N年平均配当利回り条件
-                if conditions.get('min_avg_dividend_yield', None) is not None:
-                    if avg_div_yield is None or avg_div_yield < conditions['min_avg_dividend_yield']:
-                        passes = False
-
-                # 配当の安定性条件（変動係数が小さい）
-                if conditions.get('max_dividend_cv', None) is not None:
-                    if div_cv is None or div_cv > conditions['max_dividend_cv']:
-                        passes = False
-
-                # 配当トレンド条件（増配傾向）
-                if conditions.get('require_increasing_trend', False):
-                    if div_trend is None or div_trend <= 0:
-                        passes = False
-
-                # 特別配当を除外
-                if conditions.get('exclude_special_dividend', False):
-                    if has_special_div:
-                        passes = False
-
-                # 配当クオリティスコア条件
-                if conditions.get('min_dividend_quality_score', None) is not None:
-                    if div_quality_score is None or div_quality_score < conditions['min_dividend_quality_score']:
-                        passes = False
-
-                # 減配だが過去平均が高い条件
-                if conditions.get('declining_but_high_avg', False):
-                    if current_div_yield is None or avg_div_yield is None:
-                        passes = False
-                    elif not (current_div_yield < avg_div_yield and avg_div_yield >= conditions.get('min_avg_dividend_yield', 4.0)):
-                        passes = False
-
-            # 高度なPER条件
-            if conditions.get('use_advanced_per', False):
-                # 過去N年平均PER条件
-                if conditions.get('min_avg_per', None) is not None:
-                    if avg_per is None or avg_per < conditions['min_avg_per']:
-                        passes = False
-
-                if conditions.get('max_avg_per', None) is not None:
-                    if avg_per is None or avg_per > conditions['max_avg_per']:
-                        passes = False
-
-                # PERの安定性条件
-                if conditions.get('max_per_cv', None) is not None:
-                    if per_cv is None or per_cv > conditions['max_per_cv']:
-                        passes = False
-
-                # 現在PERが低いが過去平均は高い（バリュー株発掘）
-                if conditions.get('low_current_high_avg_per', False):
-                    if current_per is None or avg_per is None:
-                        passes = False
-                    elif not (current_per < avg_per * 0.8):  # 現在PERが過去平均の80%未満
-                        passes = False
-
-            # 基本的な条件
-            if conditions.get('dividend_growth', False) and not dividend_increasing:
-                passes = False
-
-            if conditions.get('revenue_growth', False) and revenue_growth_rate <= 0:
-                passes = False
-
-            if profit_margin < conditions.get('min_profit_margin', 0):
-                passes = False
-
-            if conditions.get('use_basic_per', True):
-                if per > conditions.get('max_per', 100) and per > 0:
-                    passes = False
-
-            if pbr > conditions.get('max_pbr', 100) and pbr > 0:
-                passes = False
-
-            if passes:
-                result_row = {
-                    '銘柄コード': ticker,
-                    '銘柄名': name,
-                    '配当利回り': f"{dividend_yield:.2f}%" if dividend_yield > 0 else "N/A",
-                    'PER': f"{per:.2f}" if per > 0 else "N/A",
-                    'PBR': f"{pbr:.2f}" if pbr > 0 else "N/A",
-                    '利益率': f"{profit_margin:.2f}%",
-                    '売上成長率': f"{revenue_growth_rate:.2f}%",
-                }
-
-                # 高度な配当情報を追加
-                if conditions.get('use_advanced_dividend', False):
-                    result_row['過去平均配当利回り'] = f"{avg_div_yield:.2f}%" if avg_div_yield else "N/A"
-                    result_row['配当安定性(CV)'] = f"{div_cv:.2f}" if div_cv is not None else "N/A"
-
-                    # トレンド表示
-                    if div_trend is not None:
-                        if div_trend > 0.3:
-                            trend_str = f"↑↑ {div_trend:.2f}"
-                        elif div_trend > 0:
-                            trend_str = f"↑ {div_trend:.2f}"
-                        elif div_trend > -0.15:
-                            trend_str = f"→ {div_trend:.2f}"
-                        else:
-                            trend_str = f"↓ {div_trend:.2f}"
-                        result_row['配当トレンド'] = trend_str
-                    else:
-                        result_row['配当トレンド'] = "N/A"
-
-                    result_row['配当クオリティ'] = f"{div_quality_score:.0f}点" if div_quality_score else "N/A"
-                    result_row['特別配当'] = "あり" if has_special_div else "なし"
-
-                # 高度なPER情報を追加
-                if conditions.get('use_advanced_per', False):
-                    result_row['過去平均PER'] = f"{avg_per:.2f}" if avg_per else "N/A"
-                    result_row['PER安定性'] = f"{per_cv:.2f}" if per_cv is not None else "N/A"
-
+            # 1銘柄につきデータ取得は1回（PER分析で株価を再取得しない）
+            data = fetch_ticker_data(ticker, period)
+            result_row = analyze_ticker(ticker, name, data, conditions)
+            if result_row is not None:
                 results.append(result_row)
 
         except Exception as e:
@@ -1838,6 +1483,12 @@ elif mode == "銘柄スクリーニング":
         # データベースからの高速スクリーニング
         st.info("データベース内のデータから検索します。左側のサイドバーで条件を設定してください。")
 
+        from config import APP_CONFIG
+        use_engine = st.checkbox(
+            "インメモリエンジンで高速検索", value=APP_CONFIG.screening_engine_enabled,
+            help="全銘柄を一度メモリに読み込み、以降の条件変更はDBに問い合わせずに絞り込みます（データ更新時に自動で再読み込み）"
+        )
+
         if st.button("スクリーニング実行", type="primary", key="db_screening_button"):
             # DBスクリーニング用の条件辞書を作成
             if use_preset and preset_conditions:
@@ -1880,7 +1531,7 @@ elif mode == "銘柄スクリーニング":
                 }
 
             with st.spinner("データベースから検索中..."):
-                results = db_manager.get_screening_data(db_conditions)
+                results = db_manager.get_screening_data(db_conditions, use_engine=use_engine)
 
             # デバッグ情報
             if results is None:
@@ -1941,6 +1592,11 @@ elif mode == "銘柄スクリーニング":
         # 従来のリアルタイムスクリーニング
         st.info("yfinanceからリアルタイムでデータを取得します。左側のサイドバーで条件を設定してください。")
 
+        parallel_realtime = st.checkbox(
+            "並列処理で高速化", value=True,
+            help="データ取得を並列化し、配当・PER分析を複数プロセスで計算します"
+        )
+
         if st.button("スクリーニング実行", type="primary", key="realtime_screening_button"):
             # 条件を辞書にまとめる
             conditions = {
@@ -1975,7 +1631,7 @@ elif mode == "銘柄スクリーニング":
             stocks = get_stock_list(market)
 
             with st.spinner("スクリーニング実行中..."):
-                results_df = screen_stocks(stocks, conditions)
+                results_df = screen_stocks(stocks, conditions, parallel=parallel_realtime)
 
             # 結果をセッション状態に保存
             st.session_state['screening_results'] = results_df
@@ -0,0 +1,248 @@
+"""asyncio取得レイヤーのテスト（ローカルのスタブHTTPサーバーを使用）"""
+import asyncio
+import io
+import json
+import threading
+import time
+import zipfile
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+import repository.response_cache as response_cache
+import repository.yfinance_repository as yfinance_repository
+from repository.async_fetcher import AsyncFetcher, FetchError
+from repository.edinet_index import EDINETFilingIndex
+from repository.edinet_repository import EDINETRepository
+from repository.rate_limiter import AdaptiveRateLimiter
+from repository.yfinance_repository import YFinanceRepository
+
+
+# 2024-01-04〜2024-01-05（JST）の日足と、2024-01-04の配当10円
+CHART = {
+    'chart': {
+        'result': [{
+            'meta': {'exchangeTimezoneName': 'Asia/Tokyo'},
+            'timestamp': [1704326400, 1704412800],
+            'events': {'dividends': {'1704326400': {'amount': 10.0, 'date': 1704326400}}},
+            'indicators': {
+                'quote': [{'open': [100.0, 110.0], 'high': [120.0, 130.0], 'low': [90.0, 100.0],
+                           'close': [100.0, 120.0], 'volume': [1000, 2000]}],
+                'adjclose': [{'adjclose': [50.0, 120.0]}],
+            },
+        }],
+        'error': None,
+    }
+}
+
+
+def make_document_zip(doc_id):
+    """売上高1件だけのXBRLを含む書類ZIP（docIDがNで始まる場合はXBRLなし）"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zip_file:
+        if doc_id.startswith('N'):
+            zip_file.writestr('XBRL/PublicDoc/readme.txt', doc_id)
+        else:
+            zip_file.writestr('XBRL/PublicDoc/report.xbrl',
+                              '<xbrl><NetSales contextRef="CurrentYear" unitRef="JPY">1000</NetSales></xbrl>')
+    return buffer.getvalue()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """EDINET・チャートAPIの応答を返すスタブ"""
+
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with StubHandler.lock:
+            StubHandler.active += 1
+            StubHandler.max_active = max(StubHandler.max_active, StubHandler.active)
+        try:
+            url = urlsplit(self.path)
+            query = parse_qs(url.query)
+            if url.path == '/slow':
+                time.sleep(0.05)
+                self._send(200, b'ok')
+            elif url.path == '/documents.json':
+                status = '404' if query['date'][0] == '2024-01-01' else '200'
+                body = {'metadata': {'status': status},
+                        'results': [{'docID': f"S{query['date'][0]}", 'secCode': '72030'}]}
+                self._send(200, json.dumps(body).encode())
+            elif url.path.startswith('/documents/'):
+                self._send(200, make_document_zip(url.path.rsplit('/', 1)[1]))
+            elif url.path.startswith('/chart/'):
+                self._send(200, json.dumps(CHART).encode())
+            else:
+                self._send(500, b'error')
+        finally:
+            with StubHandler.lock:
+                StubHandler.active -= 1
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server(monkeypatch):
+    """スタブサーバーを起動し、レスポンスキャッシュを無効にする"""
+    monkeypatch.setattr(response_cache, '_cache', response_cache._NullCache())
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    StubHandler.max_active = 0
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_host_limit(stub_server):
+    """ホストごとの同時リクエスト数がセマフォで制限される"""
+    async def run():
+        async with AsyncFetcher(host_limits={'127.0.0.1': 4}, impersonate=None) as fetcher:
+            return await asyncio.gather(*(fetcher.get(f"{stub_server}/slow") for _ in range(20)))
+
+    bodies = asyncio.run(run())
+    assert bodies == [b'ok'] * 20
+    assert 1 < StubHandler.max_active <= 4
+
+
+def test_error_status(stub_server):
+    """500応答は再試行後にFetchErrorになる"""
+    async def run():
+        async with AsyncFetcher(max_retries=0, impersonate=None) as fetcher:
+            await fetcher.get(f"{stub_server}/missing")
+
+    with pytest.raises(FetchError) as error:
+        asyncio.run(run())
+    assert error.value.status == 500
+
+
+def test_edinet_documents(stub_server):
+    """EDINETの書類一覧・書類を並列に取得"""
+    repo = EDINETRepository('dummy')
+    repo.base_url = stub_server
+
+    lists = repo.get_documents_lists(['2024-01-01', '2024-01-02', '2024-01-03'])
+    assert lists['2024-01-01'] is None
+    assert lists['2024-01-02']['results'][0]['docID'] == 'S2024-01-02'
+
+    documents = repo.get_parsed_documents(['S1', 'N2'])
+    doc_size, xbrl_size, parsed = documents['S1']
+    assert doc_size > 0 and xbrl_size > 0
+    assert parsed['損益計算書']['値'].tolist() == ['1000']
+    assert documents['N2'][1:] == (None, None)
+
+
+class RecordingDB:
+    """execute_many の呼び出しを記録するDB（未取得の日付はなし）"""
+
+    def __init__(self):
+        self.rows = {}
+
+    def execute_query(self, query, params=None, fetch=True):
+        return []
+
+    def execute_many(self, query, data_list):
+        table = query.split('INTO')[1].split()[0]
+        self.rows.setdefault(table, []).extend(data_list)
+        return len(data_list)
+
+
+def test_edinet_index_crawl(stub_server):
+    """書類一覧を並列に取り込み、取得できなかった日付は取得済みにしない"""
+    repo = EDINETRepository('dummy')
+    repo.base_url = stub_server
+    db = RecordingDB()
+    index = EDINETFilingIndex(db)
+
+    stats = index.sync(repo, '2024-01-01', '2024-01-03')
+    assert stats == {'dates': 2, 'documents': 2, 'failed': 1}
+    assert db.rows['edinet_index_dates'] == [('2024-01-03', 1), ('2024-01-02', 1)]
+    assert db.rows['edinet_documents'][0][:4] == ('S2024-01-03', '2024-01-03', '72030', None)
+
+
+class FailingDocumentsDB(RecordingDB):
+    """edinet_documents への保存がSQLエラーになるDB"""
+
+    def execute_many(self, query, data_list):
+        if 'edinet_documents' in query:
+            return None
+        return super().execute_many(query, data_list)
+
+
+def test_edinet_index_document_write_failure(stub_server):
+    """書類の保存に失敗した日付は取得済みにせず、次回に取得し直す"""
+    repo = EDINETRepository('dummy')
+    repo.base_url = stub_server
+    db = FailingDocumentsDB()
+
+    stats = EDINETFilingIndex(db).sync(repo, '2024-01-02', '2024-01-03')
+    assert stats == {'dates': 0, 'documents': 0, 'failed': 2}
+    assert 'edinet_index_dates' not in db.rows
+
+
+def test_yfinance_snapshots(stub_server, monkeypatch):
+    """チャートAPIの応答が yf.Ticker と同じ形式のスナップショットになる"""
+    monkeypatch.setattr(YFinanceRepository, 'CHART_URL', stub_server + '/chart/{ticker}')
+    monkeypatch.setattr(yfinance_repository, 'get_rate_limiter',
+                        lambda: AdaptiveRateLimiter(rate=100, min_rate=1, max_rate=100, burst=10))
+
+    async def fetch_all():
+        async with AsyncFetcher() as fetcher:
+            return await asyncio.gather(*(
+                YFinanceRepository.get_snapshot_async(fetcher, ticker, period='max')
+                for ticker in ['7203.T', '6758.T']
+            ))
+
+    snapshots = asyncio.run(fetch_all())
+    assert [s.ticker for s in snapshots] == ['7203.T', '6758.T']
+
+    snapshot = snapshots[0]
+    hist = snapshot.history(period='max')
+    assert snapshot.fetch_count == 0
+    assert list(hist['Close']) == [50.0, 120.0]
+    assert list(hist['Open']) == [50.0, 110.0]  # 調整後終値の比率で調整
+    assert list(hist['Dividends']) == [10.0, 0.0]
+    assert str(hist.index.tz) == 'Asia/Tokyo'
+    assert list(snapshot.dividends) == [10.0]
+
+
+def test_realtime_screener_fetch_all_async(stub_server, monkeypatch):
+    """スクリーニングの取得段階がチャートAPIの結果を銘柄ごとのFutureに設定する"""
+    from concurrent.futures import Future
+
+    import services.realtime_screener as realtime_screener
+    from repository.ticker_snapshot import TickerSnapshot
+
+    monkeypatch.setattr(YFinanceRepository, 'CHART_URL', stub_server + '/chart/{ticker}')
+    monkeypatch.setattr(yfinance_repository, 'get_rate_limiter',
+                        lambda: AdaptiveRateLimiter(rate=100, min_rate=1, max_rate=100, burst=10))
+    # infoはyfinanceから取得するため、テストでは取得しない
+    monkeypatch.setattr(TickerSnapshot, 'prefetch', lambda self, *names, period=None: self)
+
+    def snapshot_data(snapshot, period):
+        if snapshot.ticker == '9999.T':
+            raise ValueError('broken')
+        return {'history': snapshot.history(period=period), 'fetch_count': snapshot.fetch_count}
+
+    monkeypatch.setattr(realtime_screener, 'snapshot_data', snapshot_data)
+
+    tickers = ['7203.T', '6758.T', '9999.T']
+    futures = {ticker: Future() for ticker in tickers}
+    realtime_screener.fetch_all_async(tickers, 'max', futures, max_in_flight=2)
+
+    data = futures['7203.T'].result(timeout=5)
+    assert list(data['history']['Close']) == [50.0, 120.0]
+    assert data['fetch_count'] == 0
+    assert futures['6758.T'].result(timeout=5)['fetch_count'] == 0
+    with pytest.raises(ValueError):
+        futures['9999.T'].result(timeout=5)
@@ -0,0 +1,144 @@
+"""配当利回り・配当成長指標のパネル版、年末終値インデックス、時点PERのテスト"""
+import math
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from domain.calculators.dividend_growth import (
+    consecutive_increases,
+    dividend_cagr,
+    dividend_growth_panel,
+    yearly_dividends,
+    yearly_dividends_panel,
+)
+from domain.calculators.historical_metrics import (
+    calculate_historical_dividend_yield,
+    calculate_historical_dividend_yield_panel,
+    calculate_point_in_time_per_panel,
+    close_at_year_end,
+    extract_eps_history,
+    year_end_closes,
+)
+
+
+def make_universe(count=60, seed=0):
+    """ランダムな配当・株価の縦持ちデータを作成（特別配当・無配・株価欠損の銘柄を含む）"""
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp(datetime.now().date())
+    dividend_frames = []
+    price_frames = []
+    for i in range(count):
+        ticker = f"{1000 + i}.T"
+        start = end - pd.DateOffset(years=int(rng.integers(1, 7)))
+        dates = pd.bdate_range(start, end, tz='Asia/Tokyo')
+        close = 1000 * np.exp(np.cumsum(rng.normal(0, 0.01, len(dates))))
+        if i % 13 == 0:
+            close[: len(close) // 2] = np.nan
+        price_frames.append(pd.DataFrame({'ticker': ticker, 'date': dates, 'close': close}))
+
+        if i % 11 == 0:
+            continue  # 無配
+        ex_dates = pd.date_range(start, end, freq='6ME', tz='Asia/Tokyo')
+        amounts = rng.uniform(10, 30, len(ex_dates))
+        if i % 7 == 0 and len(amounts) > 0:
+            amounts[-1] *= 5  # 特別配当
+        dividend_frames.append(pd.DataFrame({'ticker': ticker, 'date': ex_dates, 'amount': amounts}))
+    return pd.concat(dividend_frames, ignore_index=True), pd.concat(price_frames, ignore_index=True)
+
+
+def test_panel_matches_per_ticker():
+    """全銘柄で銘柄ごとの calculate_historical_dividend_yield と同じ結果になる"""
+    dividends, prices = make_universe()
+    panel = calculate_historical_dividend_yield_panel(dividends, prices, years=5)
+
+    checked = 0
+    for ticker, price_group in prices.groupby('ticker'):
+        hist = pd.DataFrame({'Close': price_group['close'].to_numpy()}, index=pd.DatetimeIndex(price_group['date']))
+        dividend_group = dividends[dividends['ticker'] == ticker]
+        series = pd.Series(dividend_group['amount'].to_numpy(), index=pd.DatetimeIndex(dividend_group['date']))
+
+        expected = calculate_historical_dividend_yield(None, series, hist, years=5)
+        if expected[0] is None:
+            assert ticker not in panel.index
+            continue
+
+        row = panel.loc[ticker]
+        for name, value in zip(['avg_yield', 'cv', 'current_yield', 'trend'], expected[:4]):
+            assert math.isclose(row[name], value, rel_tol=1e-9, abs_tol=1e-12), (ticker, name)
+        assert bool(row['has_special']) == bool(expected[4])
+        checked += 1
+
+    assert checked > 30
+    assert panel['has_special'].any()
+
+
+def test_panel_empty():
+    """データがない場合は空のDataFrame"""
+    empty = pd.DataFrame(columns=['ticker', 'date', 'amount'])
+    result = calculate_historical_dividend_yield_panel(empty, empty.rename(columns={'amount': 'close'}))
+    assert result.empty
+
+
+def test_year_end_closes_matches_scan():
+    """年末終値インデックスの二分探索が、年末以前の行を絞り込む方法と同じ終値になる"""
+    _, prices = make_universe(count=5, seed=1)
+    for _, price_group in prices.groupby('ticker'):
+        hist = pd.DataFrame({'Close': price_group['close'].to_numpy()}, index=pd.DatetimeIndex(price_group['date']))
+        year_ends = year_end_closes(hist)
+        for year in range(hist.index.year.min() - 1, hist.index.year.max() + 2):
+            before = hist[hist.index <= pd.Timestamp(year, 12, 31, tz='Asia/Tokyo')]
+            expected = before['Close'].iloc[-1] if len(before) > 0 else None
+            actual = close_at_year_end(year_ends, year)
+            if expected is None or np.isnan(expected):
+                assert actual is None or np.isnan(actual)
+            else:
+                assert actual == expected
+
+
+def test_point_in_time_per_uses_eps_in_effect():
+    """各年末のPERは、その時点で公表済みだったEPSで計算される"""
+    now = datetime(2025, 6, 30)
+    financials = pd.DataFrame(
+        {pd.Timestamp('2022-03-31'): [np.nan, 1e9, 1e7], pd.Timestamp('2023-03-31'): [200.0, 2e9, 1e7],
+         pd.Timestamp('2024-03-31'): [400.0, 4e9, 1e7]},
+        index=['Diluted EPS', 'Net Income', 'Diluted Average Shares']
+    )
+    eps_history = extract_eps_history(financials)
+    assert list(eps_history['eps']) == [100.0, 200.0, 400.0]  # EPSがない期は純利益/株式数
+
+    year_ends = pd.DataFrame({
+        'ticker': 'A', 'year': [2022, 2023, 2024, 2025],
+        'date': pd.to_datetime(['2022-12-30', '2023-12-29', '2024-12-30', '2025-06-30']),
+        'close': [1000.0, 3000.0, 4000.0, 2000.0],
+    })
+    panel = calculate_point_in_time_per_panel(year_ends, eps_history.assign(ticker='A'), years=4, now=now)
+    row = panel.loc['A']
+    # 2022: 1000/100, 2023: 3000/200, 2024・2025: 2024年3月期のEPS
+    assert math.isclose(row['avg_per'], (10 + 15 + 10 + 5) / 4)
+    assert row['current_per'] == 5.0 and row['min_per'] == 5.0 and row['max_per'] == 15.0
+    assert bool(row['is_low_per'])
+
+
+def test_dividend_growth_panel_matches_per_ticker():
+    """全銘柄一括の配当CAGR・連続増配年数が、銘柄ごとの計算と一致する"""
+    dividends, _ = make_universe(count=40, seed=2)
+    # 増配・減配が混ざるよう金額を丸める
+    dividends = dividends.assign(amount=dividends['amount'].round(-1))
+    growth = dividend_growth_panel(yearly_dividends_panel(dividends), years=3)
+
+    for ticker, group in dividends.groupby('ticker'):
+        yearly = yearly_dividends(pd.Series(group['amount'].to_numpy(), index=pd.DatetimeIndex(group['date'])))
+        expected_cagr = dividend_cagr(yearly, years=3)
+        actual_cagr = growth.loc[ticker, 'cagr']
+        assert (expected_cagr is None and np.isnan(actual_cagr)) or math.isclose(expected_cagr, actual_cagr)
+        assert growth.loc[ticker, 'consecutive_increases'] == consecutive_increases(yearly)
+
+        # 年ごとに前年と比べる素朴な数え方と一致
+        totals = yearly['dividend'].to_numpy()
+        streak = 0
+        for i in range(len(totals) - 1, 0, -1):
+            if totals[i] <= totals[i - 1]:
+                break
+            streak += 1
+        assert growth.loc[ticker, 'consecutive_increases'] == streak
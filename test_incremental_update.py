@@ -0,0 +1,54 @@
+"""差分更新（最新株価日付以降の取得）のテスト"""
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from database.data_updater import StockDataUpdater
+from repository.ticker_snapshot import TickerSnapshot
+
+
+class EmptyHistoryDB:
+    """配当・株価履歴がない（株価のみ一括更新した直後の）DB"""
+
+    def get_dividends_history(self, ticker):
+        return []
+
+    def get_price_history(self, ticker, start_date=None):
+        return []
+
+
+def make_stock(ticker, last_price_date):
+    """3年分の半年ごとの配当と、最新株価日付の前後の株価を持つスナップショット"""
+    today = pd.Timestamp(datetime.now().date(), tz='Asia/Tokyo')
+    ex_dates = pd.date_range(today - pd.DateOffset(years=3), today, freq='6ME', tz='Asia/Tokyo')
+    dividends = pd.Series(20.0, index=ex_dates, name='Dividends')
+    dates = pd.bdate_range(pd.Timestamp(last_price_date, tz='Asia/Tokyo') - pd.Timedelta(days=10), today)
+    hist = pd.DataFrame({'Open': 100.0, 'High': 100.0, 'Low': 100.0, 'Close': 100.0, 'Volume': 1000,
+                         'Dividends': 0.0}, index=dates)
+    return TickerSnapshot.from_data(ticker, dividends=dividends, history=hist), dividends
+
+
+def run_tail(last_price_date, last_dividend_date):
+    updater = StockDataUpdater.__new__(StockDataUpdater)
+    updater.db = EmptyHistoryDB()
+    stock, dividends = make_stock('1111.T', last_price_date)
+    fetched = {'ticker': '1111.T'}
+    updater._fetch_incremental_tail(fetched, stock, last_price_date, last_dividend_date)
+    return fetched, dividends
+
+
+def test_prices_without_dividends_backfill_dividends():
+    """株価はあるが配当がない銘柄は、株価の差分だけでなく配当履歴全体を取り込む"""
+    last_price_date = datetime.now().date() - timedelta(days=5)
+    fetched, dividends = run_tail(last_price_date, None)
+
+    assert list(fetched['new_dividends'].index) == list(dividends.index)
+    assert (fetched['new_prices'].index.date > last_price_date).all()
+    assert len(fetched['dividends']) == len(dividends)
+
+
+def test_recent_dividends_fetch_only_tail():
+    """配当が最新株価日付に追いついている銘柄は、最新権利落ち日より後の配当のみ"""
+    last_price_date = datetime.now().date() - timedelta(days=5)
+    fetched, _ = run_tail(last_price_date, last_price_date - timedelta(days=30))
+    assert fetched['new_dividends'] is None or len(fetched['new_dividends']) == 0
@@ -282,6 +282,13 @@ class DividendAristocratsPage:
                         st.session_state['screening_results'] = df_results
                         st.success(f"✅ {len(df_results)}銘柄が条件に一致しました")
 
+                    # 時間内に取得できなかったキャッシュミス銘柄は裏で取得・保存を続けている
+                    pending_tickers = df_results.attrs.get('pending_tickers', 0)
+                    if pending_tickers > 0:
+                        st.info(f"⏳ 一部のみ最新: キャッシュにない{df_results.attrs.get('cache_misses', 0)}銘柄のうち"
+                                f"{pending_tickers}銘柄は取得中です。完了分はキャッシュに保存されるため、"
+                                f"しばらくしてから再度スクリーニングすると反映されます。")
+
         # セッションステートに結果がある場合は表示（ボタンの外）
         if 'screening_results' in st.session_state:
             df_results = st.session_state['screening_results']
@@ -614,6 +621,8 @@ class DividendAristocratsPage:
         success_count = 0
         error_count = 0
         start_time = time.time()
+        # 分析結果は溜めてから複数行のUPSERTでまとめて保存する
+        pending = []
 
         for i, ticker in enumerate(tickers):
             try:
@@ -626,19 +635,22 @@ class DividendAristocratsPage:
                 metrics = DividendAristocrats.analyze_dividend_growth(ticker, years=5)
 
                 if 'エラー' not in metrics:
-                    # データベースに保存
-                    db_manager.upsert_dividend_aristocrat_metrics(ticker, metrics)
+                    pending.append((ticker, metrics))
                     success_count += 1
                 else:
                     error_count += 1
 
-                # API制限対策: 0.5秒待機
-                time.sleep(0.5)
+                if len(pending) >= 100:
+                    db_manager.upsert_dividend_aristocrat_metrics_many(pending)
+                    pending = []
+
+                # API制限対策は共有レートリミッター（TickerSnapshot経由）が行う
 
             except Exception as e:
                 error_count += 1
                 st.warning(f"⚠️ {ticker}: {str(e)}")
 
+        db_manager.upsert_dividend_aristocrat_metrics_many(pending)
         elapsed_time = time.time() - start_time
 
         # 完了メッセージ
@@ -26,7 +26,16 @@ class EDINETPage:
             st.write("2. アカウントを作成し、APIキーを発行")
             return
         
-        edinet_repo = EDINETRepository(api_key)
+        # 書類一覧インデックス（DB）を使う場合は、未取得の日付だけを取得して企業の書類を検索する
+        use_index = st.sidebar.checkbox(
+            "書類一覧インデックス（DB）を使う", value=True,
+            help="取得済みの書類一覧をDBから検索します（初回は対象期間の書類一覧を取り込みます）"
+        )
+        filing_index = None
+        if use_index:
+            from repository.edinet_index import EDINETFilingIndex
+            filing_index = EDINETFilingIndex()
+        edinet_repo = EDINETRepository(api_key, filing_index=filing_index)
         
         # 企業コード入力
         company_code = st.text_input("企業コード（例: 7203 または 7203.T）", "7203")